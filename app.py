@@ -7,6 +7,7 @@ import threading
 import time
 import webbrowser
 import os
+import json
 import config
 
 # Create and configure app
@@ -21,13 +22,9 @@ for folder in config.FOLDERS.values():
 validation_logs_folder = config.BASE_PATH / "validation logs"
 validation_logs_folder.mkdir(parents=True, exist_ok=True)
 
-# Create escalations directory if it doesn't exist
-escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-escalations_folder.mkdir(parents=True, exist_ok=True)
-
-# Create rejected directory if it doesn't exist
-rejected_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\rejected"
-rejected_folder.mkdir(parents=True, exist_ok=True)
+# Create escalations, review2 and rejected directories if they don't exist
+for folder in (config.ESCALATIONS_FOLDER, config.REVIEW2_FOLDER, config.REJECTED_FOLDER):
+    folder.mkdir(parents=True, exist_ok=True)
 
 # Import blueprints
 from routes.unmapped import unmapped_bp
@@ -36,6 +33,12 @@ from routes.escalations import escalations_bp
 from routes.rate_corrections import rate_corrections_bp
 from routes.provider_corrections import provider_corrections_bp
 from routes.ota_corrections import ota_corrections_bp
+from queue_index import queue_indexes
+from work_items import work_items, UNMAPPED, CORRECTIONS, ESCALATIONS
+from services.file_mover import file_mover
+from archive_store import archive_store, archive_folders, read_archived
+from text_utils import validate_filename
+from db_utils import start_order_search_sync
 
 # Register blueprints
 app.register_blueprint(unmapped_bp, url_prefix='/unmapped')
@@ -86,7 +89,7 @@ def debug_paths():
                 results[folder_name + "_files"] = [f.name for f in list(Path(folder_path).glob(file_pattern))[:5]]
     
     # Add escalations folder info
-    escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
+    escalations_folder = config.ESCALATIONS_FOLDER
     results["folder_paths"]["ESCALATIONS_FOLDER"] = str(escalations_folder)
     results["folder_paths"]["ESCALATIONS_FOLDER_exists"] = os.path.exists(escalations_folder)
     
@@ -125,15 +128,45 @@ def test_files():
     
     return jsonify(results)
 
+@app.route('/api/archive', methods=['GET'])
+def archive_entries():
+    """Look up archived documents (?kind=, ?name=, ?since=, ?until=, ?limit=) and per-kind totals."""
+    try:
+        limit = request.args.get('limit', type=int) or config.LIST_PAGINATION['DEFAULT_LIMIT']
+        entries = archive_store.entries(
+            kind=request.args.get('kind') or None,
+            name=request.args.get('name') or None,
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+            limit=min(limit, config.LIST_PAGINATION['MAX_LIMIT']),
+        )
+        return jsonify({'entries': entries, 'stats': archive_store.stats()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/archive/<kind>/<filename>', methods=['GET'])
+def archived_file(kind, filename):
+    """Get a retired document, from its folder or the archive store."""
+    if kind not in archive_folders():
+        return jsonify({'error': f'Unknown archive: {kind}'}), 404
+    try:
+        return jsonify({'data': json.loads(read_archived(kind, validate_filename(filename)))})
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/')
 def home():
     """Render the application homepage with links to tools."""
-    unmapped_count = len(list(config.FOLDERS['UNMAPPED_FOLDER'].glob('*.json')))
-    corrections_count = len(list(config.FOLDERS['FAILS_FOLDER'].glob('*.json')))
-    
-    # Count escalations
-    escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-    escalations_count = len(list(escalations_folder.glob('*.json'))) if escalations_folder.exists() else 0
+    # Bring the work items up to date with the queue folders (a throttled
+    # directory listing), then read the per-state counts
+    for index in queue_indexes.values():
+        index.refresh()
+    counts = work_items.counts()
+    unmapped_count = counts.get(UNMAPPED, 0)
+    corrections_count = counts.get(CORRECTIONS, 0)
+    escalations_count = counts.get(ESCALATIONS, 0)
     
     return render_template('home.html', 
                           unmapped_count=unmapped_count,
@@ -149,4 +182,20 @@ if __name__ == "__main__":
     if config.AUTO_OPEN_BROWSER:
         threading.Thread(target=open_browser).start()
     
+    # Keep the name/DOS search table in step with orders loaded by other tools
+    start_order_search_sync()
+    
+    # Apply workflow file moves (including any left from the last run) in the background
+    file_mover.start()
+    
+    # Warm the render cache for queued files in the background
+    if config.PRERENDER['ENABLED']:
+        from services.prerenderer import Prerenderer
+        Prerenderer.from_config().start()
+    
+    # Keep the PDF full-text index in step with the archive
+    if config.TEXT_INDEX['ENABLED']:
+        from services.text_indexer import TextIndexer
+        TextIndexer.from_config().start()
+    
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
\ No newline at end of file
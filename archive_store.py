@@ -0,0 +1,443 @@
+"""
+Compressed, content-addressed archive of retired review documents.
+
+Originals of corrected files, files marked not found (review2) and
+rejected escalations used to pile up as pretty-printed JSON on the synced
+drive. They are now stored once per distinct content, compressed with
+zstd (when the zstandard package is installed) or gzip, with an SQLite
+index to look them up by folder, filename and date. read_archived() reads
+a document from its old folder if it is still there, so callers don't
+need to know whether it has been migrated.
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import config
+from file_utils import atomic_write, fsync_directory
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Blob file suffix of each compression
+SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive_entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    archived_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_entries_name ON archive_entries (kind, name, id);
+CREATE INDEX IF NOT EXISTS idx_archive_entries_date ON archive_entries (archived_at);
+"""
+
+def archive_folders():
+    """
+    Get the folders whose documents go to the archive store.
+
+    Returns:
+        dict: Kind ('originals', 'review2', 'rejected') -> folder
+    """
+    return {
+        'originals': config.FOLDERS['ORIGINALS_FOLDER'],
+        'review2': config.REVIEW2_FOLDER,
+        'rejected': config.REJECTED_FOLDER,
+    }
+
+def archive_kind(folder):
+    """
+    Get the archive kind that replaces a folder, if archiving is enabled.
+
+    Args:
+        folder (Path): Destination folder of a file move
+
+    Returns:
+        str: Kind, or None if files should still be written to the folder
+    """
+    if not config.ARCHIVE_STORE['ARCHIVE_FOLDERS']:
+        return None
+    folder = Path(folder)
+    for kind, kind_folder in archive_folders().items():
+        if Path(kind_folder) == folder:
+            return kind
+    return None
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+class ArchiveStore:
+    """
+    Blobs stored once per distinct content under
+    root/<first two hex digits>/<sha256><suffix>, plus an index of which
+    document (kind and filename) was archived with which content and when.
+    Storing the same bytes again is a no-op, so the many identical originals
+    and re-archived documents cost nothing.
+    """
+
+    def __init__(self, root, index_path, compression='zstd', level=10, workers=4):
+        """
+        Initialize the store. Folders and the index are created on first use.
+
+        Args:
+            root (Path): Folder holding the blobs
+            index_path (Path): SQLite file of the archive index
+            compression (str): 'zstd' or 'gzip'; zstd falls back to gzip when
+                the zstandard package isn't installed
+            level (int): Compression level
+            workers (int): Files compressed concurrently during migration
+        """
+        self.root = Path(root)
+        self.index_path = Path(index_path)
+        self.level = level
+        self.workers = workers
+        if compression == 'zstd' and zstandard is None:
+            logger.info("zstandard is not installed; archiving with gzip")
+            compression = 'gzip'
+        self.compression = compression
+        self._ready = False
+
+    @classmethod
+    def from_config(cls):
+        """
+        Build the store from config.ARCHIVE_STORE.
+
+        Returns:
+            ArchiveStore: Configured store
+        """
+        settings = config.ARCHIVE_STORE
+        return cls(
+            root=settings['PATH'],
+            index_path=settings['INDEX_PATH'],
+            compression=settings['COMPRESSION'],
+            level=settings['LEVEL'],
+            workers=settings['WORKERS'],
+        )
+
+    def _connect(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(ARCHIVE_SCHEMA)
+            self._ready = True
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _path(self, digest, compression):
+        return self.root / digest[:2] / f"{digest}{SUFFIXES[compression]}"
+
+    def _compress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=min(self.level, 9))
+
+    def _stored(self, digest):
+        """Find the blob of a digest, whichever compression it was stored with."""
+        for compression in SUFFIXES:
+            path = self._path(digest, compression)
+            if path.exists():
+                return path, compression
+        return None, None
+
+    def put(self, data):
+        """
+        Store bytes.
+
+        Args:
+            data (bytes): Content to archive
+
+        Returns:
+            str: Hex SHA-256 digest identifying the content
+        """
+        return self._put(data)[0]
+
+    def _put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path, _ = self._stored(digest)
+        if path is None:
+            path = self._path(digest, self.compression)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, self._compress(data))
+        return digest, path.stat().st_size
+
+    def get(self, digest):
+        """
+        Read archived bytes.
+
+        Args:
+            digest (str): Digest returned by put
+
+        Returns:
+            bytes: Original content
+
+        Raises:
+            FileNotFoundError: If nothing is stored under the digest
+        """
+        path, compression = self._stored(digest)
+        if path is None:
+            raise FileNotFoundError(f"No archived content {digest}")
+        data = path.read_bytes()
+        if compression == 'zstd':
+            if zstandard is None:
+                raise RuntimeError(f"{path.name} is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def exists(self, digest):
+        """
+        Check whether content is stored.
+
+        Args:
+            digest (str): Content digest
+
+        Returns:
+            bool: True if stored
+        """
+        return self._stored(digest)[0] is not None
+
+    @staticmethod
+    def _index(conn, kind, name, digest, size, stored_size, archived_at):
+        """Add an index entry unless the document's latest entry already has this content."""
+        latest = conn.execute(
+            "SELECT digest FROM archive_entries WHERE kind = ? AND name = ? ORDER BY id DESC LIMIT 1",
+            (kind, name)
+        ).fetchone()
+        if latest is not None and latest['digest'] == digest:
+            return False
+        conn.execute(
+            "INSERT INTO archive_entries (kind, name, digest, size, stored_size, archived_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, name, digest, size, stored_size, archived_at)
+        )
+        return True
+
+    def archive(self, kind, name, data, archived_at=None):
+        """
+        Store a document and index it under its kind and filename.
+
+        Args:
+            kind (str): Archive kind ('originals', 'review2', 'rejected')
+            name (str): Filename
+            data (bytes): Document content
+            archived_at (str): ISO timestamp to record (defaults to now)
+
+        Returns:
+            str: Content digest
+        """
+        digest, stored_size = self._put(data)
+        with self._write() as conn:
+            self._index(conn, kind, name, digest, len(data), stored_size, archived_at or _now())
+        return digest
+
+    def find(self, kind, name):
+        """
+        Get the latest index entry of a document.
+
+        Args:
+            kind (str): Archive kind
+            name (str): Filename
+
+        Returns:
+            dict: Entry (kind, name, digest, size, stored_size, archived_at), or None
+        """
+        entries = self.entries(kind=kind, name=name)
+        return entries[-1] if entries else None
+
+    def read(self, kind, name):
+        """
+        Read the latest archived content of a document.
+
+        Args:
+            kind (str): Archive kind
+            name (str): Filename
+
+        Returns:
+            bytes: Document content
+
+        Raises:
+            FileNotFoundError: If the document was never archived
+        """
+        entry = self.find(kind, name)
+        if entry is None:
+            raise FileNotFoundError(f"{name} is not in the {kind} archive")
+        return self.get(entry['digest'])
+
+    def entries(self, kind=None, name=None, since=None, until=None, limit=None):
+        """
+        Look up index entries, oldest first.
+
+        Args:
+            kind (str): Only this archive kind
+            name (str): Only this filename
+            since (str): Only entries archived at or after this ISO date/time
+            until (str): Only entries archived before this ISO date/time
+            limit (int): Most entries returned
+
+        Returns:
+            list: Dicts with kind, name, digest, size, stored_size and archived_at
+        """
+        sql = "SELECT kind, name, digest, size, stored_size, archived_at FROM archive_entries WHERE 1 = 1"
+        params = []
+        for column, operator, value in (('kind', '=', kind), ('name', '=', name),
+                                        ('archived_at', '>=', since), ('archived_at', '<', until)):
+            if value is not None:
+                sql += f" AND {column} {operator} ?"
+                params.append(value)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def stats(self):
+        """
+        Summarize the archive per kind.
+
+        Returns:
+            dict: Kind -> {'documents', 'size', 'stored_size'} where stored_size
+                counts each entry's blob (shared blobs are stored only once on disk)
+        """
+        conn = self._connect()
+        try:
+            return {row['kind']: {'documents': row['documents'], 'size': row['size'],
+                                  'stored_size': row['stored_size']}
+                    for row in conn.execute(
+                        "SELECT kind, COUNT(DISTINCT name) AS documents, SUM(size) AS size, "
+                        "SUM(stored_size) AS stored_size FROM archive_entries GROUP BY kind")}
+        finally:
+            conn.close()
+
+    def migrate_folder(self, kind, folder, remove=True, batch_size=500):
+        """
+        Move the JSON files of a folder into the archive in bulk.
+
+        Files are compressed concurrently, each batch is indexed in one
+        transaction, and only then are the batch's files deleted, so an
+        interrupted migration can simply be run again.
+
+        Args:
+            kind (str): Archive kind of the folder
+            folder (Path): Folder to migrate
+            remove (bool): Delete the files once archived
+            batch_size (int): Files per batch
+
+        Returns:
+            dict: Counts of files archived, bytes before and bytes stored
+        """
+        folder = Path(folder)
+        result = {'files': 0, 'size': 0, 'stored_size': 0}
+        if not folder.exists():
+            return result
+
+        def prepare(path):
+            data = path.read_bytes()
+            digest, stored_size = self._put(data)
+            archived_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec='seconds')
+            return path, digest, len(data), stored_size, archived_at
+
+        paths = sorted(Path(entry.path) for entry in os.scandir(folder)
+                       if entry.is_file() and entry.name.endswith('.json'))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(paths), batch_size):
+                prepared = list(executor.map(prepare, paths[start:start + batch_size]))
+                with self._write() as conn:
+                    for path, digest, size, stored_size, archived_at in prepared:
+                        self._index(conn, kind, path.name, digest, size, stored_size, archived_at)
+                for path, _, size, stored_size, _ in prepared:
+                    result['files'] += 1
+                    result['size'] += size
+                    result['stored_size'] += stored_size
+                    if remove:
+                        path.unlink(missing_ok=True)
+                if remove and prepared:
+                    fsync_directory(folder)
+                logger.info(f"Archived {result['files']}/{len(paths)} files from {folder}")
+        return result
+
+    def migrate(self, kinds=None, remove=True):
+        """
+        Migrate the archived folders into the store.
+
+        Args:
+            kinds (Iterable[str]): Kinds to migrate (defaults to all)
+            remove (bool): Delete the files once archived
+
+        Returns:
+            dict: Kind -> counts from migrate_folder
+        """
+        folders = archive_folders()
+        return {kind: self.migrate_folder(kind, folders[kind], remove,
+                                          config.ARCHIVE_STORE['MIGRATE_BATCH_SIZE'])
+                for kind in (kinds or folders)}
+
+def read_archived(kind, name):
+    """
+    Read a retired document, from its folder if it's still there and
+    otherwise from the archive store.
+
+    Args:
+        kind (str): Archive kind ('originals', 'review2', 'rejected')
+        name (str): Filename
+
+    Returns:
+        bytes: Document content
+
+    Raises:
+        FileNotFoundError: If the document is in neither place
+    """
+    path = archive_folders()[kind] / name
+    if path.exists():
+        return path.read_bytes()
+    return archive_store.read(kind, name)
+
+# Shared archive of original and retired review documents
+archive_store = ArchiveStore.from_config()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move the archived review folders into the archive store.")
+    parser.add_argument('kinds', nargs='*', metavar='kind',
+                        help="Folders to migrate: originals, review2, rejected (default: all)")
+    parser.add_argument('--keep', action='store_true', help="Keep the files after archiving them")
+    args = parser.parse_args()
+    unknown = set(args.kinds) - set(archive_folders())
+    if unknown:
+        parser.error(f"unknown kind: {', '.join(sorted(unknown))}")
+    for kind, counts in archive_store.migrate(args.kinds or None, remove=not args.keep).items():
+        ratio = counts['size'] / counts['stored_size'] if counts['stored_size'] else 0
+        print(f"{kind}: {counts['files']} files, {counts['size']} -> {counts['stored_size']} bytes ({ratio:.1f}x)")
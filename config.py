@@ -19,6 +19,13 @@ DB_PATH = BASE_PATH / r"reference_tables\orders2.db"
 # Validation logs path
 VALIDATION_LOGS_PATH = BASE_PATH / "validation logs"
 
+# Escalated records awaiting review
+ESCALATIONS_FOLDER = BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
+
+# Unmapped records marked as not found, and rejected escalations
+REVIEW2_FOLDER = BASE_PATH / r"scripts\VAILIDATION\data\extracts\review2"
+REJECTED_FOLDER = BASE_PATH / r"scripts\VAILIDATION\data\extracts\rejected"
+
 # Folder paths with meaningful names
 FOLDERS = {
     # Unmapped Review App folders
@@ -43,6 +50,40 @@ FUZZY_MATCH_THRESHOLD = 75  # Minimum score for fuzzy matches (0-100)
 DEFAULT_MONTHS_RANGE = 3    # Default month range for DOS searches
 MAX_SEARCH_RESULTS = 50     # Maximum search results to display
 
+# Pre-aggregated order search table (db_utils.order_search), synced off the request path
+ORDER_SEARCH = {
+    'REFRESH_INTERVAL': 60,  # Seconds between re-aggregations of changed orders
+}
+
+# Cached name/DOS search results used for auto-match candidates
+AUTO_MATCH_CACHE = {
+    'TTL': 300,              # Seconds before a cached search is re-run
+    'MAX_ENTRIES': 1000,
+}
+
+# In-memory copy of the cpt_codes table used to validate many codes at once
+CPT_DICTIONARY = {
+    'TTL': 3600,             # Seconds before the codes are reloaded
+}
+
+# Batch validation of the corrections queue (/corrections/api/validation)
+BULK_VALIDATION = {
+    'MAX_UNITS': 50,             # Units above this on one line are flagged
+    'MAX_DOS_AGE_DAYS': 3 * 365, # Dates of service older than this are flagged
+    'CHARGE_TOLERANCE': 0.01,    # Allowed difference between the line charges and the total
+}
+
+# Expected-reimbursement pricing (services.pricing, /rate_corrections/api/pricing)
+PRICING = {
+    'HISTORY_DAYS': 365,         # Dates of service priced when no start date is given
+}
+
+# Next-file prefetch bundles (/<queue>/api/next-bundle?after=<file>&n=)
+NEXT_BUNDLE = {
+    'DEFAULT_COUNT': 3,
+    'MAX_COUNT': 10,
+}
+
 # PDF region settings (as ratios of page dimensions)
 PDF_REGIONS = {
     'header': (0, 0, 1, 0.25),       # (left, top, right, bottom)
@@ -50,6 +91,118 @@ PDF_REGIONS = {
     'footer': (0, 0.8, 1, 1)
 }
 
+# Persisted filename index of the PDF archive, re-checked for changes at most every N seconds
+PDF_INDEX_PATH = BASE_PATH / r"scripts\VAILIDATION\data\pdf_index.json"
+PDF_INDEX_REFRESH_INTERVAL = 10
+
+# Number of idle PDF documents kept open for rendering
+PDF_DOCUMENT_POOL_SIZE = 8
+
+# Allowed render scales for PDF images (1.0 = 72 dpi)
+PDF_SCALE_RANGE = (0.25, 4.0)
+
+# Render profiles for region images
+#   scale: 1.0 = 72 dpi, colorspace: 'rgb' or 'gray',
+#   format: 'png', 'jpeg' or 'webp' (webp needs Pillow, which isn't a dependency,
+#   so only add a webp profile where it is installed), quality: 1-100 for jpeg/webp
+RENDER_PROFILES = {
+    'default': {'scale': 1.0, 'colorspace': 'rgb', 'format': 'png', 'quality': None},
+    'sharp': {'scale': 2.0, 'colorspace': 'gray', 'format': 'png', 'quality': None},
+    'scan': {'scale': 1.5, 'colorspace': 'gray', 'format': 'jpeg', 'quality': 80},
+}
+
+# Profile used for each region when a request doesn't name one
+REGION_RENDER_PROFILES = {
+    'header': 'default',
+    'service_lines': 'default',
+    'footer': 'default'
+}
+
+# Tiled page rendering for the lazy-loading viewer
+PDF_TILES = {
+    'SIZE': 256,                            # Tile width/height in pixels
+    'ZOOM_LEVELS': [0.5, 1.0, 2.0, 4.0],    # Render scale for each zoom level (1.0 = 72 dpi)
+    'PROFILE': 'default',                   # Render profile for colorspace/format (its scale is ignored)
+}
+
+# Rendered PDF image cache (content-addressed, LRU-evicted when over the size limit)
+RENDER_CACHE_PATH = BASE_PATH / r"scripts\VAILIDATION\data\render_cache"
+RENDER_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+# Background pre-rendering of region images and thumbnails for queued PDFs
+PRERENDER = {
+    'ENABLED': True,
+    'WORKERS': 2,            # Render processes (PyMuPDF rendering is CPU-bound)
+    'POLL_INTERVAL': 30,     # Seconds between scans of the queue folders
+    'MAX_PER_SCAN': 200,     # Most PDFs submitted per scan, caps background throughput
+    'IDLE_AFTER': 2.0,       # Seconds without interactive renders before background work resumes
+}
+
+# Background full-text indexing of the PDF archive's text layer
+TEXT_INDEX = {
+    'ENABLED': True,
+    'PATH': BASE_PATH / r"scripts\VAILIDATION\data\pdf_text_index.db",
+    'WORKERS': 1,            # Extraction processes
+    'POLL_INTERVAL': 300,    # Seconds between archive scans
+    'MAX_PER_SCAN': 500,     # Most PDFs indexed per scan
+    'SEARCH_LIMIT': 20,      # Default number of hits returned by the search endpoints
+}
+
+# Cached metadata index of each review queue folder (persisted per queue under PATH)
+QUEUE_INDEX = {
+    'PATH': BASE_PATH / r"scripts\VAILIDATION\data\queue_index",
+    'REFRESH_INTERVAL': 2,   # Minimum seconds between folder scans
+}
+
+# Work-item state of every queued file, and the background mover that carries out
+# the folder moves recorded by state transitions
+WORK_ITEMS = {
+    'PATH': BASE_PATH / r"scripts\VAILIDATION\data\work_items.db",
+    'MOVE_BATCH_SIZE': 50,   # Most file moves applied per batch
+    'MOVE_INTERVAL': 1.0,    # Seconds between retries of moves that failed (e.g. file locked by sync)
+    'LEASE_TTL': 600,        # Seconds a claimed file stays reserved for its reviewer without activity
+    'MAX_LEASE_TTL': 3600,   # Longest lease a client may request
+}
+
+# Compressed, content-addressed archive of retired documents: originals of corrected
+# files, review2 and rejected (python archive_store.py migrates the existing folders)
+ARCHIVE_STORE = {
+    'PATH': BASE_PATH / r"scripts\VAILIDATION\data\archive_store",
+    'INDEX_PATH': BASE_PATH / r"scripts\VAILIDATION\data\archive_store\index.db",
+    'COMPRESSION': 'zstd',       # 'zstd' (needs the zstandard package, else gzip is used) or 'gzip'
+    'LEVEL': 10,                 # Compression level (gzip caps it at 9)
+    'ARCHIVE_FOLDERS': True,     # Archive files moved to those folders instead of writing JSON there
+    'WORKERS': 4,                # Files compressed concurrently while migrating
+    'MIGRATE_BATCH_SIZE': 500,   # Files indexed per transaction while migrating
+}
+
+# Bulk queue actions (/api/not_found/bulk, /api/escalate/bulk, /api/resolve/bulk, /api/reject/bulk)
+BULK_ACTIONS = {
+    'WORKERS': 8,            # Files prepared concurrently (reading JSON, recording the transition)
+    'MAX_ITEMS': 1000,       # Most files per request
+}
+
+# Page sizes for the paginated list endpoints (?limit=, ?cursor=)
+LIST_PAGINATION = {
+    'DEFAULT_LIMIT': 100,    # Page size when the request doesn't give a limit
+    'MAX_LIMIT': 500,
+}
+
+# Width in pixels of first-page thumbnails
+THUMBNAIL_WIDTH = 160
+
+# Thumbnails produced for file listings: the whole first page and a header crop
+THUMBNAIL_KINDS = ('page', 'header')
+
+# Seconds browsers may reuse a rendered image before revalidating it with its ETag
+IMAGE_CACHE_MAX_AGE = 300
+
+# Seconds browsers may reuse a PDF before revalidating it with its ETag/Last-Modified
+PDF_CACHE_MAX_AGE = 60
+
+# Let a fronting web server (nginx/Apache) stream PDFs via X-Sendfile instead of the app
+USE_X_SENDFILE = False
+
 # Feature flags
 FEATURES = {
     'DARK_MODE': True,
@@ -2,6 +2,9 @@
 Database utilities for connecting to the database and performing queries.
 """
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from fuzzywuzzy import fuzz
 import config
 from text_utils import enhanced_normalize_text, get_date_range
@@ -17,11 +20,226 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
+# Materialized, one-row-per-order view of orders + line_items used by the
+# name/DOS search. Triggers on the source tables only record which orders
+# changed; refresh_order_search() re-aggregates just those orders.
+ORDER_SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_search (
+    Order_ID TEXT PRIMARY KEY,
+    FileMaker_Record_Number TEXT,
+    Patient_Last_Name TEXT,
+    Patient_First_Name TEXT,
+    PatientName TEXT,
+    DOS_List TEXT,
+    CPT_List TEXT,
+    Description_List TEXT,
+    Min_DOS TEXT,
+    Max_DOS TEXT,
+    Norm_Last_Name TEXT,
+    Norm_First_Name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_order_search_dos ON order_search (Min_DOS, Max_DOS);
+CREATE INDEX IF NOT EXISTS idx_order_search_last_name ON order_search (Patient_Last_Name);
+CREATE INDEX IF NOT EXISTS idx_line_items_order_dos ON line_items (Order_ID, DOS);
+
+CREATE TABLE IF NOT EXISTS order_search_dirty (
+    Order_ID TEXT PRIMARY KEY
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_order_search_li_insert AFTER INSERT ON line_items
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (NEW.Order_ID);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_order_search_li_update AFTER UPDATE ON line_items
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (OLD.Order_ID);
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (NEW.Order_ID);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_order_search_li_delete AFTER DELETE ON line_items
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (OLD.Order_ID);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_order_search_orders_insert AFTER INSERT ON orders
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (NEW.Order_ID);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_order_search_orders_update AFTER UPDATE ON orders
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (OLD.Order_ID);
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (NEW.Order_ID);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_order_search_orders_delete AFTER DELETE ON orders
+BEGIN
+    INSERT OR IGNORE INTO order_search_dirty (Order_ID) VALUES (OLD.Order_ID);
+END;
+"""
+
+# Aggregation used to (re)build order_search rows; {where} narrows it to dirty orders
+ORDER_SEARCH_REFRESH = """
+INSERT INTO order_search
+SELECT o.Order_ID, o.FileMaker_Record_Number, o.Patient_Last_Name, o.Patient_First_Name,
+    o.PatientName, GROUP_CONCAT(DISTINCT li.DOS), GROUP_CONCAT(DISTINCT li.CPT),
+    GROUP_CONCAT(DISTINCT li.Description), MIN(li.DOS), MAX(li.DOS),
+    normalize_name(o.Patient_Last_Name), normalize_name(o.Patient_First_Name)
+FROM orders o
+LEFT JOIN line_items li ON o.Order_ID = li.Order_ID
+{where}
+GROUP BY o.Order_ID
+"""
+
+_order_search_ready = False
+
+def ensure_order_search(conn):
+    """
+    Create the order_search table, its indexes and change triggers if needed.
+    A newly created table is fully populated before returning.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    global _order_search_ready
+    if _order_search_ready:
+        return
+        
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='order_search'"
+    ).fetchone()
+    conn.executescript(ORDER_SEARCH_SCHEMA)
+    if not exists:
+        refresh_order_search(conn, full=True)
+    _order_search_ready = True
+
+def refresh_order_search(conn, full=False):
+    """
+    Bring order_search up to date with orders and line_items.
+    Only orders recorded in order_search_dirty are re-aggregated unless full is set.
+    
+    Args:
+        conn (sqlite3.Connection): Database connection
+        full (bool): Rebuild every row instead of just the changed orders
+        
+    Returns:
+        int: Number of orders that were re-aggregated (-1 for a full rebuild)
+    """
+    if not full and not conn.execute("SELECT 1 FROM order_search_dirty LIMIT 1").fetchone():
+        return 0
+        
+    conn.create_function('normalize_name', 1, enhanced_normalize_text, deterministic=True)
+    
+    # BEGIN IMMEDIATE so no trigger can mark an order dirty between the re-aggregation and the clear
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if full:
+            conn.execute("DELETE FROM order_search")
+            conn.execute(ORDER_SEARCH_REFRESH.format(where=""))
+            refreshed = -1
+        else:
+            refreshed = conn.execute("SELECT COUNT(*) FROM order_search_dirty").fetchone()[0]
+            conn.execute("""
+                DELETE FROM order_search
+                WHERE Order_ID IN (SELECT Order_ID FROM order_search_dirty)
+            """)
+            conn.execute(ORDER_SEARCH_REFRESH.format(
+                where="WHERE o.Order_ID IN (SELECT Order_ID FROM order_search_dirty)"
+            ))
+        conn.execute("DELETE FROM order_search_dirty")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return refreshed
+
+def sync_order_search():
+    """
+    Create order_search if needed and re-aggregate the orders changed since
+    the last sync. Run at startup and on a timer (see start_order_search_sync),
+    never from a search request, so searches don't take write locks on the
+    shared database.
+    
+    Returns:
+        int: Number of orders that were re-aggregated (-1 for a full rebuild)
+    """
+    conn = get_db_connection()
+    try:
+        ensure_order_search(conn)
+        return refresh_order_search(conn)
+    finally:
+        conn.close()
+
+def start_order_search_sync(interval=None):
+    """
+    Sync order_search now and then every interval seconds in a daemon thread.
+    
+    Args:
+        interval (float): Seconds between syncs (defaults to ORDER_SEARCH['REFRESH_INTERVAL'])
+        
+    Returns:
+        threading.Thread: The sync thread
+    """
+    interval = interval or config.ORDER_SEARCH['REFRESH_INTERVAL']
+    
+    def run():
+        while True:
+            try:
+                refreshed = sync_order_search()
+                if refreshed:
+                    print(f"order_search refreshed ({refreshed} orders)")
+            except Exception as e:
+                # Keep the thread alive; the next sync retries
+                print(f"order_search refresh failed: {str(e)}")
+            time.sleep(interval)
+    
+    thread = threading.Thread(target=run, name='order-search-sync', daemon=True)
+    thread.start()
+    return thread
+
+def _name_filters(table, first_name=None, last_name=None):
+    """
+    Build the broad name-matching conditions of search_by_name_and_dos.
+    
+    Args:
+        table (str): Alias of the table holding the patient name columns
+        first_name (str): Patient's first name
+        last_name (str): Patient's last name
+        
+    Returns:
+        tuple: (SQL condition, list of parameters)
+    """
+    where = "1=1"
+    params = []
+    
+    # Add last name filter with broader matching if provided
+    if last_name:
+        # Use broader matching for better recall
+        where += f" AND ({table}.Patient_Last_Name LIKE ? OR {table}.Patient_Last_Name LIKE ?)"
+        # Make the match broader by only using the first few characters
+        name_prefix = last_name[:min(4, len(last_name))] if len(last_name) > 2 else last_name
+        params.append(f"{name_prefix}%")
+        params.append(f"%{name_prefix}%")
+        
+    # Add first name filter with broader matching if provided
+    if first_name:
+        # Similar broader matching for first name
+        where += f" AND ({table}.Patient_First_Name LIKE ? OR {table}.Patient_First_Name LIKE ?)"
+        name_prefix = first_name[:min(3, len(first_name))] if len(first_name) > 2 else first_name
+        params.append(f"{name_prefix}%")
+        params.append(f"%{name_prefix}%")
+    
+    return where, params
+
 def search_by_name_and_dos(first_name=None, last_name=None, dos_date=None, months_range=None, limit=None):
     """
     Search database by first and last name with enhanced fuzzy matching and DOS within a range.
     Handles text normalization for improved matching.
     
+    Reads the pre-aggregated order_search table (re-aggregated by
+    sync_order_search), except for orders changed since the last sync, which
+    are aggregated at query time so results are never stale; falls back to
+    aggregating everything at query time if that table doesn't exist. Either way the DOS, CPT and description lists only hold
+    the line items inside the DOS window when a DOS is given.
+    
     Args:
         first_name (str): Patient's first name
         last_name (str): Patient's last name
@@ -36,52 +254,82 @@ def search_by_name_and_dos(first_name=None, last_name=None, dos_date=None, month
     months_range = months_range or config.DEFAULT_MONTHS_RANGE
     limit = limit or config.MAX_SEARCH_RESULTS
     
+    start_date = end_date = None
+    if dos_date:
+        start_date, end_date = get_date_range(dos_date, months_range)
+    in_window = bool(start_date and end_date)
+    
     conn = get_db_connection()
     
     try:
-        # Base query with broad matching criteria
-        query = """
-        SELECT DISTINCT o.Order_ID, o.FileMaker_Record_Number, o.Patient_Last_Name, o.Patient_First_Name, 
-        o.PatientName, GROUP_CONCAT(DISTINCT li.DOS) as DOS_List,
-        GROUP_CONCAT(DISTINCT li.CPT) as CPT_List,
-        GROUP_CONCAT(DISTINCT li.Description) as Description_List
-        FROM orders o
-        LEFT JOIN line_items li ON o.Order_ID = li.Order_ID
-        WHERE 1=1
-        """
+        use_order_search = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='order_search'"
+        ).fetchone() is not None
         
-        params = []
+        # The live aggregation, for the fallback and for orders changed since the last sync
+        live_query = """
+            SELECT o.Order_ID, o.FileMaker_Record_Number, o.Patient_Last_Name, o.Patient_First_Name, 
+            o.PatientName, GROUP_CONCAT(DISTINCT li.DOS) as DOS_List,
+            GROUP_CONCAT(DISTINCT li.CPT) as CPT_List,
+            GROUP_CONCAT(DISTINCT li.Description) as Description_List{norm_columns}
+            FROM orders o
+            LEFT JOIN line_items li ON o.Order_ID = li.Order_ID
+            WHERE {where}
+            """
+        live_where, live_params = _name_filters("o", first_name, last_name)
+        if in_window:
+            live_where += " AND li.DOS BETWEEN ? AND ?"
+            live_params.extend([start_date, end_date])
+        live_where += " GROUP BY o.Order_ID"
         
-        # Add last name filter with broader matching if provided
-        if last_name:
-            # Use broader matching for better recall
-            query += " AND (o.Patient_Last_Name LIKE ? OR o.Patient_Last_Name LIKE ?)"
-            # Make the match broader by only using the first few characters
-            name_prefix = last_name[:min(4, len(last_name))] if len(last_name) > 2 else last_name
-            params.append(f"{name_prefix}%")
-            params.append(f"%{name_prefix}%")
+        params = []
+        if use_order_search:
+            if in_window:
+                # Lists re-aggregated from the line items inside the window only
+                lists = ", ".join(
+                    f"""(SELECT GROUP_CONCAT(DISTINCT li.{column}) FROM line_items li
+                    WHERE li.Order_ID = s.Order_ID AND li.DOS BETWEEN ? AND ?) AS {alias}"""
+                    for column, alias in (('DOS', 'DOS_List'), ('CPT', 'CPT_List'),
+                                          ('Description', 'Description_List'))
+                )
+                params.extend([start_date, end_date] * 3)
+            else:
+                lists = "s.DOS_List, s.CPT_List, s.Description_List"
             
-        # Add first name filter with broader matching if provided
-        if first_name:
-            # Similar broader matching for first name
-            query += " AND (o.Patient_First_Name LIKE ? OR o.Patient_First_Name LIKE ?)"
-            name_prefix = first_name[:min(3, len(first_name))] if len(first_name) > 2 else first_name
-            params.append(f"{name_prefix}%")
-            params.append(f"%{name_prefix}%")
-        
-        # Add date range filter if DOS is provided
-        if dos_date:
-            start_date, end_date = get_date_range(dos_date, months_range)
-            if start_date and end_date:
-                # Add to query
-                query += " AND li.DOS BETWEEN ? AND ?"
-                params.append(start_date)
-                params.append(end_date)
+            where, where_params = _name_filters("s", first_name, last_name)
+            if in_window:
+                # Range index narrows to overlapping orders; the EXISTS probe
+                # (on the Order_ID/DOS index) keeps exact BETWEEN semantics
+                where += """ AND s.Min_DOS <= ? AND s.Max_DOS >= ?
+                AND EXISTS (SELECT 1 FROM line_items li
+                            WHERE li.Order_ID = s.Order_ID AND li.DOS BETWEEN ? AND ?)"""
+                where_params.extend([end_date, start_date, start_date, end_date])
+            
+            # Orders changed since the last sync are aggregated live (listed first so
+            # the limit never drops them); the rest come from the materialized table
+            dirty = "(SELECT Order_ID FROM order_search_dirty)"
+            query = live_query.format(
+                norm_columns=", NULL AS Norm_Last_Name, NULL AS Norm_First_Name",
+                where=f"o.Order_ID IN {dirty} AND {live_where}"
+            )
+            params = live_params + params
+            query += f"""
+            UNION ALL
+            SELECT s.Order_ID, s.FileMaker_Record_Number, s.Patient_Last_Name, s.Patient_First_Name,
+            s.PatientName, {lists},
+            s.Norm_Last_Name, s.Norm_First_Name
+            FROM order_search s
+            WHERE s.Order_ID NOT IN {dirty} AND {where}
+            """
+            params.extend(where_params)
+        else:
+            query = live_query.format(norm_columns="", where=live_where)
+            params.extend(live_params)
         
         # Add limit to prevent too many results
         # Increase the SQL limit to allow for later fuzzy filtering
         sql_limit = min(limit * 3, 200)  # Get more results than needed for fuzzy filtering
-        query += " GROUP BY o.Order_ID LIMIT ?"
+        query += " LIMIT ?"
         params.append(sql_limit)
         
         cursor = conn.cursor()
@@ -102,6 +350,48 @@ def search_by_name_and_dos(first_name=None, last_name=None, dos_date=None, month
     finally:
         conn.close()
 
+# Recent search results keyed by the exact search inputs, for the
+# auto-match candidates prefetched with the next files in a queue
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+def cached_search_by_name_and_dos(first_name=None, last_name=None, dos_date=None, months_range=None):
+    """
+    search_by_name_and_dos with a small in-memory LRU cache, for the
+    auto-match candidates the next-bundle endpoint computes ahead of time
+    (a reviewer moving back and forth doesn't re-run them). Interactive
+    searches call search_by_name_and_dos directly so they always see the
+    latest orders. Entries expire after AUTO_MATCH_CACHE['TTL'] seconds.
+    
+    Args:
+        first_name (str): Patient's first name
+        last_name (str): Patient's last name
+        dos_date (str): Date of service in any recognized format
+        months_range (int): Number of months before and after DOS to include in search
+        
+    Returns:
+        list: Matching records, as from search_by_name_and_dos (callers must not mutate them)
+    """
+    months_range = months_range or config.DEFAULT_MONTHS_RANGE
+    # The SQL uses the raw name prefixes, so only identical inputs share results
+    key = (first_name or '', last_name or '', dos_date or '', months_range)
+    now = time.monotonic()
+    
+    with _search_cache_lock:
+        hit = _search_cache.get(key)
+        if hit and now - hit[0] < config.AUTO_MATCH_CACHE['TTL']:
+            _search_cache.move_to_end(key)
+            return hit[1]
+    
+    results = search_by_name_and_dos(first_name, last_name, dos_date, months_range)
+    
+    with _search_cache_lock:
+        _search_cache[key] = (now, results)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > config.AUTO_MATCH_CACHE['MAX_ENTRIES']:
+            _search_cache.popitem(last=False)
+    return results
+
 def apply_fuzzy_matching(results, first_name, last_name):
     """
     Apply fuzzy matching to search results and filter/sort by match quality.
@@ -120,9 +410,13 @@ def apply_fuzzy_matching(results, first_name, last_name):
     normalized_search_last = enhanced_normalize_text(last_name) if last_name else ""
     
     for result in results:
-        # Get normalized versions of the database names
-        db_first_name = enhanced_normalize_text(result.get('Patient_First_Name', ''))
-        db_last_name = enhanced_normalize_text(result.get('Patient_Last_Name', ''))
+        # Get normalized versions of the database names (precomputed by order_search)
+        db_first_name = result.pop('Norm_First_Name', None)
+        if db_first_name is None:
+            db_first_name = enhanced_normalize_text(result.get('Patient_First_Name', ''))
+        db_last_name = result.pop('Norm_Last_Name', None)
+        if db_last_name is None:
+            db_last_name = enhanced_normalize_text(result.get('Patient_Last_Name', ''))
         
         # Calculate fuzzy match scores
         first_name_score = fuzz.ratio(normalized_search_first, db_first_name) if normalized_search_first and db_first_name else 0
@@ -197,6 +491,36 @@ def apply_date_proximity_sorting(results, dos_date):
     # Sort by proximity to target date
     results.sort(key=lambda x: x.get('days_from_target', 999999))
 
+# Every CPT code in cpt_codes, reloaded at most every CPT_DICTIONARY['TTL'] seconds
+_cpt_codes = {'loaded': None, 'codes': frozenset()}
+_cpt_codes_lock = threading.Lock()
+
+def cpt_code_set():
+    """
+    Get every known CPT code, for validating many codes at once.
+    
+    Returns:
+        frozenset: CPT codes (empty if the cpt_codes table isn't available)
+    """
+    now = time.monotonic()
+    with _cpt_codes_lock:
+        if _cpt_codes['loaded'] is not None and now - _cpt_codes['loaded'] < config.CPT_DICTIONARY['TTL']:
+            return _cpt_codes['codes']
+        
+        try:
+            conn = get_db_connection()
+            try:
+                codes = frozenset(str(row[0]).strip() for row in conn.execute("SELECT CPT FROM cpt_codes")
+                                  if row[0] is not None)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Database or table might not exist
+            print(f"CPT dictionary not available: {e}")
+            codes = frozenset()
+        _cpt_codes.update(loaded=now, codes=codes)
+        return codes
+
 def validate_cpt(cpt_code):
     """
     Validate a CPT code against the database.
@@ -0,0 +1,132 @@
+"""
+File utilities for crash-safe writes and moves between the review folders.
+"""
+import errno
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the temporary files written next to their destination
+TEMP_PREFIX = '.tmp-'
+
+def fsync_directory(folder):
+    """
+    Flush a directory entry change (create, rename, unlink) to disk.
+    Not supported on Windows, where it is skipped.
+
+    Args:
+        folder (Path): Directory whose entries changed
+    """
+    if os.name == 'nt':
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, data):
+    """
+    Write a file so readers (and OneDrive) only ever see the old or the new
+    content: write a temp file in the same folder, fsync it, then os.replace
+    it over the destination.
+
+    Args:
+        path (Path): Destination file
+        data (bytes): New content
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=TEMP_PREFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    fsync_directory(path.parent)
+
+def move_file(source, target, data=None):
+    """
+    Move a file between folders, rewriting it only if its content changes.
+
+    Unchanged content (data is None or identical to the source) is moved
+    with a single os.replace rename; changed content is written with
+    atomic_write and the source removed afterwards. Either way the target is
+    complete before the source disappears, and repeating a move that was
+    interrupted finishes it.
+
+    Args:
+        source (Path): File to move (may be None to only write the target)
+        target (Path): Destination file
+        data (bytes): New content for the target (None keeps the source content)
+
+    Returns:
+        str: 'renamed', 'written' or 'done' (already moved before)
+
+    Raises:
+        FileNotFoundError: If there is nothing to move (no data, no source and no target)
+    """
+    source = Path(source) if source else None
+    target = Path(target)
+
+    source_data = None
+    if data is not None and source is not None and source.exists():
+        source_data = source.read_bytes()
+
+    if data is None or data == source_data:
+        if source is None or not source.exists():
+            if target.exists():
+                return 'done'
+            raise FileNotFoundError(f"Neither {source} nor {target} exists")
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different volume: copy, then remove the source
+            atomic_write(target, source.read_bytes())
+            source.unlink()
+        fsync_directory(target.parent)
+        if source.parent != target.parent:
+            fsync_directory(source.parent)
+        return 'renamed'
+
+    atomic_write(target, data)
+    if source is not None and source.exists():
+        source.unlink()
+        fsync_directory(source.parent)
+    return 'written'
+
+def remove_stale_temp_files(folder, older_than=60):
+    """
+    Delete temp files left in a folder by writes that were interrupted.
+
+    Args:
+        folder (Path): Folder to clean
+        older_than (float): Only remove temp files at least this many seconds old
+
+    Returns:
+        int: Number of files removed
+    """
+    folder = Path(folder)
+    if not folder.exists():
+        return 0
+    removed = 0
+    cutoff = time.time() - older_than
+    for entry in os.scandir(folder):
+        if not entry.name.startswith(TEMP_PREFIX):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Could not remove temp file {entry.path}: {e}")
+    return removed
@@ -0,0 +1,690 @@
+"""
+HTTP helpers shared by the review blueprints for serving PDFs, rendered
+images and queue listings.
+"""
+from flask import jsonify, request, current_app, url_for, send_file
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import config
+from text_index import text_index
+from queue_index import queue_indexes, QUEUE_FIELDS, QUEUE_NUMERIC_FIELDS
+from list_query import ListQuery, apply_list_query
+from work_items import work_items, WorkItemConflict
+from text_utils import validate_filename, split_patient_name
+from db_utils import cached_search_by_name_and_dos
+from services.file_mover import file_mover
+from pdf_utils import (get_pdf_path, get_region_image, get_region_images, get_region_cache_key,
+                       resolve_existing_pdf, IMAGE_MIMETYPES,
+                       get_tile_image, get_tile_cache_key, get_thumbnail, get_thumbnail_cache_key, get_page_layout, parse_page_number,
+                       resolve_render_profile, PDFNotFoundError)
+
+# Query parameters that select how a region is rendered
+RENDER_OPTIONS = ('profile', 'scale', 'colorspace', 'format', 'quality')
+
+def render_options():
+    """
+    Collect the render profile options from the request query string.
+    
+    Returns:
+        dict: Render options passed by the client
+    """
+    return {option: request.args[option] for option in RENDER_OPTIONS if request.args.get(option)}
+
+def requested_page():
+    """
+    Get the zero-based page number from the ?page= query parameter.
+    
+    Returns:
+        int: Requested page (0 when not given)
+        
+    Raises:
+        ValueError: If the page is not a non-negative integer
+    """
+    return parse_page_number(request.args.get('page', 0))
+
+def current_reviewer():
+    """
+    Identify the reviewer making the request: the X-Reviewer header, else
+    the authenticated user, else the client address.
+    
+    The review pages don't send X-Reviewer or call the claim-next and lease
+    endpoints yet; they lease a file when it is opened, so reviewers using
+    the pages are told apart by REMOTE_USER or their address. The header is
+    for API clients that identify themselves.
+    
+    Returns:
+        str: Reviewer identifier used for leases and work-item history
+    """
+    return (request.headers.get('X-Reviewer') or request.environ.get('REMOTE_USER')
+            or request.remote_addr or 'unknown')
+
+def lease_ttl(data=None):
+    """
+    Get the lease length requested in a JSON body ('ttl' in seconds), capped
+    at WORK_ITEMS['MAX_LEASE_TTL'].
+    
+    Args:
+        data (dict): Request JSON (optional)
+        
+    Returns:
+        float: Lease length in seconds
+        
+    Raises:
+        ValueError: If ttl is not a positive number
+    """
+    ttl = (data or {}).get('ttl') or config.WORK_ITEMS['LEASE_TTL']
+    try:
+        ttl = float(ttl)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid ttl: {ttl}")
+    if ttl <= 0:
+        raise ValueError(f"Invalid ttl: {ttl}")
+    return min(ttl, config.WORK_ITEMS['MAX_LEASE_TTL'])
+
+logger = logging.getLogger(__name__)
+
+def send_image(data, etag, mimetype='image/png'):
+    """
+    Build a cacheable binary image response.
+    
+    Args:
+        data (bytes): Image data
+        etag (str): Strong validator identifying this exact image
+        mimetype (str): Image MIME type
+        
+    Returns:
+        Response: Image response, or 304 if the client already has this version
+    """
+    response = current_app.response_class(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = config.IMAGE_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+def not_modified(etag):
+    """
+    Build a 304 response for a client whose cached copy matches etag.
+    
+    Args:
+        etag (str): Validator of the current representation
+        
+    Returns:
+        Response: Empty 304 response carrying the validator and caching headers
+    """
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = config.IMAGE_CACHE_MAX_AGE
+    return response
+
+def pdf_etag(pdf_path):
+    """
+    Build a validator for a PDF from its modification time and size.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        
+    Returns:
+        str: ETag value that changes whenever the file is replaced or rewritten
+    """
+    stat = pdf_path.stat()
+    return f"pdf-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def pdf_response(filename):
+    """
+    Serve the PDF for a JSON or PDF filename to the browser viewers.
+    
+    Supports HTTP Range requests (206 partial content, so PDF.js can stream
+    pages), ETag/Last-Modified validators with 304 responses, and sends the
+    file through the server's sendfile support (or X-Sendfile when
+    USE_X_SENDFILE is enabled) rather than reading it into memory.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        
+    Returns:
+        Response: PDF response (200/206/304/416) or a JSON 404 error
+    """
+    pdf_path = get_pdf_path(filename)
+    if not pdf_path.exists():
+        return jsonify({'error': 'PDF not found'}), 404
+    
+    etag = pdf_etag(pdf_path)
+    # Answer revalidations without opening the file
+    if request.if_none_match and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = config.PDF_CACHE_MAX_AGE
+        return response
+    
+    response = send_file(
+        pdf_path,
+        mimetype='application/pdf',
+        conditional=True,
+        etag=etag,
+        max_age=config.PDF_CACHE_MAX_AGE
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+def region_image_response(filename, region):
+    """
+    Serve a PDF region as a binary image with ETag/Cache-Control validators.
+    Honors the optional ?page= parameter and the ?profile=, ?scale=, ?colorspace=,
+    ?format= and ?quality= render parameters (see config.RENDER_PROFILES).
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        region (str): The configured region name
+        
+    Returns:
+        Response: Image response, 304, or a JSON error (404 missing PDF, 422 unrenderable)
+    """
+    try:
+        options = render_options()
+        page_number = requested_page()
+        
+        # Answer revalidations without touching the cache or the PDF renderer
+        if request.if_none_match and region in config.PDF_REGIONS:
+            pdf_path = get_pdf_path(filename)
+            if pdf_path.exists():
+                etag = get_region_cache_key(pdf_path, region, resolve_render_profile(region, options), page_number)
+                if request.if_none_match.contains(etag):
+                    return not_modified(etag)
+        
+        img_data, etag, mimetype = get_region_image(filename, region, options, page_number)
+        return send_image(img_data, etag, mimetype)
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        logger.error(f"Error serving region image {region} for {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def regions_response(filename, image_endpoint):
+    """
+    Render every configured region of a PDF from a single page render and
+    return URLs to the cached images.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        image_endpoint (str): Endpoint serving a single region image
+            (e.g. 'unmapped.get_pdf_region_image')
+        
+    Returns:
+        Response: JSON {'regions': {name: {'url', 'etag', 'mimetype'}}} or a JSON error
+    """
+    try:
+        options = render_options()
+        page_number = requested_page()
+        images = get_region_images(filename, options, page_number)
+        
+        regions = {}
+        for region_name, (_, etag, mimetype) in images.items():
+            # The version parameter makes each rendering its own URL for the browser cache
+            regions[region_name] = {
+                'url': url_for(image_endpoint, filename=filename, region=region_name,
+                               page=page_number, v=etag[:16], **options),
+                'etag': etag,
+                'mimetype': mimetype
+            }
+        return jsonify({'regions': regions})
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        logger.error(f"Error rendering regions for {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def tile_response(filename, page, zoom, x, y):
+    """
+    Serve one fixed-size tile of a PDF page as a binary image with validators.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        page (int): Zero-based page number
+        zoom (int): Index into config.PDF_TILES['ZOOM_LEVELS']
+        x (int): Tile column
+        y (int): Tile row
+        
+    Returns:
+        Response: Image response, 304, or a JSON error (404 missing PDF, 422 bad tile)
+    """
+    try:
+        # Answer revalidations without touching the cache or the PDF renderer
+        if request.if_none_match:
+            pdf_path = get_pdf_path(filename)
+            if pdf_path.exists():
+                etag = get_tile_cache_key(pdf_path, page, zoom, x, y)
+                if request.if_none_match.contains(etag):
+                    return not_modified(etag)
+        
+        img_data, etag, mimetype = get_tile_image(filename, page, zoom, x, y)
+        return send_image(img_data, etag, mimetype)
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        logger.error(f"Error serving tile {page}/{zoom}/{x}/{y} for {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def page_layout_response(filename, tile_endpoint):
+    """
+    Describe the pages and tile grids of a PDF for the lazy-loading viewer.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        tile_endpoint (str): Endpoint serving tiles (e.g. 'unmapped.get_pdf_tile')
+        
+    Returns:
+        Response: JSON layout from get_page_layout plus a tile URL template with
+            {page}, {zoom}, {x} and {y} placeholders, or a JSON error
+    """
+    try:
+        layout = get_page_layout(filename)
+        template = url_for(tile_endpoint, filename=filename, page=0, zoom=0, x=0, y=0)
+        # Swap the trailing /0/0/0/0 for placeholders the viewer fills in
+        layout['tile_url'] = template[:template.rindex('/0/0/0/0')] + '/{page}/{zoom}/{x}/{y}'
+        return jsonify(layout)
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error reading page layout for {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def thumbnail_response(filename, kind):
+    """
+    Serve a listing thumbnail (first page or header crop) as a JPEG with validators.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        kind (str): One of config.THUMBNAIL_KINDS
+        
+    Returns:
+        Response: JPEG response, 304, or a JSON error (404 missing PDF, 422 bad kind)
+    """
+    try:
+        # Answer revalidations without touching the cache or the PDF renderer
+        if request.if_none_match and kind in config.THUMBNAIL_KINDS:
+            pdf_path = get_pdf_path(filename)
+            if pdf_path.exists():
+                etag = get_thumbnail_cache_key(pdf_path, kind)
+                if request.if_none_match.contains(etag):
+                    return not_modified(etag)
+        
+        img_data, etag, mimetype = get_thumbnail(filename, kind)
+        return send_image(img_data, etag, mimetype)
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        logger.error(f"Error serving {kind} thumbnail for {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def thumbnail_urls(filenames, thumbnail_endpoint):
+    """
+    Build the thumbnail URLs for a file listing. No PDF is opened here; the
+    images are rendered (or served from the prerendered cache) when requested.
+    
+    Args:
+        filenames (Iterable[str]): JSON filenames in the listing
+        thumbnail_endpoint (str): Endpoint serving thumbnails (e.g. 'unmapped.get_thumbnail')
+        
+    Returns:
+        dict: Filename -> {kind: URL} for every kind in config.THUMBNAIL_KINDS
+    """
+    return {
+        filename: {kind: url_for(thumbnail_endpoint, filename=filename, kind=kind)
+                   for kind in config.THUMBNAIL_KINDS}
+        for filename in filenames
+    }
+
+def text_search_response():
+    """
+    Search the PDF text index for a patient name, CPT code, TIN or other text.
+    Query parameters: q (required), file (restrict to one JSON/PDF filename)
+    and limit.
+    
+    Returns:
+        Response: JSON {'results': [{'name', 'page', 'snippet', 'boxes'}]} with
+            highlight boxes as ratios of the page size, or a JSON error
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Please provide a search query'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', config.TEXT_INDEX['SEARCH_LIMIT']))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    try:
+        filename = request.args.get('file')
+        name = get_pdf_path(filename).name if filename else None
+        results = text_index.search(query, name=name, limit=max(1, min(limit, 200)))
+        return jsonify({'results': results})
+    except Exception as e:
+        logger.error(f"Error searching PDF text for '{query}': {e}")
+        return jsonify({'error': str(e)}), 500
+
+def file_list_response(queue, thumbnail_endpoint):
+    """
+    List a review queue from its cached index with per-file metadata.
+    Query parameters (see list_query.ListQuery): sort (a QUEUE_FIELDS field,
+    default name), order ('asc' or 'desc'), q (text in the filename, patient
+    name or TIN), exact filters on any QUEUE_FIELDS field (e.g. ?tin=...),
+    and limit/cursor for pages (LIST_PAGINATION['DEFAULT_LIMIT'] files when no
+    limit is given).
+    
+    Args:
+        queue (str): Queue name in queue_index.queue_indexes
+        thumbnail_endpoint (str): Endpoint serving thumbnails (e.g. 'unmapped.get_thumbnail')
+        
+    Returns:
+        Response: JSON with 'files' (filenames), 'items' (metadata), 'total'
+            (matches across all pages), 'next_cursor' and 'thumbnails', or a
+            JSON 400 error for bad parameters
+    """
+    try:
+        query = ListQuery.from_args(request.args, QUEUE_FIELDS, 'name')
+    except ValueError as e:
+        return jsonify({'error': str(e), 'files': []}), 400
+    
+    result = apply_list_query(queue_indexes[queue].entries(), query, 'name',
+                              search_fields=('name', 'patient_name', 'tin'),
+                              numeric_fields=QUEUE_NUMERIC_FIELDS)
+    files = [entry['name'] for entry in result['items']]
+    return jsonify({
+        'files': files,
+        'items': result['items'],
+        'total': result['total'],
+        'next_cursor': result['next_cursor'],
+        'thumbnails': thumbnail_urls(files, thumbnail_endpoint)
+    })
+
+def work_item_response(filename):
+    """
+    Describe a file's work item: its current state, assignee, content hash,
+    transition history and any JSON Patches it was corrected with.
+    
+    Args:
+        filename (str): JSON filename
+        
+    Returns:
+        Response: JSON work item with 'history' and 'patches' lists, or a JSON 404 error
+    """
+    try:
+        item = work_items.get(filename)
+        if item is None:
+            return jsonify({'error': f'No work item for {filename}'}), 404
+        item['history'] = work_items.history(filename)
+        item['patches'] = work_items.patches(filename)
+        return jsonify(item)
+    except Exception as e:
+        logger.error(f"Error loading work item {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def _lease_payload(item, ttl):
+    return {
+        'filename': item['name'],
+        'assignee': item['assignee'],
+        'lease_expires': item['lease_expires'],
+        'ttl': ttl
+    }
+
+def claim_next_response(queue):
+    """
+    Lease the next unclaimed file in a queue to the requesting reviewer.
+    Body (optional): 'ttl' in seconds and 'after' to skip to files after a filename.
+    
+    Args:
+        queue (str): Queue name in queue_index.queue_indexes
+        
+    Returns:
+        Response: JSON with the filename, assignee, lease_expires (Unix time),
+            ttl and the file's list metadata; filename is null when every file
+            in the queue is claimed
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        ttl = lease_ttl(data)
+        after = validate_filename(data['after']) if data.get('after') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        index = queue_indexes[queue]
+        index.refresh()     # Pick up files that arrived since the last scan
+        item = work_items.claim_next(index.state, current_reviewer(), ttl, after)
+        if item is None:
+            return jsonify({'filename': None, 'message': 'No unclaimed files in the queue'})
+        payload = _lease_payload(item, ttl)
+        payload['item'] = index.get(item['name'])
+        return jsonify(payload)
+    except Exception as e:
+        logger.error(f"Error claiming next file in {queue}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def renew_lease_response():
+    """
+    Extend the requesting reviewer's lease on a file. Body: 'filename' and optional 'ttl'.
+    
+    Returns:
+        Response: JSON lease, or a JSON 409 error if the file isn't claimed by the reviewer
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = validate_filename(data.get('filename', ''))
+        ttl = lease_ttl(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not filename:
+        return jsonify({'error': 'Filename is required'}), 400
+    
+    try:
+        return jsonify(_lease_payload(work_items.renew(filename, current_reviewer(), ttl), ttl))
+    except WorkItemConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error renewing lease on {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def release_lease_response():
+    """
+    Release the requesting reviewer's lease on a file. Body: 'filename'.
+    
+    Returns:
+        Response: JSON message, or a JSON 409 error if another reviewer holds the lease
+    """
+    data = request.get_json(silent=True) or {}
+    filename = validate_filename(data.get('filename', ''))
+    if not filename:
+        return jsonify({'error': 'Filename is required'}), 400
+    
+    try:
+        work_items.release(filename, current_reviewer())
+        return jsonify({'message': 'Lease released'})
+    except WorkItemConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error releasing lease on {filename}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def bulk_action_response(action, queues):
+    """
+    Apply a single-file workflow action to many files in one request.
+    
+    Body: 'items', a list of per-file payloads (each with 'filename' plus the
+    fields the single-file endpoint takes), or 'filenames' for files that need
+    nothing else. Any other top-level field is a default for every item, e.g.
+    {"filenames": [...], "notes": "..."}. Items are processed in a thread pool;
+    each records its transition independently, so one failure doesn't stop
+    the rest, and the queued moves are then applied as one batch.
+    
+    Args:
+        action (callable): action(payload, actor) -> (body dict, HTTP status)
+        queues (Iterable[str]): Queue indexes to invalidate afterwards
+        
+    Returns:
+        Response: JSON with per-item 'results' (filename, status and the
+            single-file response body), 'succeeded' and 'failed' counts
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if items is None:
+        items = [{'filename': filename} for filename in data.get('filenames', [])]
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': "'items' must be a list of objects"}), 400
+    if not items:
+        return jsonify({'error': 'No files given'}), 400
+    if len(items) > config.BULK_ACTIONS['MAX_ITEMS']:
+        return jsonify({'error': f"At most {config.BULK_ACTIONS['MAX_ITEMS']} files per request"}), 400
+    
+    defaults = {key: value for key, value in data.items() if key not in ('items', 'filenames')}
+    actor = current_reviewer()
+    
+    def run(item):
+        payload = dict(defaults, **item)
+        try:
+            body, status = action(payload, actor)
+        except Exception as e:
+            logger.error(f"Bulk {action.__name__} failed for {payload.get('filename')}: {e}")
+            body, status = {'error': str(e)}, 500
+        return dict(body, filename=payload.get('filename'), status=status)
+    
+    workers = max(1, min(config.BULK_ACTIONS['WORKERS'], len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, items))
+    
+    succeeded = sum(1 for result in results if result['status'] == 200)
+    if succeeded:
+        file_mover.wake()
+        for queue in queues:
+            queue_indexes[queue].invalidate()
+    
+    return jsonify({
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    })
+
+def patient_info(entry):
+    """
+    Build the search pre-fill for a queued file from its index entry.
+    
+    Args:
+        entry (dict): Queue index entry
+        
+    Returns:
+        dict: first_name, last_name and dos
+    """
+    first_name, last_name = split_patient_name(entry.get('patient_name'))
+    return {
+        'first_name': first_name or "",
+        'last_name': last_name or "",
+        'dos': entry.get('first_dos') or ''
+    }
+
+def region_urls(filename, image_endpoint):
+    """
+    Get the URLs of a PDF's default region images without rendering them
+    (the URLs carry the render cache key, as in regions_response).
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        image_endpoint (str): Endpoint serving a single region image
+        
+    Returns:
+        dict: {region: {'url', 'etag', 'mimetype'}}
+        
+    Raises:
+        PDFNotFoundError: If the PDF doesn't exist
+    """
+    pdf_path = resolve_existing_pdf(filename)
+    regions = {}
+    for region_name in config.PDF_REGIONS:
+        profile = resolve_render_profile(region_name, {})
+        etag = get_region_cache_key(pdf_path, region_name, profile)
+        regions[region_name] = {
+            'url': url_for(image_endpoint, filename=filename, region=region_name, page=0, v=etag[:16]),
+            'etag': etag,
+            'mimetype': IMAGE_MIMETYPES[profile['format']]
+        }
+    return regions
+
+def next_bundle_response(queue, load_file, image_endpoint, with_matches=True):
+    """
+    Return everything the review screen needs for the next files in a queue,
+    so the page can prefetch them while the reviewer works on the current one.
+    Query parameters: after (filename; files after it in queue order, from the
+    start when omitted) and n (number of files). Files other reviewers have
+    claimed are skipped.
+    
+    Args:
+        queue (str): Queue name in queue_index.queue_indexes
+        load_file (callable): load_file(filename) -> parsed JSON as /api/file returns it
+        image_endpoint (str): Endpoint serving a single region image
+        with_matches (bool): Include auto-match candidates from the name/DOS search
+        
+    Returns:
+        Response: JSON {'files': [{'filename', 'item', 'data', 'patient_info',
+            'regions', 'matches'}], 'next_after'}; per-file problems are reported
+            in that file's 'errors' instead of failing the bundle
+    """
+    try:
+        after = validate_filename(request.args.get('after', ''))
+        count = int(request.args.get('n', config.NEXT_BUNDLE['DEFAULT_COUNT']))
+        if count < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f"Invalid n: {request.args.get('n')}"}), 400
+    count = min(count, config.NEXT_BUNDLE['MAX_COUNT'])
+    
+    try:
+        index = queue_indexes[queue]
+        claimed = work_items.leased_by_others(index.state, current_reviewer())
+        entries = [entry for entry in index.entries()
+                   if entry['name'] > after and entry['name'] not in claimed][:count]
+        
+        def build(entry):
+            # Runs in a worker thread: no request context, so URLs are built by the caller
+            bundle = {'filename': entry['name'], 'item': entry, 'patient_info': patient_info(entry), 'errors': {}}
+            try:
+                bundle['data'] = load_file(entry['name'])
+            except Exception as e:
+                bundle['data'] = None
+                bundle['errors']['data'] = str(e)
+            bundle['matches'] = None
+            info = bundle['patient_info']
+            if with_matches and config.FEATURES.get('AUTO_SEARCH') and (info['first_name'] or info['last_name']):
+                try:
+                    bundle['matches'] = cached_search_by_name_and_dos(info['first_name'], info['last_name'],
+                                                                      info['dos'])
+                except Exception as e:
+                    bundle['errors']['matches'] = str(e)
+            return bundle
+        
+        # File reads and searches overlap instead of running one after another
+        with ThreadPoolExecutor(max_workers=max(1, len(entries))) as pool:
+            files = list(pool.map(build, entries))
+        
+        for bundle in files:
+            try:
+                bundle['regions'] = region_urls(bundle['filename'], image_endpoint)
+            except Exception as e:
+                bundle['regions'] = None
+                bundle['errors']['regions'] = str(e)
+        
+        return jsonify({
+            'files': files,
+            'next_after': files[-1]['filename'] if files else None
+        })
+    except Exception as e:
+        logger.error(f"Error building next bundle for {queue}: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,141 @@
+"""
+Minimal JSON Patch (RFC 6902) support for diff-based saves.
+"""
+import copy
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+class JsonPatchError(ValueError):
+    """Raised when a patch is malformed or doesn't apply to the document."""
+
+def parse_pointer(pointer):
+    """
+    Split a JSON Pointer (RFC 6901) into reference tokens.
+
+    Args:
+        pointer (str): Pointer such as '/service_lines/0/cpt'
+
+    Returns:
+        list: Unescaped tokens ('' for the whole document gives [])
+
+    Raises:
+        JsonPatchError: If the pointer is malformed
+    """
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == '':
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _array_index(container, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+def _resolve(document, tokens):
+    """Walk to the value a list of tokens points at."""
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(value, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return value
+
+def _add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar at /{'/'.join(tokens[:-1])}")
+    return document
+
+def _remove(document, tokens):
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, token))
+    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+def _replace(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        parent[token] = value      # In place, so key order is kept
+    elif isinstance(parent, list):
+        parent[_array_index(parent, token)] = value
+    else:
+        raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return document
+
+def apply_patch(document, patch):
+    """
+    Apply a JSON Patch to a document. The patch is all-or-nothing: the input
+    document is not modified and nothing is returned if any operation fails.
+
+    Args:
+        document: Parsed JSON document
+        patch (list): Operations ({'op', 'path', 'value'/'from'})
+
+    Returns:
+        The patched document (a new object)
+
+    Raises:
+        JsonPatchError: If the patch is malformed, a path doesn't exist or a test fails
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError("Patch must be a list of operations")
+
+    result = copy.deepcopy(document)
+    for number, operation in enumerate(patch):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise JsonPatchError(f"Invalid operation at index {number}")
+        op = operation['op']
+        tokens = parse_pointer(operation.get('path'))
+
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f"Operation {number} ({op}) needs a value")
+
+        if op == 'add':
+            result = _add(result, tokens, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            _remove(result, tokens)
+        elif op == 'replace':
+            result = _replace(result, tokens, copy.deepcopy(operation['value']))
+        elif op == 'test':
+            if _resolve(result, tokens) != operation['value']:
+                raise JsonPatchError(f"Test failed at {operation['path']}")
+        else:
+            source = parse_pointer(operation.get('from'))
+            if op == 'move':
+                if tokens[:len(source)] == source and tokens != source:
+                    raise JsonPatchError(f"Cannot move {operation['from']} into itself")
+                value = _remove(result, source)
+            else:
+                value = copy.deepcopy(_resolve(result, source))
+            result = _add(result, tokens, value)
+    return result
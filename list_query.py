@@ -0,0 +1,209 @@
+"""
+Server-side filtering, sorting and cursor pagination shared by the list endpoints.
+"""
+import base64
+import json
+from functools import cmp_to_key
+import config
+
+# Query parameters with a fixed meaning; every other listed field is a filter
+RESERVED_PARAMS = ('sort', 'order', 'q', 'limit', 'cursor')
+
+class ListQuery:
+    """
+    A parsed list request: sort field and direction, free-text search, exact
+    field filters and a page size/cursor.
+
+    Items are ordered by (blank last, sort value, key), which is a total order,
+    so a cursor holding the last item's position stays valid when items are
+    added to or removed from the list between requests (keyset pagination).
+    """
+
+    def __init__(self, sort, descending=False, q='', filters=None, limit=None, cursor=None):
+        """
+        Initialize the query.
+
+        Args:
+            sort (str): Field to sort by
+            descending (bool): Largest values first
+            q (str): Case-insensitive text every item must contain in a search field
+            filters (dict): Field -> value every item must match
+            limit (int): Page size (None returns every match)
+            cursor (list): Decoded position of the last item of the previous page
+        """
+        self.sort = sort
+        self.descending = descending
+        self.q = q
+        self.filters = filters or {}
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args, fields, default_sort):
+        """
+        Parse a list query from request arguments.
+
+        Args:
+            args (MultiDict): request.args
+            fields (Iterable[str]): Fields that may be sorted and filtered on
+            default_sort (str): Sort field when none is given
+
+        Returns:
+            ListQuery: Parsed query
+
+        Raises:
+            ValueError: If a parameter is invalid
+        """
+        sort = args.get('sort') or default_sort
+        if sort not in fields:
+            raise ValueError(f"Invalid sort field: {sort}")
+
+        order = (args.get('order') or 'asc').lower()
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Invalid order: {order}")
+
+        # Every request gets a page; clients follow next_cursor for the rest
+        limit = args.get('limit')
+        if limit:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise ValueError(f"Invalid limit: {limit}")
+            limit = max(1, min(limit, config.LIST_PAGINATION['MAX_LIMIT']))
+        else:
+            limit = config.LIST_PAGINATION['DEFAULT_LIMIT']
+
+        cursor = args.get('cursor')
+        cursor = decode_cursor(cursor, sort, order == 'desc') if cursor else None
+
+        filters = {field: args.get(field) for field in fields
+                   if field not in RESERVED_PARAMS and args.get(field) not in (None, '')}
+
+        return cls(sort, order == 'desc', (args.get('q') or '').strip(), filters, limit, cursor)
+
+def encode_cursor(position, sort, descending):
+    """
+    Encode the position of the last item on a page as an opaque cursor.
+
+    Args:
+        position (tuple): (blank flag, sort value, key) of the item
+        sort (str): Sort field the position belongs to
+        descending (bool): Sort direction the position belongs to
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = json.dumps({'p': list(position), 's': sort, 'd': descending}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort, descending):
+    """
+    Decode a cursor produced by encode_cursor for the same sort.
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for a different sort
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = data['p']
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if data.get('s') != sort or data.get('d') != descending or len(position) != 3:
+        raise ValueError("Cursor does not match the requested sort")
+    return position
+
+def _sort_value(value, numeric):
+    """Normalize a field value for sorting; returns (blank flag, value)."""
+    if value is None or value == '' or value == []:
+        return 1, ''
+    if numeric:
+        try:
+            return 0, float(str(value).replace('$', '').replace(',', ''))
+        except ValueError:
+            return 1, ''
+    if isinstance(value, (list, tuple, set)):
+        return 0, len(value)
+    return 0, str(value).lower()
+
+def _matches_filter(value, wanted):
+    if isinstance(value, (list, tuple, set)):
+        return any(str(item).lower() == wanted for item in value)
+    return str(value if value is not None else '').lower() == wanted
+
+def _matches_text(item, q, search_fields):
+    for field in search_fields:
+        value = item.get(field)
+        if isinstance(value, (list, tuple, set)):
+            value = ' '.join(str(part) for part in value)
+        if value is not None and q in str(value).lower():
+            return True
+    return False
+
+def apply_list_query(items, query, key_field, search_fields=(), numeric_fields=()):
+    """
+    Filter, sort and paginate a list of dicts.
+
+    Args:
+        items (list): Items to list
+        query (ListQuery): Parsed request
+        key_field (str): Field that uniquely identifies an item (tie-breaker)
+        search_fields (Iterable[str]): Fields the free-text search looks in
+        numeric_fields (Iterable[str]): Fields compared as numbers (currency
+            strings like '$1,200.00' included)
+
+    Returns:
+        dict: 'items' (the page), 'total' (matches across all pages) and
+            'next_cursor' (None on the last page)
+    """
+    q = query.q.lower()
+    filters = {field: str(value).lower() for field, value in query.filters.items()}
+    matched = [
+        item for item in items
+        if all(_matches_filter(item.get(field), wanted) for field, wanted in filters.items())
+        and (not q or _matches_text(item, q, search_fields))
+    ]
+
+    numeric = query.sort in numeric_fields
+
+    def position(item):
+        blank, value = _sort_value(item.get(query.sort), numeric)
+        return (blank, value, str(item.get(key_field, '')))
+
+    def compare(a, b):
+        if a[0] != b[0]:
+            return -1 if a[0] < b[0] else 1          # Blank values always last
+        if a[1] != b[1]:
+            result = -1 if a[1] < b[1] else 1
+            return -result if query.descending else result
+        if a[2] != b[2]:
+            return -1 if a[2] < b[2] else 1
+        return 0
+
+    positions = sorted(((position(item), item) for item in matched),
+                       key=cmp_to_key(lambda a, b: compare(a[0], b[0])))
+
+    start = 0
+    if query.cursor is not None:
+        cursor = tuple(query.cursor)
+        # First item strictly after the cursor position
+        low, high = 0, len(positions)
+        while low < high:
+            mid = (low + high) // 2
+            if compare(positions[mid][0], cursor) <= 0:
+                low = mid + 1
+            else:
+                high = mid
+        start = low
+
+    end = len(positions) if query.limit is None else start + query.limit
+    page = positions[start:end]
+    next_cursor = None
+    if end < len(positions) and page:
+        next_cursor = encode_cursor(page[-1][0], query.sort, query.descending)
+
+    return {
+        'items': [item for _, item in page],
+        'total': len(matched),
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,201 @@
+"""
+Persistent filename index over the PDF archive, used to resolve JSON
+filenames to PDFs without listing the archive folder on every request.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class PDFArchiveIndex:
+    """
+    In-memory maps of the PDF filenames in a folder: exact names, lower-case
+    names, lower-case stems and a trigram map for substring lookups.
+
+    The folder is re-listed with os.scandir only when its mtime changes (it
+    changes whenever a file is added, removed or renamed), checked at most
+    once per refresh_interval seconds, and only the added/removed names are
+    applied to the maps. The name list is persisted so a restart doesn't need
+    a full scan when the folder hasn't changed.
+    """
+
+    def __init__(self, folder, index_path=None, refresh_interval=10):
+        """
+        Initialize the index. Nothing is scanned until the first lookup.
+
+        Args:
+            folder (Path): Folder containing the PDFs
+            index_path (Path): JSON file the name list is persisted to (optional)
+            refresh_interval (float): Minimum seconds between folder mtime checks
+        """
+        self.folder = Path(folder)
+        self.index_path = Path(index_path) if index_path else None
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._names = set()
+        self._lower = {}
+        self._stems = {}
+        self._trigram_map = {}
+        self._folder_mtime_ns = None
+        self._last_check = 0.0
+        self._loaded = False
+
+    def _add(self, name):
+        lower = name.lower()
+        self._names.add(name)
+        self._lower.setdefault(lower, name)
+        self._stems.setdefault(Path(lower).stem, name)
+        for gram in _trigrams(lower):
+            self._trigram_map.setdefault(gram, set()).add(name)
+
+    def _remove(self, name):
+        lower = name.lower()
+        self._names.discard(name)
+        if self._lower.get(lower) == name:
+            del self._lower[lower]
+        stem = Path(lower).stem
+        if self._stems.get(stem) == name:
+            del self._stems[stem]
+        for gram in _trigrams(lower):
+            names = self._trigram_map.get(gram)
+            if names:
+                names.discard(name)
+                if not names:
+                    del self._trigram_map[gram]
+
+    def _load_persisted(self):
+        """Load the persisted name list if it was saved for the folder's current mtime."""
+        if not self.index_path or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('folder') != str(self.folder):
+                return
+            for name in saved.get('names', []):
+                self._add(name)
+            self._folder_mtime_ns = saved.get('folder_mtime_ns')
+            logger.info(f"Loaded PDF archive index with {len(self._names)} names")
+        except Exception as e:
+            logger.warning(f"Could not load PDF archive index {self.index_path}: {e}")
+
+    def _persist(self):
+        if not self.index_path:
+            return
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.index_path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'folder': str(self.folder),
+                    'folder_mtime_ns': self._folder_mtime_ns,
+                    'names': sorted(self._names)
+                }, f)
+            os.replace(tmp_name, self.index_path)
+        except Exception as e:
+            logger.warning(f"Could not persist PDF archive index {self.index_path}: {e}")
+
+    def refresh(self, force=False):
+        """
+        Re-list the folder if it changed since the last refresh and apply the differences.
+
+        Args:
+            force (bool): Check the folder even if refresh_interval hasn't elapsed
+
+        Returns:
+            bool: True if the index changed
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load_persisted()
+                self._loaded = True
+                force = True
+
+            now = time.monotonic()
+            if not force and now - self._last_check < self.refresh_interval:
+                return False
+            self._last_check = now
+
+            try:
+                folder_mtime_ns = self.folder.stat().st_mtime_ns
+            except OSError:
+                return False
+            if folder_mtime_ns == self._folder_mtime_ns:
+                return False
+
+            start = time.monotonic()
+            current = {entry.name for entry in os.scandir(self.folder)
+                       if entry.name.lower().endswith('.pdf')}
+            added = current - self._names
+            removed = self._names - current
+            for name in removed:
+                self._remove(name)
+            for name in added:
+                self._add(name)
+            self._folder_mtime_ns = folder_mtime_ns
+
+            logger.info(f"PDF archive index refreshed in {time.monotonic() - start:.2f}s: "
+                        f"{len(added)} added, {len(removed)} removed, {len(self._names)} total")
+            self._persist()
+            return True
+
+    def _find(self, base_name):
+        lower = base_name.lower()
+
+        # Case-insensitive exact name, then stem
+        name = self._lower.get(f"{lower}.pdf") or self._stems.get(lower)
+        if name:
+            return name
+
+        # Substring match, narrowed by the trigram map
+        if len(lower) >= 3:
+            postings = [self._trigram_map.get(gram) for gram in _trigrams(lower)]
+            if not all(postings):
+                return None
+            candidates = set.intersection(*sorted(postings, key=len))
+        else:
+            candidates = self._names
+        matches = [name for name in candidates if lower in name.lower()]
+        return min(matches) if matches else None
+
+    def resolve(self, base_name):
+        """
+        Find the PDF for a base filename (no extension).
+        Tries the exact and case-insensitive name, then the first PDF (by name)
+        whose filename contains base_name.
+
+        Args:
+            base_name (str): Filename stem to look up
+
+        Returns:
+            Path: Path to the matching PDF, or None if there is no match
+        """
+        with self._lock:
+            self.refresh()
+            name = self._find(base_name)
+
+        if name:
+            path = self.folder / name
+            if path.exists():
+                return path
+            # The folder changed since the last refresh; look again against a fresh listing
+            with self._lock:
+                self.refresh(force=True)
+                name = self._find(base_name)
+            if name:
+                return self.folder / name
+        return None
+
+# Shared index over the configured PDF archive
+pdf_index = PDFArchiveIndex(config.FOLDERS['PDF_FOLDER'], config.PDF_INDEX_PATH,
+                            config.PDF_INDEX_REFRESH_INTERVAL)
@@ -0,0 +1,126 @@
+"""
+Pool of open PyMuPDF documents shared by the rendering functions.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import fitz  # PyMuPDF
+import config
+
+logger = logging.getLogger(__name__)
+
+class _PooledDocument:
+    """An open document plus the lock that serializes access to it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.doc = None
+        self.lock = threading.Lock()
+        self.users = 0
+
+    def close(self):
+        if self.doc is not None:
+            try:
+                self.doc.close()
+            except Exception as e:
+                logger.warning(f"Error closing PDF {self.path}: {e}")
+            self.doc = None
+
+class DocumentPool:
+    """
+    Bounded LRU of open fitz.Document handles keyed by path, mtime and size.
+
+    PyMuPDF objects aren't thread-safe, so each document has its own lock and
+    only one thread uses it at a time; different documents render in parallel.
+    Documents are closed explicitly when evicted or when their file changes.
+    Documents in use are never closed; the pool briefly exceeds max_open
+    instead.
+    """
+
+    def __init__(self, max_open=8):
+        """
+        Initialize the pool.
+
+        Args:
+            max_open (int): Maximum number of idle documents kept open
+        """
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(pdf_path):
+        stat = os.stat(pdf_path)
+        return (str(Path(pdf_path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+    def _evict_locked(self):
+        """Pop entries that should be closed. Caller holds the pool lock."""
+        to_close = []
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_open:
+                break
+            entry = self._entries[key]
+            if entry.users == 0:
+                del self._entries[key]
+                to_close.append(entry)
+        return to_close
+
+    @contextmanager
+    def open(self, pdf_path):
+        """
+        Borrow an open document, holding its lock for the duration of the block.
+
+        Args:
+            pdf_path (Path): Path to the PDF file
+
+        Yields:
+            fitz.Document: The open document
+        """
+        key = self._key(pdf_path)
+        to_close = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Drop idle handles to older versions of the same file
+                for other_key in [k for k in self._entries if k[0] == key[0]]:
+                    if self._entries[other_key].users == 0:
+                        to_close.append(self._entries.pop(other_key))
+                entry = _PooledDocument(pdf_path)
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+            entry.users += 1
+            to_close.extend(self._evict_locked())
+
+        for stale in to_close:
+            stale.close()
+
+        try:
+            with entry.lock:
+                if entry.doc is None:
+                    entry.doc = fitz.open(pdf_path)
+                yield entry.doc
+        finally:
+            to_close = []
+            with self._lock:
+                entry.users -= 1
+                if self._entries.get(key) is not entry and entry.users == 0:
+                    # Replaced or evicted while we were using it
+                    to_close.append(entry)
+                to_close.extend(self._evict_locked())
+            for stale in to_close:
+                stale.close()
+
+    def close_all(self):
+        """Close every idle document in the pool."""
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if entry.users == 0]
+            to_close = [self._entries.pop(key) for key in idle]
+        for entry in to_close:
+            entry.close()
+
+# Shared pool used by the PDF rendering functions
+document_pool = DocumentPool(config.PDF_DOCUMENT_POOL_SIZE)
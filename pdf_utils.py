@@ -3,16 +3,51 @@ PDF utilities for handling PDF files and extracting regions.
 """
 import fitz  # PyMuPDF
 import base64
+import math
 from pathlib import Path
 import config
+from render_cache import render_cache, RenderCache
+from pdf_index import pdf_index
+from pdf_pool import document_pool
 from text_utils import validate_filename
 import os
+import time
 import logging
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Output formats for rendered images
+IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+
+COLORSPACES = {
+    'rgb': fitz.csRGB,
+    'gray': fitz.csGRAY
+}
+
+# Monotonic time of the last interactive render request; background
+# pre-rendering backs off while reviewers are actively requesting images
+_last_interactive = 0.0
+
+def mark_interactive():
+    """Record that a reviewer is waiting on a render right now."""
+    global _last_interactive
+    _last_interactive = time.monotonic()
+
+def seconds_since_interactive():
+    """
+    Get the time since the last interactive render request.
+    
+    Returns:
+        float: Seconds since mark_interactive() was last called
+    """
+    return time.monotonic() - _last_interactive
+
 def get_pdf_path(filename):
     """
     Get the full path to a PDF file.
@@ -44,132 +79,681 @@ def get_pdf_path(filename):
     if not pdf_path.exists():
         logger.warning(f"PDF not found: {pdf_path}")
         
-        # Try alternate naming patterns - sometimes PDF names don't exactly match JSON names
+        # Sometimes PDF names don't exactly match JSON names - look the base name
+        # up case-insensitively, then as a substring, in the archive index
         base_name = Path(safe_filename).stem
-        logger.info(f"Trying alternate names with base: {base_name}")
-        alternate_paths = [
-            config.FOLDERS['PDF_FOLDER'] / f"{base_name}.pdf",
-            config.FOLDERS['PDF_FOLDER'] / f"{base_name.lower()}.pdf",
-            config.FOLDERS['PDF_FOLDER'] / f"{base_name.upper()}.pdf"
-        ]
-        
-        for alt_path in alternate_paths:
-            logger.info(f"Checking alternate path: {alt_path}")
-            if alt_path.exists():
-                logger.info(f"Found alternate PDF: {alt_path}")
-                return alt_path
-        
-        # Try listing files in the directory to see if any have similar names
-        try:
-            pdf_files = list(config.FOLDERS['PDF_FOLDER'].glob('*.pdf'))
-            similar_files = [f.name for f in pdf_files if base_name.lower() in f.name.lower()]
-            logger.info(f"Available PDFs with similar names: {similar_files}")
-            
-            # If we found similar files, try to use the first one
-            if similar_files:
-                similar_path = config.FOLDERS['PDF_FOLDER'] / similar_files[0]
-                logger.info(f"Using similar PDF: {similar_path}")
-                return similar_path
-        except Exception as e:
-            logger.error(f"Error listing PDF directory: {e}")
+        logger.info(f"Looking up alternate names with base: {base_name}")
+        indexed_path = pdf_index.resolve(base_name)
+        if indexed_path:
+            logger.info(f"Using indexed PDF: {indexed_path}")
+            return indexed_path
+        logger.info(f"No PDF in the archive index matches: {base_name}")
     else:
         logger.info(f"PDF found: {pdf_path}")
     
     return pdf_path
 
-def extract_pdf_region(filename, region_name):
+class PDFNotFoundError(FileNotFoundError):
+    """Raised when no PDF can be found for a requested file."""
+
+class PDFRenderError(ValueError):
+    """Raised when a PDF exists but the requested image can't be rendered from it."""
+
+def parse_scale(scale):
+    """
+    Validate a render scale (1.0 = 72 dpi).
+    
+    Args:
+        scale (str or float): Requested scale
+        
+    Returns:
+        float: Scale within config.PDF_SCALE_RANGE
+        
+    Raises:
+        ValueError: If the scale is not a number in the allowed range
+    """
+    try:
+        scale = round(float(scale), 2)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid scale: {scale}")
+    
+    min_scale, max_scale = config.PDF_SCALE_RANGE
+    if not min_scale <= scale <= max_scale:
+        raise ValueError(f"Scale must be between {min_scale} and {max_scale}")
+    return scale
+
+def resolve_existing_pdf(filename):
+    """
+    Resolve a filename to its PDF, raising if the PDF doesn't exist.
+    
+    Args:
+        filename (str): The JSON or PDF filename
+        
+    Returns:
+        Path: Path to the existing PDF file
+        
+    Raises:
+        PDFNotFoundError: If no PDF exists for the filename
+    """
+    pdf_path = get_pdf_path(filename)
+    logger.info(f"PDF path resolved to: {pdf_path}")
+    
+    if not pdf_path.exists():
+        logger.error(f"PDF file not found: {pdf_path}")
+        raise PDFNotFoundError(f"PDF not found for {validate_filename(filename)}")
+    return pdf_path
+
+def resolve_render_profile(region_name, options=None):
+    """
+    Build the render profile for a region from its configured default profile,
+    an optional named profile and individual overrides.
+    
+    Args:
+        region_name (str): Region the profile is for
+        options (dict): Request options - 'profile' (name from config.RENDER_PROFILES)
+            and/or 'scale', 'colorspace' ('rgb' or 'gray'), 'format' ('png', 'jpeg'
+            or 'webp') and 'quality' (1-100, lossy formats only)
+        
+    Returns:
+        dict: Normalized profile with scale, colorspace, format and quality
+        
+    Raises:
+        ValueError: If the profile name or any option is invalid
+    """
+    options = options or {}
+    profile_name = options.get('profile') or config.REGION_RENDER_PROFILES.get(region_name, 'default')
+    if profile_name not in config.RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {profile_name}")
+    
+    profile = dict(config.RENDER_PROFILES[profile_name])
+    for option in ('scale', 'colorspace', 'format', 'quality'):
+        if options.get(option) not in (None, ''):
+            profile[option] = options[option]
+    
+    profile['scale'] = parse_scale(profile['scale'])
+    
+    profile['colorspace'] = str(profile['colorspace']).lower()
+    if profile['colorspace'] not in COLORSPACES:
+        raise ValueError(f"Invalid colorspace: {profile['colorspace']}")
+    
+    profile['format'] = str(profile['format']).lower().replace('jpg', 'jpeg')
+    if profile['format'] not in IMAGE_MIMETYPES:
+        raise ValueError(f"Invalid image format: {profile['format']}")
+    
+    if profile['format'] == 'png':
+        profile['quality'] = None
+    else:
+        try:
+            profile['quality'] = int(profile.get('quality') or 85)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid quality: {profile.get('quality')}")
+        if not 1 <= profile['quality'] <= 100:
+            raise ValueError("Quality must be between 1 and 100")
+    
+    return profile
+
+def profile_cache_part(profile):
+    """
+    Get the part of a cache key that identifies a render profile.
+    
+    Args:
+        profile (dict): Profile from resolve_render_profile
+        
+    Returns:
+        str: Stable description of the profile
+    """
+    return f"{profile['scale']}|{profile['colorspace']}|{profile['format']}|{profile['quality']}"
+
+def encode_pixmap(pix, profile):
+    """
+    Encode a pixmap in the profile's output format.
+    
+    Args:
+        pix (fitz.Pixmap): Rendered pixmap
+        profile (dict): Profile from resolve_render_profile
+        
+    Returns:
+        bytes: Encoded image data
+    """
+    if profile['format'] == 'png':
+        return pix.tobytes("png")
+    if profile['format'] == 'jpeg':
+        return pix.tobytes("jpeg", jpg_quality=profile['quality'])
+    
+    # PyMuPDF can't write WebP, so hand the samples to Pillow
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ValueError("WebP output requires Pillow to be installed")
+    import io
+    mode = 'L' if pix.n == 1 else 'RGB'
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=profile['quality'])
+    return buffer.getvalue()
+
+def get_region_image(filename, region_name, options=None, page_number=0):
     """
-    Extract a specific region from a PDF file as an image.
+    Get a specific region of a PDF page as an encoded image.
+    Rendered images are served from the shared render cache when available.
     
     Args:
         filename (str): The filename to process
         region_name (str): The region to extract ('header', 'service_lines', or 'footer')
+        options (dict): Render profile options (see resolve_render_profile)
+        page_number (int): Zero-based page the region is taken from
         
     Returns:
-        str: Base64-encoded image data as a data URL
+        tuple: (image bytes, cache key identifying this exact rendering, MIME type)
+        
+    Raises:
+        ValueError: If the region name, page or render options are invalid
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be rendered
     """
     # Validate inputs
     logger.info(f"Extracting region '{region_name}' from file '{filename}'")
+    mark_interactive()
     
     if region_name not in config.PDF_REGIONS:
         logger.error(f"Invalid region: {region_name}")
         raise ValueError(f"Invalid region: {region_name}")
+    profile = resolve_render_profile(region_name, options)
     
-    # Get PDF path
-    pdf_path = get_pdf_path(filename)
-    logger.info(f"PDF path resolved to: {pdf_path}")
+    pdf_path = resolve_existing_pdf(filename)
+    cache_key = get_region_cache_key(pdf_path, region_name, profile, page_number)
+    try:
+        img_data = render_cache.get_or_render(
+            cache_key, lambda: render_region(pdf_path, region_name, profile, page_number))
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting PDF region: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise PDFRenderError(f"Could not render region '{region_name}': {e}") from e
     
-    if not pdf_path.exists():
-        logger.error(f"PDF file not found: {pdf_path}")
-        # Return a placeholder image for "PDF not found"
-        return f'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAASwAAAEsCAMAAABOo35HAAAAn1BMVEX///8AAADd3d3MzMypqalra2txcXF3d3eCgoKPj4+ampqmpqa5ubkQEBAgICAsLCw8PDxISEhQUFBYWFhnZ2dubm5/f3+IiIiQkJCYmJienp6lpaWwsLC9vb3Jycnr6+v19fUYGBgmJiY0NDRERERMTExiYmKDg4OLi4uTk5Obm5utra26urrDw8PQ0NDW1tbg4ODm5ub8/PwMDAwcHBzSAr3IAAAK2klEQVR42uzXgRpAQACGUW0qKrVNzVTM1Ps/m52xmXu/B+gA4GuFnzuVaqM9HsZsNfLDNpUz2k7m43Nx2vYhDWmVQBrSJnz6D0nfVHQ4R3RK15GNDSH7YAupSFvSPd/5ZiuHFKRUCVKQypCGNKQhDWlIQxrSkPaDNCqcTyENaVSSNKdxDZWQlskhDWk7pjpI47qVkIY0pCENaUhD2v+QRqVII8ZMSLA8TzA8TxA8zyWwPJeA8lwCyXMJIM8lYDzH4nkDCM+xOdw3Lp5jcbi3sXk+8+I5No+LjOY5Fod7N4rn2BQOFx3H8/YvcS7x7PU27V3GVe7nQGFQDAEEcM65nTbE1CbGDkNS4tAXDUKREYbUYsIUJi3A/7+m3q77LjQfrg+sdnb2p'
+    return img_data, cache_key, IMAGE_MIMETYPES[profile['format']]
+
+def get_region_images(filename, options=None, page_number=0):
+    """
+    Get every configured region of a PDF page as encoded images.
+    Regions missing from the render cache are cropped from a single render of
+    the page per scale/colorspace combination.
+    
+    Args:
+        filename (str): The filename to process
+        options (dict): Render profile options applied to every region
+        page_number (int): Zero-based page the regions are taken from
         
-    try:
-        # Open the PDF - Using a more direct approach similar to the working example
-        logger.info(f"Opening PDF: {pdf_path}")
-        try:
-            doc = fitz.open(pdf_path)
-            logger.info(f"PDF opened successfully. Page count: {doc.page_count}")
-        except Exception as e:
-            logger.error(f"Failed to open PDF: {e}")
-            return f'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAASwAAAEsCAMAAABOo35HAAAAn1BMVEX///8AAADd3d3MzMypqalra2txcXF3d3eCgoKPj4+ampqmpqa5ubkQEBAgICAsLCw8PDxISEhQUFBYWFhnZ2dubm5/f3+IiIiQkJCYmJienp6lpaWwsLC9vb3Jycnr6+v19fUYGBgmJiY0NDRERERMTExiYmKDg4OLi4uTk5Obm5utra26urrDw8PQ0NDW1tbg4ODm5ub8/PwMDAwcHBzSAr3IAAAK2klEQVR42uzXgRpAQACGUW0qKrVNzVTM1Ps/m52xmXu/B+gA4GuFnzuVaqM9HsZsNfLDNpUz2k7m43Nx2vYhDWmVQBrSJnz6D0nfVHQ4R3RK15GNDSH7YAupSFvSPd/5ZiuHFKRUCVKQypCGNKQhDWlIQxrSkPaDNCqcTyENaVSSNKdxDZWQlskhDWk7pjpI47qVkIY0pCENaUhD2v+QRqVII8ZMSLA8TzA8TxA8zyWwPJeA8lwCyXMJIM8lYDzH4nkDCM+xOdw3Lp5jcbi3sXk+8+I5No+LjOY5Fod7N4rn2BQOFx3H8/YvcS7x7PU27V3GVe7nQGFQDAEEcM65nTbE1CbGDkNS4tAXDUKREYbUYsIUJi3A/7+m3q77LjQfrg+sdnb2p'
-            
-        if doc.page_count == 0:
-            logger.error(f"PDF has no pages: {pdf_path}")
-            raise ValueError(f"PDF has no pages: {pdf_path}")
-            
+    Returns:
+        dict: Region name -> (image bytes, cache key, MIME type)
+        
+    Raises:
+        ValueError: If the page or render options are invalid
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be rendered
+    """
+    mark_interactive()
+    profiles = {region_name: resolve_render_profile(region_name, options)
+                for region_name in config.PDF_REGIONS}
+    pdf_path = resolve_existing_pdf(filename)
+    
+    images = {}
+    missing = {}
+    for region_name, profile in profiles.items():
+        cache_key = get_region_cache_key(pdf_path, region_name, profile, page_number)
+        img_data = render_cache.get(cache_key)
+        if img_data is None:
+            missing[region_name] = profile
+        images[region_name] = (img_data, cache_key, IMAGE_MIMETYPES[profile['format']])
+    
+    if missing:
         try:
-            page = doc[0]  # Assuming we're working with the first page
-            page_rect = page.rect
-            logger.info(f"Page dimensions: {page_rect}")
+            rendered = render_regions(pdf_path, missing, page_number)
+        except ValueError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to get page: {e}")
-            return f'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAASwAAAEsCAMAAABOo35HAAAAn1BMVEX///8AAADd3d3MzMypqalra2txcXF3d3eCgoKPj4+ampqmpqa5ubkQEBAgICAsLCw8PDxISEhQUFBYWFhnZ2dubm5/f3+IiIiQkJCYmJienp6lpaWwsLC9vb3Jycnr6+v19fUYGBgmJiY0NDRERERMTExiYmKDg4OLi4uTk5Obm5utra26urrDw8PQ0NDW1tbg4ODm5ub8/PwMDAwcHBzSAr3IAAAK2klEQVR42uzXgRpAQACGUW0qKrVNzVTM1Ps/m52xmXu/B+gA4GuFnzuVaqM9HsZsNfLDNpUz2k7m43Nx2vYhDWmVQBrSJnz6D0nfVHQ4R3RK15GNDSH7YAupSFvSPd/5ZiuHFKRUCVKQypCGNKQhDWlIQxrSkPaDNCqcTyENaVSSNKdxDZWQlskhDWk7pjpI47qVkIY0pCENaUhD2v+QRqVII8ZMSLA8TzA8TxA8zyWwPJeA8lwCyXMJIM8lYDzH4nkDCM+xOdw3Lp5jcbi3sXk+8+I5No+LjOY5Fod7N4rn2BQOFx3H8/YvcS7x7PU27V3GVe7nQGFQDAEEcM65nTbE1CbGDkNS4tAXDUKREYbUYsIUJi3A/7+m3q77LjQfrg+sdnb2p'
-        
-        # Define region coordinates manually (like the working example)
-        # Override config settings to match the working example
-        regions = {
-            'header': fitz.Rect(0, 0, page_rect.width, page_rect.height * 0.25),
-            'service_lines': fitz.Rect(0, page_rect.height * 0.35, page_rect.width, page_rect.height * 0.8),
-            'footer': fitz.Rect(0, page_rect.height * 0.8, page_rect.width, page_rect.height)
-        }
-        
-        region_rect = regions[region_name]
+            logger.error(f"Error rendering PDF regions: {e}")
+            raise PDFRenderError(f"Could not render regions: {e}") from e
+        
+        for region_name, img_data in rendered.items():
+            _, cache_key, mimetype = images[region_name]
+            try:
+                render_cache.put(cache_key, img_data)
+            except OSError as e:
+                logger.warning(f"Could not write render cache entry {cache_key}: {e}")
+            images[region_name] = (img_data, cache_key, mimetype)
+    
+    return images
+
+def get_region_cache_key(pdf_path, region_name, profile, page_number=0):
+    """
+    Get the render cache key for a region of a PDF page.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        region_name (str): The region name
+        profile (dict): Profile from resolve_render_profile
+        page_number (int): Zero-based page number
+        
+    Returns:
+        str: Cache key, also used as the image ETag
+    """
+    return RenderCache.make_key(pdf_path, 'region', page_number, region_name, profile_cache_part(profile))
+
+def extract_pdf_region(filename, region_name, options=None, page_number=0):
+    """
+    Extract a specific region from a PDF page as an image.
+    
+    Args:
+        filename (str): The filename to process
+        region_name (str): The region to extract ('header', 'service_lines', or 'footer')
+        options (dict): Render profile options (see resolve_render_profile)
+        page_number (int): Zero-based page the region is taken from
+        
+    Returns:
+        str: Base64-encoded image data as a data URL
+        
+    Raises:
+        ValueError: If the region name or render options are invalid
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be rendered
+    """
+    img_data, _, mimetype = get_region_image(filename, region_name, options, page_number)
+    img_base64 = base64.b64encode(img_data).decode()
+    return f'data:{mimetype};base64,{img_base64}'
+
+def get_region_rect(page_rect, region_name):
+    """
+    Convert a configured region (ratios of the page) into page coordinates.
+    
+    Args:
+        page_rect (fitz.Rect): Page rectangle
+        region_name (str): Region name from config.PDF_REGIONS
+        
+    Returns:
+        fitz.Rect: Region rectangle on the page
+    """
+    left, top, right, bottom = config.PDF_REGIONS[region_name]
+    return fitz.Rect(
+        page_rect.x0 + page_rect.width * left,
+        page_rect.y0 + page_rect.height * top,
+        page_rect.x0 + page_rect.width * right,
+        page_rect.y0 + page_rect.height * bottom
+    )
+
+def _get_page(doc, pdf_path, page_number=0):
+    logger.info(f"PDF opened successfully. Page count: {doc.page_count}")
+        
+    if doc.page_count == 0:
+        logger.error(f"PDF has no pages: {pdf_path}")
+        raise ValueError(f"PDF has no pages: {pdf_path}")
+    if not 0 <= page_number < doc.page_count:
+        raise ValueError(f"Page {page_number} out of range (PDF has {doc.page_count} pages)")
+    
+    return doc[page_number]
+
+def _crop_regions(page, region_profiles):
+    """
+    Render a page once per scale/colorspace and crop the regions from the pixmap.
+    
+    Args:
+        page (fitz.Page): Page to render
+        region_profiles (dict): Region name -> profile
+        
+    Returns:
+        dict: Region name -> encoded image data
+    """
+    groups = {}
+    for region_name, profile in region_profiles.items():
+        groups.setdefault((profile['scale'], profile['colorspace']), []).append(region_name)
+    
+    images = {}
+    for (scale, colorspace), region_names in groups.items():
+        matrix = fitz.Matrix(scale, scale)
+        pix = page.get_pixmap(matrix=matrix, colorspace=COLORSPACES[colorspace])
+        
+        for region_name in region_names:
+            # Map the region into pixmap coordinates and copy that area out
+            region_irect = (get_region_rect(page.rect, region_name) * matrix).irect & pix.irect
+            region_pix = fitz.Pixmap(pix.colorspace, region_irect, pix.alpha)
+            region_pix.copy(pix, region_irect)
+            images[region_name] = encode_pixmap(region_pix, region_profiles[region_name])
+    return images
+
+def render_region(pdf_path, region_name, profile=None, page_number=0):
+    """
+    Render a region of a page of a PDF.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        region_name (str): The region to render ('header', 'service_lines', or 'footer')
+        profile (dict): Profile from resolve_render_profile (defaults to the region's profile)
+        page_number (int): Zero-based page number
+        
+    Returns:
+        bytes: Encoded image data
+    """
+    profile = profile or resolve_render_profile(region_name)
+    logger.info(f"Rendering region '{region_name}' from PDF: {pdf_path}")
+    with document_pool.open(pdf_path) as doc:
+        page = _get_page(doc, pdf_path, page_number)
+        region_rect = get_region_rect(page.rect, region_name)
         logger.info(f"Using region rect for {region_name}: {region_rect}")
         
-        # Extract the region as an image with simpler approach like the working example
         try:
-            logger.info(f"Extracting pixmap for region: {region_name}")
-            pix = page.get_pixmap(clip=region_rect)  # No matrix specified like in example
+            pix = page.get_pixmap(matrix=fitz.Matrix(profile['scale'], profile['scale']),
+                                  colorspace=COLORSPACES[profile['colorspace']], clip=region_rect)
             logger.info(f"Pixmap dimensions: {pix.width}x{pix.height}")
-            img_data = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_data).decode()
-            
-            logger.info(f"Successfully extracted region {region_name}")
-            return f'data:image/png;base64,{img_base64}'
         except Exception as e:
             logger.error(f"Error creating pixmap: {e}")
             # Try a different approach - render the whole page and then crop
-            try:
-                logger.info("Trying alternative approach - rendering whole page")
-                pix = page.get_pixmap(matrix=fitz.Matrix(1, 1))
-                # Create a new pixmap for the region
-                region_pix = fitz.Pixmap(
-                    pix.colorspace, 
-                    (int(region_rect.width), int(region_rect.height)),
-                    pix.alpha
-                )
-                region_pix.copy(pix, (int(region_rect.x0), int(region_rect.y0), int(region_rect.x1), int(region_rect.y1)))
-                img_data = region_pix.tobytes("png")
-                img_base64 = base64.b64encode(img_data).decode()
-                logger.info("Alternative approach successful")
-                return f'data:image/png;base64,{img_base64}'
-            except Exception as e2:
-                logger.error(f"Alternative approach failed: {e2}")
-                raise
+            logger.info("Trying alternative approach - rendering whole page")
+            return _crop_regions(page, {region_name: profile})[region_name]
+        return encode_pixmap(pix, profile)
+
+def render_regions(pdf_path, region_profiles, page_number=0):
+    """
+    Render a page of a PDF once and crop several regions from that pixmap.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        region_profiles (dict): Region name -> profile from resolve_render_profile
+        page_number (int): Zero-based page number
+        
+    Returns:
+        dict: Region name -> encoded image data
+    """
+    logger.info(f"Rendering regions {list(region_profiles)} from PDF: {pdf_path}")
+    with document_pool.open(pdf_path) as doc:
+        page = _get_page(doc, pdf_path, page_number)
+        return _crop_regions(page, region_profiles)
+
+def parse_page_number(page_number):
+    """
+    Validate a zero-based page number from a request.
+    
+    Args:
+        page_number (str or int): Requested page
+        
+    Returns:
+        int: Page number
+        
+    Raises:
+        ValueError: If the page number is not a non-negative integer
+    """
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid page: {page_number}")
+    if page_number < 0:
+        raise ValueError(f"Invalid page: {page_number}")
+    return page_number
+
+def get_page_layout(filename):
+    """
+    Describe the pages of a PDF and the tile grid of each page at every zoom level,
+    so a viewer can lay out a document before loading any tiles.
+    
+    Args:
+        filename (str): The filename to process
+        
+    Returns:
+        dict: Tile size, zoom levels and per-page sizes (in points) and tile counts
+        
+    Raises:
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be opened
+    """
+    pdf_path = resolve_existing_pdf(filename)
+    tile_size = config.PDF_TILES['SIZE']
+    zoom_levels = config.PDF_TILES['ZOOM_LEVELS']
+    
+    try:
+        with document_pool.open(pdf_path) as doc:
+            rects = [page.rect for page in doc]
     except Exception as e:
-        logger.error(f"Error extracting PDF region: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        # Return a placeholder image for error
-        return f'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAASwAAAEsCAMAAABOo35HAAAAn1BMVEX///8AAADd3d3MzMypqalra2txcXF3d3eCgoKPj4+ampqmpqa5ubkQEBAgICAsLCw8PDxISEhQUFBYWFhnZ2dubm5/f3+IiIiQkJCYmJienp6lpaWwsLC9vb3Jycnr6+v19fUYGBgmJiY0NDRERERMTExiYmKDg4OLi4uTk5Obm5utra26urrDw8PQ0NDW1tbg4ODm5ub8/PwMDAwcHBzSAr3IAAAK2klEQVR42uzXgRpAQACGUW0qKrVNzVTM1Ps/m52xmXu/B+gA4GuFnzuVaqM9HsZsNfLDNpUz2k7m43Nx2vYhDWmVQBrSJnz6D0nfVHQ4R3RK15GNDSH7YAupSFvSPd/5ZiuHFKRUCVKQypCGNKQhDWlIQxrSkPaDNCqcTyENaVSSNKdxDZWQlskhDWk7pjpI47qVkIY0pCENaUhD2v+QRqVII8ZMSLA8TzA8TxA8zyWwPJeA8lwCyXMJIM8lYDzH4nkDCM+xOdw3Lp5jcbi3sXk+8+I5No+LjOY5Fod7N4rn2BQOFx3H8/YvcS7x7PU27V3GVe7nQGFQDAEEcM65nTbE1CbGDkNS4tAXDUKREYbUYsIUJi3A/7+m3q77LjQfrg+sdnb2p'
\ No newline at end of file
+        logger.error(f"Error reading pages of {pdf_path}: {e}")
+        raise PDFRenderError(f"Could not read PDF pages: {e}") from e
+    
+    pages = []
+    for number, rect in enumerate(rects):
+        pages.append({
+            'page': number,
+            'width': rect.width,
+            'height': rect.height,
+            'tiles': [{
+                'zoom': zoom,
+                'columns': math.ceil(rect.width * scale / tile_size),
+                'rows': math.ceil(rect.height * scale / tile_size)
+            } for zoom, scale in enumerate(zoom_levels)]
+        })
+    
+    return {'tile_size': tile_size, 'zoom_levels': zoom_levels, 'pages': pages}
+
+def _tile_profile(zoom):
+    """Get the render profile for tiles at a zoom level."""
+    zoom_levels = config.PDF_TILES['ZOOM_LEVELS']
+    if not 0 <= zoom < len(zoom_levels):
+        raise ValueError(f"Zoom must be between 0 and {len(zoom_levels) - 1}")
+    profile = resolve_render_profile(None, {'profile': config.PDF_TILES['PROFILE']})
+    profile['scale'] = zoom_levels[zoom]
+    return profile
+
+def get_tile_cache_key(pdf_path, page_number, zoom, x, y):
+    """
+    Get the render cache key for a page tile.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        page_number (int): Zero-based page number
+        zoom (int): Index into config.PDF_TILES['ZOOM_LEVELS']
+        x (int): Tile column
+        y (int): Tile row
+        
+    Returns:
+        str: Cache key, also used as the image ETag
+    """
+    profile = _tile_profile(zoom)
+    return RenderCache.make_key(pdf_path, 'tile', page_number, x, y,
+                                config.PDF_TILES['SIZE'], profile_cache_part(profile))
+
+def get_tile_image(filename, page_number, zoom, x, y):
+    """
+    Get one fixed-size tile of a PDF page at a zoom level as an encoded image.
+    Tiles are rendered on demand from the shared document pool and cached.
+    
+    Args:
+        filename (str): The filename to process
+        page_number (int): Zero-based page number
+        zoom (int): Index into config.PDF_TILES['ZOOM_LEVELS']
+        x (int): Tile column
+        y (int): Tile row
+        
+    Returns:
+        tuple: (image bytes, cache key, MIME type)
+        
+    Raises:
+        ValueError: If the page, zoom or tile position is out of range
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be rendered
+    """
+    mark_interactive()
+    profile = _tile_profile(zoom)
+    if x < 0 or y < 0:
+        raise ValueError(f"Invalid tile position: {x},{y}")
+    
+    pdf_path = resolve_existing_pdf(filename)
+    cache_key = get_tile_cache_key(pdf_path, page_number, zoom, x, y)
+    try:
+        img_data = render_cache.get_or_render(
+            cache_key, lambda: render_tile(pdf_path, page_number, profile, x, y))
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering tile {page_number}/{zoom}/{x}/{y} of {pdf_path}: {e}")
+        raise PDFRenderError(f"Could not render tile: {e}") from e
+    
+    return img_data, cache_key, IMAGE_MIMETYPES[profile['format']]
+
+def render_tile(pdf_path, page_number, profile, x, y):
+    """
+    Render one tile of a page. Only the tile's area of the page is rasterized;
+    tiles on the right and bottom edges are smaller than the tile size.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        page_number (int): Zero-based page number
+        profile (dict): Render profile (scale is the zoom level's scale)
+        x (int): Tile column
+        y (int): Tile row
+        
+    Returns:
+        bytes: Encoded image data
+    """
+    scale = profile['scale']
+    # Tile bounds in page coordinates
+    span = config.PDF_TILES['SIZE'] / scale
+    
+    with document_pool.open(pdf_path) as doc:
+        page = _get_page(doc, pdf_path, page_number)
+        page_rect = page.rect
+        tile_rect = fitz.Rect(
+            page_rect.x0 + x * span,
+            page_rect.y0 + y * span,
+            page_rect.x0 + (x + 1) * span,
+            page_rect.y0 + (y + 1) * span
+        ) & page_rect
+        if tile_rect.is_empty:
+            raise ValueError(f"Tile {x},{y} is outside page {page_number}")
+        
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale),
+                              colorspace=COLORSPACES[profile['colorspace']], clip=tile_rect)
+        return encode_pixmap(pix, profile)
+
+def extract_text_layer(pdf_path):
+    """
+    Extract the text and word boxes of every page of a PDF. Scanned pages
+    without a text layer come back with empty text.
+    Runs in background worker processes, so it only takes picklable arguments.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        
+    Returns:
+        list: One dict per page with 'page' (zero-based), 'width', 'height',
+            'text' and 'words' ([x0, y0, x1, y1, word] in page coordinates)
+    """
+    pdf_path = Path(pdf_path)
+    pages = []
+    with document_pool.open(pdf_path) as doc:
+        for page in doc:
+            words = [[round(x0, 1), round(y0, 1), round(x1, 1), round(y1, 1), word]
+                     for x0, y0, x1, y1, word, *_ in page.get_text("words")]
+            pages.append({
+                'page': page.number,
+                'width': page.rect.width,
+                'height': page.rect.height,
+                'text': page.get_text("text"),
+                'words': words
+            })
+    return pages
+
+def get_thumbnail_cache_key(pdf_path, kind='page', width=None):
+    """
+    Get the render cache key for a thumbnail.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        kind (str): 'page' for the whole first page or a region name for a crop
+        width (int): Thumbnail width in pixels (defaults to config.THUMBNAIL_WIDTH)
+        
+    Returns:
+        str: Cache key, also used as the image ETag
+    """
+    return RenderCache.make_key(pdf_path, 'thumbnail', kind, width or config.THUMBNAIL_WIDTH, 'jpeg')
+
+def render_thumbnail(pdf_path, kind='page', width=None):
+    """
+    Render the first page of a PDF, or one of its regions, as a small JPEG.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        kind (str): 'page' for the whole first page or a region name for a crop
+        width (int): Thumbnail width in pixels (defaults to config.THUMBNAIL_WIDTH)
+        
+    Returns:
+        bytes: JPEG image data
+    """
+    width = width or config.THUMBNAIL_WIDTH
+    with document_pool.open(pdf_path) as doc:
+        page = _get_page(doc, pdf_path)
+        clip = page.rect if kind == 'page' else get_region_rect(page.rect, kind)
+        scale = width / clip.width
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip, alpha=False)
+        return pix.tobytes("jpeg", jpg_quality=75)
+
+def get_thumbnail(filename, kind='page'):
+    """
+    Get a thumbnail of a PDF's first page (or of a region of it) for file listings.
+    
+    Args:
+        filename (str): The filename to process
+        kind (str): One of config.THUMBNAIL_KINDS
+        
+    Returns:
+        tuple: (JPEG bytes, cache key, MIME type)
+        
+    Raises:
+        ValueError: If the thumbnail kind is unknown
+        PDFNotFoundError: If no PDF exists for the filename
+        PDFRenderError: If the PDF can't be rendered
+    """
+    if kind not in config.THUMBNAIL_KINDS:
+        raise ValueError(f"Invalid thumbnail: {kind}")
+    
+    pdf_path = resolve_existing_pdf(filename)
+    cache_key = get_thumbnail_cache_key(pdf_path, kind)
+    try:
+        img_data = render_cache.get_or_render(cache_key, lambda: render_thumbnail(pdf_path, kind))
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering {kind} thumbnail of {pdf_path}: {e}")
+        raise PDFRenderError(f"Could not render thumbnail: {e}") from e
+    
+    return img_data, cache_key, IMAGE_MIMETYPES['jpeg']
+
+def prerender_pdf(pdf_path):
+    """
+    Render every configured region (in its default profile) and the listing
+    thumbnails of a PDF into the render cache, skipping images already cached.
+    Runs in background worker processes, so it only takes picklable arguments.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        
+    Returns:
+        int: Number of images rendered
+    """
+    pdf_path = Path(pdf_path)
+    rendered = 0
+    
+    missing = {}
+    for region_name in config.PDF_REGIONS:
+        profile = resolve_render_profile(region_name)
+        if not render_cache.contains(get_region_cache_key(pdf_path, region_name, profile)):
+            missing[region_name] = profile
+    if missing:
+        for region_name, img_data in render_regions(pdf_path, missing).items():
+            render_cache.put(get_region_cache_key(pdf_path, region_name, missing[region_name]), img_data)
+            rendered += 1
+    
+    for kind in config.THUMBNAIL_KINDS:
+        thumbnail_key = get_thumbnail_cache_key(pdf_path, kind)
+        if not render_cache.contains(thumbnail_key):
+            render_cache.put(thumbnail_key, render_thumbnail(pdf_path, kind))
+            rendered += 1
+    
+    return rendered
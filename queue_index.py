@@ -0,0 +1,267 @@
+"""
+Cached per-folder index of the queued JSON files and the metadata the list
+endpoints show, so listing a queue doesn't re-glob and re-parse OneDrive
+folders on every request.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+import config
+from file_utils import atomic_write
+from work_items import work_items, content_hash, QUEUE_FOLDERS, UNMAPPED, CORRECTIONS, ESCALATIONS
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields kept for every queued file
+QUEUE_FIELDS = ('name', 'size', 'mtime', 'patient_name', 'first_dos', 'tin', 'total_charge', 'content_hash')
+
+# Fields compared as numbers when sorting a queue
+QUEUE_NUMERIC_FIELDS = ('size', 'mtime', 'total_charge')
+
+def extract_queue_metadata(data):
+    """
+    Pull the list metadata out of a queued JSON document.
+
+    Args:
+        data (dict): Parsed JSON file
+
+    Returns:
+        dict: patient_name, first_dos, tin and total_charge ('' when missing)
+    """
+    patient_info = data.get('patient_info') or {}
+    billing_info = data.get('billing_info') or {}
+    service_lines = data.get('service_lines') or []
+    first_line = service_lines[0] if service_lines and isinstance(service_lines[0], dict) else {}
+
+    tin = billing_info.get('billing_provider_tin') or (data.get('provider_info') or {}).get('TIN') or ''
+    return {
+        'patient_name': patient_info.get('patient_name') or '',
+        'first_dos': first_line.get('date_of_service') or '',
+        'tin': ''.join(c for c in str(tin) if c.isdigit()),
+        'total_charge': billing_info.get('total_charge') or ''
+    }
+
+class QueueIndex:
+    """
+    In-memory metadata for every JSON file in a queue folder.
+
+    Refreshes list the folder with os.scandir at most once per refresh_interval
+    seconds (or right away after invalidate()) and only re-read files whose
+    mtime or size changed, so a refresh costs one directory listing. The
+    entries are persisted so a restart doesn't re-parse an unchanged queue.
+
+    With a work-item store, files whose move out of the queue is still
+    pending are left out, and changes are synced to the store's queue state.
+    """
+
+    def __init__(self, folder, index_path=None, refresh_interval=2, state=None, store=None):
+        """
+        Initialize the index. Nothing is scanned until the first lookup.
+
+        Args:
+            folder (Path): Queue folder containing the JSON files
+            index_path (Path): JSON file the entries are persisted to (optional)
+            refresh_interval (float): Minimum seconds between folder scans
+            state (str): Work-item state of the files in this queue (optional)
+            store (WorkItemStore): Work-item store kept in step with the folder (optional)
+        """
+        self.folder = Path(folder)
+        self.index_path = Path(index_path) if index_path else None
+        self.refresh_interval = refresh_interval
+        self.state = state
+        self.store = store
+
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._versions = {}
+        self._last_check = 0.0
+        self._stale = True
+        self._loaded = False
+        self._synced = False
+
+    def _load_persisted(self):
+        if not self.index_path or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('folder') != str(self.folder):
+                return
+            for entry in saved.get('entries', []):
+                if not entry.get('content_hash'):
+                    continue    # Saved before hashes were kept; re-read it
+                self._entries[entry['name']] = {field: entry.get(field, '') for field in QUEUE_FIELDS}
+                self._versions[entry['name']] = tuple(entry['version'])
+        except Exception as e:
+            logger.warning(f"Could not load queue index {self.index_path}: {e}")
+            self._entries.clear()
+            self._versions.clear()
+
+    def _persist(self):
+        if not self.index_path:
+            return
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.index_path, json.dumps({
+                'folder': str(self.folder),
+                'entries': [dict(entry, version=list(self._versions[name]))
+                            for name, entry in self._entries.items()]
+            }).encode('utf-8'))
+        except Exception as e:
+            logger.warning(f"Could not persist queue index {self.index_path}: {e}")
+
+    def _read_entry(self, path, stat):
+        entry = {
+            'name': path.name,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'patient_name': '',
+            'first_dos': '',
+            'tin': '',
+            'total_charge': '',
+            'content_hash': ''
+        }
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            entry['content_hash'] = content_hash(data)
+            entry.update(extract_queue_metadata(json.loads(data)))
+        except Exception as e:
+            # Keep listing the file; reviewers can still open and fix it
+            logger.warning(f"Could not read queue metadata from {path}: {e}")
+        return entry
+
+    def invalidate(self):
+        """Force the next lookup to rescan the folder (call after moving files in or out)."""
+        with self._lock:
+            self._stale = True
+
+    def refresh(self, force=False):
+        """
+        Rescan the folder if the refresh interval elapsed and apply the differences.
+
+        Args:
+            force (bool): Scan even if the refresh interval hasn't elapsed
+
+        Returns:
+            bool: True if the index changed
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load_persisted()
+                self._loaded = True
+
+            now = time.monotonic()
+            if not (force or self._stale) and now - self._last_check < self.refresh_interval:
+                return False
+            self._last_check = now
+            self._stale = False
+
+            if not self.folder.exists():
+                changed = bool(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+                return changed
+
+            # Files already transitioned out of the queue but not yet moved
+            pending = set()
+            if self.store:
+                pending = {Path(source).name for source in self.store.pending_sources()
+                           if Path(source).parent == self.folder}
+
+            seen = set()
+            read = 0
+            for dir_entry in os.scandir(self.folder):
+                if not dir_entry.name.lower().endswith('.json') or dir_entry.name in pending:
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                seen.add(dir_entry.name)
+                version = (stat.st_mtime_ns, stat.st_size)
+                if self._versions.get(dir_entry.name) == version:
+                    continue
+                self._entries[dir_entry.name] = self._read_entry(Path(dir_entry.path), stat)
+                self._versions[dir_entry.name] = version
+                read += 1
+
+            removed = [name for name in self._entries if name not in seen]
+            for name in removed:
+                del self._entries[name]
+                del self._versions[name]
+
+            if read or removed or not self._synced:
+                if read or removed:
+                    logger.info(f"Queue index for {self.folder.name}: {read} read, "
+                                f"{len(removed)} removed, {len(self._entries)} total")
+                    self._persist()
+                self._sync(pending)
+                return bool(read or removed)
+            return False
+
+    def _sync(self, pending):
+        if not self.store:
+            return
+        try:
+            self.store.sync(self.state, {name: entry['content_hash'] for name, entry in self._entries.items()},
+                            pending)
+            self._synced = True
+        except Exception as e:
+            # Listing keeps working from the folder; the next change retries the sync
+            logger.warning(f"Could not sync work items for {self.folder.name}: {e}")
+
+    def entries(self):
+        """
+        Get the metadata of every queued file.
+
+        Returns:
+            list: Entry dicts with the QUEUE_FIELDS keys, ordered by filename
+        """
+        with self._lock:
+            self.refresh()
+            return [dict(self._entries[name]) for name in sorted(self._entries)]
+
+    def get(self, name):
+        """
+        Get the metadata of one queued file.
+
+        Args:
+            name (str): JSON filename
+
+        Returns:
+            dict: Entry, or None if the file isn't queued
+        """
+        with self._lock:
+            self.refresh()
+            entry = self._entries.get(name)
+            if entry is None:
+                # It may have arrived since the last scan
+                self.refresh(force=True)
+                entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def count(self):
+        """
+        Count the queued files.
+
+        Returns:
+            int: Number of JSON files in the folder
+        """
+        with self._lock:
+            self.refresh()
+            return len(self._entries)
+
+def _queue_index(name, folder, state):
+    return QueueIndex(folder, config.QUEUE_INDEX['PATH'] / f"{name}.json",
+                      config.QUEUE_INDEX['REFRESH_INTERVAL'], state, work_items)
+
+# Shared indexes of the review queues, keyed by blueprint name
+queue_indexes = {
+    'unmapped': _queue_index('unmapped', QUEUE_FOLDERS[UNMAPPED], UNMAPPED),
+    'corrections': _queue_index('corrections', QUEUE_FOLDERS[CORRECTIONS], CORRECTIONS),
+    'escalations': _queue_index('escalations', QUEUE_FOLDERS[ESCALATIONS], ESCALATIONS),
+}
@@ -0,0 +1,228 @@
+"""
+Disk-backed cache for rendered PDF images (regions, thumbnails, tiles).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+class RenderCache:
+    """
+    Content-addressed, size-bounded LRU cache of rendered image bytes on disk.
+
+    Entries are keyed by a hash of everything that determines the rendered
+    output (PDF path, mtime and size plus the render parameters), so an updated
+    PDF simply misses. Recency is tracked through the entry file's mtime, which
+    is bumped on every hit; the oldest entries are evicted once the cache grows
+    past max_bytes.
+    """
+
+    # Evict down to this fraction of max_bytes so we don't evict on every write
+    LOW_WATER_RATIO = 0.9
+
+    def __init__(self, root, max_bytes):
+        """
+        Initialize the cache.
+
+        Args:
+            root (Path): Directory that holds the cache entries
+            max_bytes (int): Size limit before least recently used entries are evicted
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        # key -> {'lock', 'users', 'data'} shared by concurrent get_or_render calls
+        self._inflight = {}
+
+    @staticmethod
+    def make_key(pdf_path, *parts):
+        """
+        Build a cache key for an image rendered from a PDF.
+
+        Args:
+            pdf_path (Path): Path to the source PDF
+            *parts: Render parameters (region, scale, format, ...)
+
+        Returns:
+            str: Hex digest identifying the rendered output
+        """
+        stat = os.stat(pdf_path)
+        raw = '|'.join([str(Path(pdf_path).resolve()), str(stat.st_mtime_ns), str(stat.st_size)]
+                       + [str(part) for part in parts])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.root / key[:2] / key
+
+    def contains(self, key):
+        """
+        Check whether a key is cached without reading it or updating its recency.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            bool: True if an entry exists
+        """
+        return self._entry_path(key).exists()
+
+    def get(self, key):
+        """
+        Return the cached bytes for a key, or None on a miss.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            bytes: Cached data or None
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """
+        Store bytes under a key, evicting old entries if the cache is over its limit.
+
+        Args:
+            key (str): Cache key from make_key
+            data (bytes): Rendered image data
+        """
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_name = tempfile.mkstemp(dir=entry_path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # An overwritten entry's bytes no longer count
+            try:
+                replaced = os.stat(entry_path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_name, entry_path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data) - replaced
+            over_limit = self._total_bytes > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def get_or_render(self, key, render):
+        """
+        Return cached bytes for a key, rendering and storing them on a miss.
+        Concurrent misses on the same key in this process render only once:
+        they share one lock (kept until the last of them is done) and the
+        rendered bytes, even if writing the cache entry failed.
+
+        Args:
+            key (str): Cache key from make_key
+            render (callable): Zero-argument function producing the bytes
+
+        Returns:
+            bytes: Rendered image data
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            inflight = self._inflight.setdefault(key, {'lock': threading.Lock(), 'users': 0, 'data': None})
+            inflight['users'] += 1
+
+        try:
+            with inflight['lock']:
+                # Another thread may have rendered it while we waited
+                data = inflight['data'] or self.get(key)
+                if data is None:
+                    data = render()
+                    inflight['data'] = data
+                    try:
+                        self.put(key, data)
+                    except OSError as e:
+                        logger.warning(f"Could not write render cache entry {key}: {e}")
+                return data
+        finally:
+            with self._lock:
+                inflight['users'] -= 1
+                if inflight['users'] == 0:
+                    self._inflight.pop(key, None)
+
+    def _iter_entries(self):
+        if not self.root.exists():
+            return
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    yield entry
+
+    def _scan_size(self):
+        total = 0
+        for entry in self._iter_entries():
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is under its low-water mark.
+        The size is recomputed from disk so entries written by other processes count too.
+        """
+        with self._lock:
+            entries = []
+            for entry in self._iter_entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * self.LOW_WATER_RATIO
+            removed = 0
+
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    continue
+
+            self._total_bytes = total
+
+        if removed:
+            logger.info(f"Render cache evicted {removed} entries, now {total} bytes")
+
+# Shared cache used by the PDF rendering functions
+render_cache = RenderCache(config.RENDER_CACHE_PATH, config.RENDER_CACHE_MAX_BYTES)
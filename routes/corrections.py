@@ -1,21 +1,33 @@
 """
 Routes for the OCR Corrections functionality.
 """
-from flask import Blueprint, jsonify, request, render_template, send_file
+from flask import Blueprint, jsonify, request, render_template
 import json
 import config
-from pathlib import Path
 import logging
-import fitz
-import base64
 
 # Import utilities
-from pdf_utils import get_pdf_path, extract_pdf_region
+from pdf_utils import extract_pdf_region, PDFNotFoundError
+from http_utils import (pdf_response, region_image_response, regions_response, render_options,
+                        requested_page, tile_response, page_layout_response, thumbnail_response,
+                        text_search_response, file_list_response, work_item_response,
+                        claim_next_response, renew_lease_response, release_lease_response,
+                        current_reviewer, next_bundle_response)
+from queue_index import queue_indexes
+from work_items import work_items, WorkItemConflict, CORRECTIONS, CORRECTED, content_hash
+from json_patch import apply_patch, JsonPatchError
+from archive_store import archive_store, read_archived
+from services.file_mover import file_mover
+from services.bulk_validation import validate_queue
+from list_query import ListQuery, apply_list_query
 from text_utils import validate_filename
 
 # Create Blueprint
 corrections_bp = Blueprint('corrections', __name__)
 
+# Fields of the batch validation ranking that may be sorted and filtered on
+VALIDATION_FIELDS = ('rank', 'name', 'patient_name', 'line_count', 'score', 'issue_count', 'checks')
+
 @corrections_bp.route('/')
 def index():
     """Render the OCR corrections interface."""
@@ -24,34 +36,113 @@ def index():
 @corrections_bp.route('/api/files', methods=['GET'])
 def list_files():
     """List all files that need OCR correction."""
-    files = [f.name for f in config.FOLDERS['FAILS_FOLDER'].glob('*.json')]
-    return jsonify({'files': files})
+    return file_list_response('corrections', 'corrections.get_thumbnail')
+
+@corrections_bp.route('/api/validation', methods=['GET'])
+def validation():
+    """
+    Rank every queued file by the problems batch validation finds in it
+    (see services.bulk_validation), worst first.
+    
+    Supports sort/order, q (filename, patient name or check), filters on
+    VALIDATION_FIELDS (e.g. ?checks=invalid_cpt) and limit/cursor pagination.
+    """
+    try:
+        query = ListQuery.from_args(request.args, VALIDATION_FIELDS, 'rank')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = apply_list_query(validate_queue(), query, 'name',
+                                  search_fields=('name', 'patient_name', 'checks'),
+                                  numeric_fields=('rank', 'line_count', 'score', 'issue_count'))
+        return jsonify({
+            'files': result['items'],
+            'total': result['total'],
+            'next_cursor': result['next_cursor']
+        })
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Error validating corrections queue: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+def load_file(filename):
+    """Read a JSON file from the fails folder, with service line units as integers."""
+    return read_file(filename)[1]
+
+def read_file(filename):
+    """Read a JSON file from the fails folder as (raw bytes, parsed with units as integers)."""
+    raw = (config.FOLDERS['FAILS_FOLDER'] / filename).read_bytes()
+    return raw, normalize_units(json.loads(raw))
+
+def normalize_units(data):
+    """Ensure numeric types for service line units, as the editor expects."""
+    if 'service_lines' in data:
+        for line in data['service_lines']:
+            if 'units' in line:
+                line['units'] = int(line['units']) if str(line['units']).isdigit() else 1
+    return data
 
 @corrections_bp.route('/api/file/<filename>', methods=['GET'])
 def get_file(filename):
     """Get the content of a specific JSON file."""
     try:
         safe_filename = validate_filename(filename)
-        file_path = config.FOLDERS['FAILS_FOLDER'] / safe_filename
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            # Ensure numeric types for units
-            if 'service_lines' in data:
-                for line in data['service_lines']:
-                    if 'units' in line:
-                        line['units'] = int(line['units']) if str(line['units']).isdigit() else 1
-            return jsonify({'data': data})
+        
+        # Opening a claimed file counts as activity on its lease
+        work_items.touch(safe_filename, current_reviewer(), config.WORK_ITEMS['LEASE_TTL'])
+        raw, data = read_file(safe_filename)
+        # base_hash is sent back with a patch save so a stale patch is refused
+        return jsonify({'data': data, 'base_hash': content_hash(raw)})
     except Exception as e:
         print(f"Error loading file {filename}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@corrections_bp.route('/api/history/<filename>', methods=['GET'])
+def get_history(filename):
+    """Get a file's work-item state and transition history."""
+    return work_item_response(validate_filename(filename))
+
+@corrections_bp.route('/api/original/<filename>', methods=['GET'])
+def get_original(filename):
+    """Get the document a file was corrected from, with the patch applied to it if any."""
+    safe_filename = validate_filename(filename)
+    patches = work_items.patches(safe_filename)
+    try:
+        try:
+            if not patches:
+                raise FileNotFoundError(safe_filename)
+            data = archive_store.get(patches[-1]['original_hash'])
+        except FileNotFoundError:
+            # Not patched, or the mover hasn't archived the original yet
+            data = read_archived('originals', safe_filename)
+    except FileNotFoundError:
+        return jsonify({'error': f'No archived original for {safe_filename}'}), 404
+    return jsonify({'data': json.loads(data), 'patch': patches[-1]['patch'] if patches else None})
+
+@corrections_bp.route('/api/next-bundle', methods=['GET'])
+def next_bundle():
+    """Get the JSON, patient info and region URLs of the next files to prefetch."""
+    return next_bundle_response('corrections', load_file, 'corrections.get_pdf_region_image',
+                                with_matches=False)
+
+@corrections_bp.route('/api/claim-next', methods=['POST'])
+def claim_next():
+    """Lease the next unclaimed file to the requesting reviewer."""
+    return claim_next_response('corrections')
+
+@corrections_bp.route('/api/lease/renew', methods=['POST'])
+def renew_lease():
+    """Extend the requesting reviewer's lease on a file."""
+    return renew_lease_response()
+
+@corrections_bp.route('/api/lease/release', methods=['POST'])
+def release_lease():
+    """Release the requesting reviewer's lease on a file."""
+    return release_lease_response()
+
 @corrections_bp.route('/api/pdf/<filename>', methods=['GET'])
 def get_pdf(filename):
     """Serve a PDF file for viewing."""
-    safe_filename = validate_filename(filename)
-    pdf_filename = Path(safe_filename).with_suffix('.pdf')
-    pdf_path = config.FOLDERS['PDF_FOLDER'] / pdf_filename
-    return send_file(pdf_path, mimetype='application/pdf') if pdf_path.exists() else (jsonify({'error': 'PDF not found'}), 404)
+    return pdf_response(filename)
 
 @corrections_bp.route('/api/pdf_region/<filename>/<region>', methods=['GET'])
 def get_pdf_region(filename, region):
@@ -61,35 +152,108 @@ def get_pdf_region(filename, region):
     logger.info(f"PDF region request received for file: {filename}, region: {region}")
     try:
         # Directly use our extract_pdf_region utility function which should now match the example
-        image_data = extract_pdf_region(filename, region)
+        image_data = extract_pdf_region(filename, region, render_options(), requested_page())
         return jsonify({'image': image_data})
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         logger.error(f"Error in get_pdf_region: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
+
+@corrections_bp.route('/api/pdf_region_image/<filename>/<region>', methods=['GET'])
+def get_pdf_region_image(filename, region):
+    """Get a specific region of a PDF as a binary PNG with HTTP caching validators."""
+    return region_image_response(filename, region)
+
+@corrections_bp.route('/api/pdf_regions/<filename>', methods=['GET'])
+def get_pdf_regions(filename):
+    """Render all configured regions of a PDF at once and return their image URLs."""
+    return regions_response(filename, 'corrections.get_pdf_region_image')
+
+@corrections_bp.route('/api/pdf_pages/<filename>', methods=['GET'])
+def get_pdf_pages(filename):
+    """Get the page sizes and tile grid of a PDF for lazy tiled viewing."""
+    return page_layout_response(filename, 'corrections.get_pdf_tile')
+
+@corrections_bp.route('/api/pdf_tile/<filename>/<int:page>/<int:zoom>/<int:x>/<int:y>', methods=['GET'])
+def get_pdf_tile(filename, page, zoom, x, y):
+    """Get one fixed-size tile of a PDF page at a zoom level as a binary image."""
+    return tile_response(filename, page, zoom, x, y)
+
+@corrections_bp.route('/api/thumbnail/<filename>/<kind>', methods=['GET'])
+def get_thumbnail(filename, kind):
+    """Get a small JPEG of a PDF's first page ('page') or its header ('header') for the file list."""
+    return thumbnail_response(filename, kind)
+
+@corrections_bp.route('/api/text_search', methods=['GET'])
+def text_search():
+    """Search the text layer of the archived PDFs (name, CPT, TIN) with highlight boxes."""
+    return text_search_response()
     
 
 @corrections_bp.route('/api/save', methods=['POST'])
 def save_file():
-    """Save changes to a file and move it to the output folder."""
+    """
+    Save changes to a file and move it to the output folder.
+
+    The client either sends only its edits as a JSON Patch ({'filename',
+    'patch', 'base_hash'}), which is applied to the copy in the fails folder
+    while the original is archived once in the compressed archive store and
+    the patch kept as the audit record, or the full 'content' and
+    'original_content' as before.
+
+    A patch must carry a precondition: base_hash (from /api/file) must still
+    match the file on disk (409 otherwise), or the patch must contain RFC 6902
+    'test' operations (422 when one fails).
+    """
     try:
         data = request.json
         filename = validate_filename(data['filename'])
-        content = data['content']
-        original_content = data['original_content']
-        
-        # Save processed file
-        with open(config.FOLDERS['OUTPUT_FOLDER'] / filename, 'w') as f:
-            json.dump(content, f, indent=2)
-            
-        # Archive original
-        with open(config.FOLDERS['ORIGINALS_FOLDER'] / filename, 'w') as f:
-            json.dump(original_content, f, indent=2)
-            
-        # Remove from fails folder
-        (config.FOLDERS['FAILS_FOLDER'] / filename).unlink(missing_ok=True)
+        source = config.FOLDERS['FAILS_FOLDER'] / filename
+
+        if 'patch' in data:
+            raw = source.read_bytes()
+            original_hash = content_hash(raw)
+            has_test = isinstance(data['patch'], list) and any(
+                isinstance(operation, dict) and operation.get('op') == 'test' for operation in data['patch'])
+            if data.get('base_hash') is None and not has_test:
+                return jsonify({'error': 'A patch needs a base_hash or a test operation'}), 428
+            if data.get('base_hash') is not None and data['base_hash'] != original_hash:
+                return jsonify({'error': f'{filename} has changed since it was loaded'}), 409
+            content = apply_patch(normalize_units(json.loads(raw)), data['patch'])
+
+            # Mark it corrected; writing the processed file, archiving the original
+            # (moves into the originals folder go to the archive store) and removing
+            # it from the fails folder are applied in the background, so nothing is
+            # archived unless the transition succeeds
+            work_items.transition(filename, CORRECTIONS, CORRECTED, source,
+                                  config.FOLDERS['OUTPUT_FOLDER'] / filename,
+                                  content, actor=current_reviewer(),
+                                  extra_writes=[(config.FOLDERS['ORIGINALS_FOLDER'] / filename, raw)],
+                                  patch=(original_hash, data['patch']))
+        else:
+            content = data['content']
+            original_content = data['original_content']
+
+            # Mark it corrected; writing the processed file, archiving the original and
+            # removing it from the fails folder are applied in the background
+            work_items.transition(filename, CORRECTIONS, CORRECTED, source,
+                                  config.FOLDERS['OUTPUT_FOLDER'] / filename,
+                                  content, actor=current_reviewer(),
+                                  extra_writes=[(config.FOLDERS['ORIGINALS_FOLDER'] / filename, original_content)])
+        file_mover.wake()
+        queue_indexes['corrections'].invalidate()
         
         return jsonify({'message': 'File saved successfully'})
+    except JsonPatchError as e:
+        return jsonify({'error': f'Patch does not apply: {e}'}), 422
+    except FileNotFoundError:
+        return jsonify({'error': f'{filename} is no longer in the corrections queue'}), 404
+    except WorkItemConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
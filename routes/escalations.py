@@ -1,7 +1,7 @@
 """
 Routes for the Escalations Dashboard functionality.
 """
-from flask import Blueprint, jsonify, request, render_template, send_file
+from flask import Blueprint, jsonify, request, render_template
 import json
 import config
 from pathlib import Path
@@ -11,7 +11,15 @@ import os
 import traceback
 
 # Import utilities
-from pdf_utils import get_pdf_path, extract_pdf_region
+from pdf_utils import extract_pdf_region, PDFNotFoundError
+from http_utils import (pdf_response, region_image_response, regions_response, render_options,
+                        requested_page, tile_response, page_layout_response, thumbnail_response,
+                        file_list_response, work_item_response,
+                        claim_next_response, renew_lease_response, release_lease_response,
+                        current_reviewer, bulk_action_response, next_bundle_response)
+from queue_index import queue_indexes
+from work_items import work_items, WorkItemConflict, ESCALATIONS, MAPPED, REJECTED
+from services.file_mover import file_mover
 from text_utils import validate_filename, split_patient_name
 from db_utils import search_by_name_and_dos, validate_cpt
 
@@ -31,8 +39,8 @@ def index():
 def list_files():
     """List all escalated JSON files."""
     try:
-        # Define the escalations folder path
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
+        # Same folder the work-item state machine and file mover use
+        escalations_folder = config.ESCALATIONS_FOLDER
         logger.info(f"Accessing escalations folder: {escalations_folder}")
         
         # Check if the folder exists
@@ -67,9 +75,7 @@ def list_files():
         
         # List files in the folder
         try:
-            files = [f.name for f in escalations_folder.glob('*.json')]
-            logger.info(f"Found {len(files)} files in escalations folder")
-            return jsonify({'files': files})
+            return file_list_response('escalations', 'escalations.get_thumbnail')
         except Exception as list_err:
             logger.error(f"Error listing files in escalations folder: {str(list_err)}")
             return jsonify({
@@ -85,39 +91,64 @@ def list_files():
             'files': []
         })
 
+def load_file(filename):
+    """Read an escalated JSON file."""
+    with open(config.ESCALATIONS_FOLDER / filename, 'r') as f:
+        return json.load(f)
+
 @escalations_bp.route('/api/file/<filename>', methods=['GET'])
 def get_file(filename):
     """Get the content of a specific escalated JSON file."""
     try:
         logger.info(f"Fetching escalated file: {filename}")
         safe_filename = validate_filename(filename)
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-        file_path = escalations_folder / safe_filename
+        file_path = config.ESCALATIONS_FOLDER / safe_filename
+        
+        # Opening a claimed file counts as activity on its lease
+        work_items.touch(safe_filename, current_reviewer(), config.WORK_ITEMS['LEASE_TTL'])
         
         if not file_path.exists():
             logger.warning(f"Escalated file not found: {file_path}")
             return jsonify({'error': f"File not found: {safe_filename}"}), 404
         
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            logger.info(f"Successfully loaded file: {filename}")
-            return jsonify({'data': data})
+        data = load_file(safe_filename)
+        logger.info(f"Successfully loaded file: {filename}")
+        return jsonify({'data': data})
     except Exception as e:
         logger.error(f"Error loading file {filename}: {e}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@escalations_bp.route('/api/history/<filename>', methods=['GET'])
+def get_history(filename):
+    """Get a file's work-item state and transition history."""
+    return work_item_response(validate_filename(filename))
+
+@escalations_bp.route('/api/next-bundle', methods=['GET'])
+def next_bundle():
+    """Get the JSON, patient info, region URLs and match candidates of the next files to prefetch."""
+    return next_bundle_response('escalations', load_file, 'escalations.get_pdf_region_image')
+
+@escalations_bp.route('/api/claim-next', methods=['POST'])
+def claim_next():
+    """Lease the next unclaimed file to the requesting reviewer."""
+    return claim_next_response('escalations')
+
+@escalations_bp.route('/api/lease/renew', methods=['POST'])
+def renew_lease():
+    """Extend the requesting reviewer's lease on a file."""
+    return renew_lease_response()
+
+@escalations_bp.route('/api/lease/release', methods=['POST'])
+def release_lease():
+    """Release the requesting reviewer's lease on a file."""
+    return release_lease_response()
+
 @escalations_bp.route('/api/pdf/<filename>', methods=['GET'])
 def get_pdf(filename):
     """Serve a PDF file for viewing."""
     try:
-        pdf_path = get_pdf_path(filename)
-        if pdf_path.exists():
-            logger.info(f"Serving PDF: {pdf_path}")
-            return send_file(pdf_path, mimetype='application/pdf')
-        else:
-            logger.warning(f"PDF not found: {pdf_path}")
-            return jsonify({'error': 'PDF not found'}), 404
+        return pdf_response(filename)
     except Exception as e:
         logger.error(f"Error serving PDF {filename}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -127,13 +158,44 @@ def get_pdf_region(filename, region):
     """Get a specific region of a PDF as an image."""
     try:
         logger.info(f"Extracting region {region} from PDF: {filename}")
-        image_data = extract_pdf_region(filename, region)
+        image_data = extract_pdf_region(filename, region, render_options(), requested_page())
         return jsonify({'image': image_data})
+    except PDFNotFoundError as e:
+        logger.warning(f"PDF not found for region request: {e}")
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        logger.warning(f"Could not render PDF region: {e}")
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         logger.error(f"Error extracting PDF region: {e}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@escalations_bp.route('/api/pdf_region_image/<filename>/<region>', methods=['GET'])
+def get_pdf_region_image(filename, region):
+    """Get a specific region of a PDF as a binary PNG with HTTP caching validators."""
+    return region_image_response(filename, region)
+
+@escalations_bp.route('/api/pdf_regions/<filename>', methods=['GET'])
+def get_pdf_regions(filename):
+    """Render all configured regions of a PDF at once and return their image URLs."""
+    return regions_response(filename, 'escalations.get_pdf_region_image')
+
+@escalations_bp.route('/api/pdf_pages/<filename>', methods=['GET'])
+def get_pdf_pages(filename):
+    """Get the page sizes and tile grid of a PDF for lazy tiled viewing."""
+    return page_layout_response(filename, 'escalations.get_pdf_tile')
+
+@escalations_bp.route('/api/pdf_tile/<filename>/<int:page>/<int:zoom>/<int:x>/<int:y>', methods=['GET'])
+def get_pdf_tile(filename, page, zoom, x, y):
+    """Get one fixed-size tile of a PDF page at a zoom level as a binary image."""
+    return tile_response(filename, page, zoom, x, y)
+
+@escalations_bp.route('/api/thumbnail/<filename>/<kind>', methods=['GET'])
+def get_thumbnail(filename, kind):
+    """Get a small JPEG of a PDF's first page ('page') or its header ('header') for the file list."""
+    return thumbnail_response(filename, kind)
+
 @escalations_bp.route('/api/search', methods=['POST'])
 def search():
     """Search the database for matching records."""
@@ -161,173 +223,198 @@ def search():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
-@escalations_bp.route('/api/resolve', methods=['POST'])
-def resolve_escalation():
+def _load_content(data, source_path):
+    """Use the edited content sent by the client, or the escalated file as it is."""
+    content = data.get('content')
+    if content is None:
+        with open(source_path, 'r') as f:
+            content = json.load(f)
+    return content
+
+def resolve_file(data, actor):
     """
-    Resolve an escalated record by providing an Order ID and FileMaker record number.
-    Moves the file to the mapped folder.
+    Resolve one escalated record with an Order ID and FileMaker record number
+    and queue its move to the mapped folder.
+    
+    Args:
+        data (dict): Request payload with 'filename', 'order_id', optional
+            'filemaker_number', 'resolution_notes' and edited 'content'
+            (read from the file when not given)
+        actor (str): Reviewer making the change
+        
+    Returns:
+        tuple: (response body dict, HTTP status)
     """
-    try:
-        data = request.json
-        filename = validate_filename(data.get('filename', ''))
-        content = data.get('content', {})
-        order_id = data.get('order_id', '')
-        filemaker_number = data.get('filemaker_number', '')
-        resolution_notes = data.get('resolution_notes', '')
+    filename = validate_filename(data.get('filename', ''))
+    order_id = data.get('order_id', '')
+    filemaker_number = data.get('filemaker_number', '')
+    resolution_notes = data.get('resolution_notes', '')
+    
+    logger.info(f"Resolving escalation for: {filename}")
+    
+    if not filename:
+        logger.warning("Missing filename in resolve request")
+        return {'error': 'Filename is required'}, 400
         
-        logger.info(f"Resolving escalation for: {filename}")
+    if not order_id:
+        logger.warning("Missing order ID in resolve request")
+        return {'error': 'Order ID is required to resolve an escalation'}, 400
         
-        if not filename:
-            logger.warning("Missing filename in resolve request")
-            return jsonify({'error': 'Filename is required'}), 400
-            
-        if not order_id:
-            logger.warning("Missing order ID in resolve request")
-            return jsonify({'error': 'Order ID is required to resolve an escalation'}), 400
-            
-        # Source file path
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-        source_path = escalations_folder / filename
+    # Source file path
+    source_path = config.ESCALATIONS_FOLDER / filename
+    
+    # Target file path
+    mapped_path = config.FOLDERS['MAPPED_FOLDER'] / filename
+    
+    if not source_path.exists():
+        logger.warning(f"Source file not found: {source_path}")
+        return {'error': f'Source file not found: {filename}'}, 404
+    
+    content = _load_content(data, source_path)
+    
+    # Update content with resolution info
+    content['order_id'] = order_id
+    content['filemaker_record_number'] = filemaker_number
+    
+    if not content.get('escalation'):
+        content['escalation'] = {}
         
-        # Target file path
-        mapped_path = config.FOLDERS['MAPPED_FOLDER'] / filename
+    # Add resolution info to escalation
+    content['escalation']['resolved'] = True
+    content['escalation']['resolution_notes'] = resolution_notes
+    content['escalation']['resolved_at'] = datetime.datetime.now().isoformat()
+    content['escalation']['resolved_by'] = actor
+    
+    # Mark it resolved; the move to the mapped folder is applied in the background
+    try:
+        work_items.transition(filename, ESCALATIONS, MAPPED, source_path, mapped_path, content,
+                              actor=actor, notes=resolution_notes)
+    except WorkItemConflict as conflict:
+        logger.warning(f"Escalation already handled: {conflict}")
+        return {'error': str(conflict)}, 409
+    logger.info(f"Queued move of resolved file to: {mapped_path}")
+    
+    return {'message': 'Escalation resolved successfully'}, 200
+
+def reject_file(data, actor):
+    """
+    Reject one escalated record and queue it for archiving (moves into the
+    rejected folder go to the compressed archive store).
+    
+    Args:
+        data (dict): Request payload with 'filename', 'rejection_reason' and
+            optionally the edited 'content' (read from the file when not given)
+        actor (str): Reviewer making the change
         
-        # Update content with resolution info
-        content['order_id'] = order_id
-        content['filemaker_record_number'] = filemaker_number
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    filename = validate_filename(data.get('filename', ''))
+    rejection_reason = data.get('rejection_reason', '')
+    
+    logger.info(f"Rejecting escalation for: {filename}")
+    
+    if not filename:
+        logger.warning("Missing filename in reject request")
+        return {'error': 'Filename is required'}, 400
         
-        if not content.get('escalation'):
-            content['escalation'] = {}
-            
-        # Add resolution info to escalation
-        content['escalation']['resolved'] = True
-        content['escalation']['resolution_notes'] = resolution_notes
-        content['escalation']['resolved_at'] = datetime.datetime.now().isoformat()
-        content['escalation']['resolved_by'] = request.environ.get('REMOTE_USER', 'unknown')
+    if not rejection_reason:
+        logger.warning("Missing rejection reason in reject request")
+        return {'error': 'Rejection reason is required'}, 400
         
-        # Move the file to the mapped folder
-        if source_path.exists():
-            try:
-                # Write to the mapped folder with resolution data
-                with open(mapped_path, 'w') as f:
-                    json.dump(content, f, indent=2)
-                logger.info(f"Wrote resolved file to: {mapped_path}")
-                    
-                # Remove from escalations folder
-                source_path.unlink()
-                logger.info(f"Removed file from escalations folder: {source_path}")
-                
-                return jsonify({'message': 'Escalation resolved successfully'})
-            except Exception as move_err:
-                logger.error(f"Error moving file: {str(move_err)}")
-                return jsonify({'error': f"Error moving file: {str(move_err)}"}), 500
-        else:
-            logger.warning(f"Source file not found: {source_path}")
-            return jsonify({'error': f'Source file not found: {filename}'}), 404
+    # Source file path
+    source_path = config.ESCALATIONS_FOLDER / filename
+    
+    # Target file path
+    rejected_path = config.REJECTED_FOLDER / filename
+    
+    if not source_path.exists():
+        logger.warning(f"Source file not found: {source_path}")
+        return {'error': f'Source file not found: {filename}'}, 404
+    
+    content = _load_content(data, source_path)
+    
+    # Update content with rejection info
+    if not content.get('escalation'):
+        content['escalation'] = {}
+        
+    # Add rejection info to escalation
+    content['escalation']['rejected'] = True
+    content['escalation']['rejection_reason'] = rejection_reason
+    content['escalation']['rejected_at'] = datetime.datetime.now().isoformat()
+    content['escalation']['rejected_by'] = actor
+    
+    # Mark it rejected; the move to the rejected folder is applied in the background
+    try:
+        work_items.transition(filename, ESCALATIONS, REJECTED, source_path, rejected_path, content,
+                              actor=actor, notes=rejection_reason)
+    except WorkItemConflict as conflict:
+        logger.warning(f"Escalation already handled: {conflict}")
+        return {'error': str(conflict)}, 409
+    logger.info(f"Queued move of rejected file to: {rejected_path}")
+    
+    return {'message': 'Escalation rejected successfully'}, 200
+
+@escalations_bp.route('/api/resolve', methods=['POST'])
+def resolve_escalation():
+    """
+    Resolve an escalated record by providing an Order ID and FileMaker record number.
+    Moves the file to the mapped folder.
+    """
+    try:
+        body, status = resolve_file(request.json, current_reviewer())
+        if status == 200:
+            file_mover.wake()
+            queue_indexes['escalations'].invalidate()
+        return jsonify(body), status
             
     except Exception as e:
         logger.error(f"Error in resolve_escalation: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@escalations_bp.route('/api/resolve/bulk', methods=['POST'])
+def resolve_escalation_bulk():
+    """Resolve many escalated records in one request (see http_utils.bulk_action_response)."""
+    return bulk_action_response(resolve_file, ('escalations',))
+
 @escalations_bp.route('/api/reject', methods=['POST'])
 def reject_escalation():
     """
-    Reject an escalated record and move it to a rejected folder.
+    Reject an escalated record and queue it for archiving.
     """
     try:
-        data = request.json
-        filename = validate_filename(data.get('filename', ''))
-        content = data.get('content', {})
-        rejection_reason = data.get('rejection_reason', '')
-        
-        logger.info(f"Rejecting escalation for: {filename}")
-        
-        if not filename:
-            logger.warning("Missing filename in reject request")
-            return jsonify({'error': 'Filename is required'}), 400
-            
-        if not rejection_reason:
-            logger.warning("Missing rejection reason in reject request")
-            return jsonify({'error': 'Rejection reason is required'}), 400
-            
-        # Source file path
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-        source_path = escalations_folder / filename
-        
-        # Ensure the rejected folder exists
-        rejected_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\rejected"
-        try:
-            if not rejected_folder.exists():
-                logger.info(f"Creating rejected folder: {rejected_folder}")
-                rejected_folder.mkdir(parents=True, exist_ok=True)
-        except Exception as folder_err:
-            logger.error(f"Failed to create rejected folder: {str(folder_err)}")
-            return jsonify({'error': f"Failed to create rejected folder: {str(folder_err)}"}), 500
-        
-        # Target file path
-        rejected_path = rejected_folder / filename
-        
-        # Update content with rejection info
-        if not content.get('escalation'):
-            content['escalation'] = {}
-            
-        # Add rejection info to escalation
-        content['escalation']['rejected'] = True
-        content['escalation']['rejection_reason'] = rejection_reason
-        content['escalation']['rejected_at'] = datetime.datetime.now().isoformat()
-        content['escalation']['rejected_by'] = request.environ.get('REMOTE_USER', 'unknown')
-        
-        # Move the file to the rejected folder
-        if source_path.exists():
-            try:
-                # Write to the rejected folder with rejection data
-                with open(rejected_path, 'w') as f:
-                    json.dump(content, f, indent=2)
-                logger.info(f"Wrote rejected file to: {rejected_path}")
-                    
-                # Remove from escalations folder
-                source_path.unlink()
-                logger.info(f"Removed file from escalations folder: {source_path}")
-                
-                return jsonify({'message': 'Escalation rejected successfully'})
-            except Exception as move_err:
-                logger.error(f"Error moving file: {str(move_err)}")
-                return jsonify({'error': f"Error moving file: {str(move_err)}"}), 500
-        else:
-            logger.warning(f"Source file not found: {source_path}")
-            return jsonify({'error': f'Source file not found: {filename}'}), 404
+        body, status = reject_file(request.json, current_reviewer())
+        if status == 200:
+            file_mover.wake()
+            queue_indexes['escalations'].invalidate()
+        return jsonify(body), status
             
     except Exception as e:
         logger.error(f"Error in reject_escalation: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@escalations_bp.route('/api/reject/bulk', methods=['POST'])
+def reject_escalation_bulk():
+    """Reject many escalated records in one request (see http_utils.bulk_action_response)."""
+    return bulk_action_response(reject_file, ('escalations',))
+
 @escalations_bp.route('/api/extract_patient_info/<filename>', methods=['GET'])
 def extract_patient_info(filename):
     """Extract patient name and DOS from a file to pre-populate search."""
     try:
         logger.info(f"Extracting patient info from: {filename}")
         safe_filename = validate_filename(filename)
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-        file_path = escalations_folder / safe_filename
         
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        # The queue index already holds the patient name and first DOS
+        entry = queue_indexes['escalations'].get(safe_filename)
+        if entry is None:
+            logger.warning(f"File not found: {safe_filename}")
             return jsonify({'error': f"File not found: {safe_filename}"}), 404
         
-        with open(file_path, 'r') as f:
-            json_data = json.load(f)
-            
-        # Extract patient name
-        patient_name = json_data.get("patient_info", {}).get("patient_name", "")
-        first_name, last_name = split_patient_name(patient_name)
-        
-        # Extract DOS from first service line
-        first_dos = ""
-        service_lines = json_data.get("service_lines", [])
-        if service_lines and len(service_lines) > 0:
-            first_dos = service_lines[0].get("date_of_service", "")
+        first_name, last_name = split_patient_name(entry['patient_name'])
+        first_dos = entry['first_dos']
             
         logger.info(f"Extracted patient info: {first_name} {last_name}, DOS: {first_dos}")
         return jsonify({
@@ -5,7 +5,6 @@ This module handles routes for identifying and correcting rate-related
 issues for out-of-network providers.
 """
 
-import json
 import logging
 from pathlib import Path
 from typing import Dict, List, Any
@@ -17,6 +16,9 @@ import pandas as pd
 from config import BASE_PATH, DB_PATH
 from services.ppo_updater import PPOUpdater
 from services.database import get_db_connection
+from services.validation_failures import load_latest_failures
+from services.rate_revalidation import rate_revalidator
+from list_query import ListQuery, apply_list_query
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,6 +26,9 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 ota_corrections_bp = Blueprint('ota_corrections', __name__)
 
+# Fields the provider list can be sorted and filtered on
+PROVIDER_LIST_FIELDS = ('tin', 'name', 'network', 'total_line_items', 'missing_rate_line_items', 'cpt_codes')
+
 @ota_corrections_bp.route('/')
 def index():
     """Render the OTA corrections dashboard."""
@@ -36,129 +41,49 @@ def get_validation_failures() -> List[Dict[str, Any]]:
     Returns:
         List of validation failure records
     """
-    validation_logs_path = BASE_PATH / "validation logs"
-    
-    # Check if directory exists
-    if not validation_logs_path.exists():
-        logger.error(f"Validation logs directory not found at {validation_logs_path}")
-        return []
-    
-    # Find the most recent validation failures file
-    failures_files = list(validation_logs_path.glob('validation_failures_*.json'))
+    # Parsed once per version of the latest file
+    failures = load_latest_failures(BASE_PATH / "validation logs")
     
-    if not failures_files:
-        logger.warning("No validation failure files found")
-        return []
-    
-    # Get the most recent file
-    latest_file = max(failures_files, key=lambda f: f.stat().st_mtime)
-    
-    try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            failures = json.load(f)
-            # Validate the structure of each failure
-            validated_failures = []
-            for failure in failures:
-                if not isinstance(failure, dict):
-                    continue
-                if 'validation_type' not in failure:
-                    continue
-                if 'provider_info' not in failure or not isinstance(failure['provider_info'], dict):
-                    continue
-                validated_failures.append(failure)
-            return validated_failures
-    except Exception as e:
-        logger.error(f"Error reading validation failures file: {e}")
-        return []
+    # Validate the structure of each failure
+    validated_failures = []
+    for failure in failures:
+        if not isinstance(failure, dict):
+            continue
+        if 'validation_type' not in failure:
+            continue
+        if 'provider_info' not in failure or not isinstance(failure['provider_info'], dict):
+            continue
+        validated_failures.append(failure)
+    return validated_failures
 
 @ota_corrections_bp.route('/api/providers/missing-rates', methods=['GET'])
 def get_ota_providers_missing_rates():
     """
     Retrieve out-of-network providers with missing rate information.
     
+    Supports sort/order, q (name, TIN or CPT), filters on PROVIDER_LIST_FIELDS
+    and limit/cursor pagination (see list_query.ListQuery).
+    
     Returns:
         JSON response with provider rate failure details
     """
     try:
-        # Get database connection
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Get all validation failures
-        all_failures = get_validation_failures()
-        
-        # Filter for rate-related failures and out-of-network providers
-        rate_failures = []
-        for failure in all_failures:
-            if failure.get('validation_type') != 'rate':
-                continue
-                
-            provider_info = failure.get('provider_info', {})
-            network = provider_info.get('Provider Network', '')
-            
-            # Skip if network is None or empty
-            if not network:
-                continue
-                
-            # Check if provider is out-of-network
-            network_lower = network.lower()
-            if any(term in network_lower for term in ['out of network', 'out-of-network', 'ota']):
-                rate_failures.append(failure)
-        
-        # Group failures by provider
-        providers = {}
-        for failure in rate_failures:
-            # Extract provider information
-            provider_info = failure.get('provider_info', {})
-            tin = provider_info.get('TIN', '')
-            
-            # Clean TIN
-            tin = ''.join(c for c in str(tin) if c.isdigit())
-            if len(tin) != 9:
-                continue
-            
-            if tin not in providers:
-                providers[tin] = {
-                    'tin': tin,
-                    'name': provider_info.get('DBA Name Billing Name', 'Unknown Provider'),
-                    'network': provider_info.get('Provider Network', 'Unknown'),
-                    'total_line_items': 0,
-                    'missing_rate_line_items': 0,
-                    'cpt_codes': set()
-                }
-            
-            # Check rates array for missing rates
-            rates = failure.get('rates', [])
-            for rate in rates:
-                cpt_code = rate.get('cpt')
-                if not cpt_code:
-                    continue
-                    
-                # Check if rate exists in current_otas table
-                order_id = failure.get('order_id')
-                if order_id:
-                    cursor.execute("""
-                        SELECT rate FROM current_otas 
-                        WHERE ID_Order_PrimaryKey = ? AND CPT = ?
-                    """, (order_id, cpt_code))
-                    
-                    existing_rate = cursor.fetchone()
-                    if not existing_rate:
-                        providers[tin]['missing_rate_line_items'] += 1
-                        providers[tin]['cpt_codes'].add(cpt_code)
-                
-                providers[tin]['total_line_items'] += 1
-        
-        cursor.close()
-        db.close()
-        
-        # Convert CPT code sets to lists for JSON serialization
-        for provider in providers.values():
-            provider['cpt_codes'] = list(provider['cpt_codes'])
+        query = ListQuery.from_args(request.args, PROVIDER_LIST_FIELDS, 'name')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Per-provider summaries kept current by the revalidator as OTA rates are saved
+        providers = rate_revalidator.provider_summaries('ota')
+        for provider in providers:
+            provider.pop('missing_category_line_items', None)
         
+        result = apply_list_query(providers, query, 'tin',
+                                  search_fields=('name', 'tin', 'cpt_codes'))
         return jsonify({
-            'providers': list(providers.values()),
-            'total': len(providers)
+            'providers': result['items'],
+            'total': result['total'],
+            'next_cursor': result['next_cursor']
         })
         
     except Exception as e:
@@ -368,6 +293,11 @@ def save_ota_line_item_corrections():
         cursor.close()
         db.close()
         
+        # Show the fixes on the dashboards without waiting for the pipeline
+        rate_revalidator.ota_rates_changed(
+            (update['order_id'], update['cpt_code']) for update in successful_updates
+        )
+        
         return jsonify({
             'success': len(failed_updates) == 0,
             'successful_updates': successful_updates,
@@ -391,8 +321,8 @@ def save_ota_category_corrections():
         if not tin or not category_rates:
             return jsonify({'error': 'TIN and category rates are required'}), 400
         
-        # Initialize PPO updater
-        ppo_updater = PPOUpdater(DB_PATH)
+        # Initialize PPO updater; saved rates re-validate the affected failures
+        ppo_updater = PPOUpdater(DB_PATH, on_change=rate_revalidator.ppo_rates_changed)
         
         # Update rates by category
         success, message = ppo_updater.update_rate_by_category(
@@ -472,6 +402,7 @@ def save_line_item():
                 """, (cpt_code, current_rate, current_modifier, order_id))
 
             db.commit()
+            rate_revalidator.ota_rates_changed([(order_id, cpt_code)])
             return jsonify({'success': True})
 
         finally:
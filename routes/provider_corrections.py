@@ -1,13 +1,13 @@
 """
 Routes for the Provider Corrections functionality.
 """
-from flask import Blueprint, jsonify, request, render_template, send_file
-import json
+from flask import Blueprint, jsonify, request, render_template
 import logging
-import os
-from pathlib import Path
 from services.provider_updater import ProviderUpdater
 from services.database import get_db_connection
+from services.validation_failures import latest_failures_file, load_latest_failures
+from http_utils import pdf_response
+from list_query import ListQuery, apply_list_query
 import config
 
 # Configure logging
@@ -17,6 +17,15 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 provider_corrections_bp = Blueprint('provider_corrections', __name__)
 
+# Provider fields that must be filled in before a provider is complete
+PROVIDER_REQUIRED_FIELDS = ("Billing Address 1", "Billing Address City", "Billing Address Postal Code",
+                            "Billing Address State", "Billing Name", "Provider Network", "Provider Status",
+                            "Provider Type", "TIN")
+
+# Fields the provider list can be sorted and filtered on
+PROVIDER_LIST_FIELDS = ('PrimaryKey', 'DBA Name Billing Name', 'Billing Name', 'TIN', 'Provider Network',
+                        'Provider Type', 'file_name', 'date_of_service', 'missing_fields')
+
 @provider_corrections_bp.route('/')
 def index():
     """Render the provider corrections interface."""
@@ -27,88 +36,78 @@ def list_missing_providers_from_failures():
     """
     Fetch providers with missing details from the latest validation failures JSON.
     Then verify against the database which fields are still actually missing.
+    
+    Supports sort/order, q (name, TIN or file), filters on PROVIDER_LIST_FIELDS
+    and limit/cursor pagination (see list_query.ListQuery).
     """
     try:
-        log_dir = Path(config.VALIDATION_LOGS_PATH)
-        failures_files = list(log_dir.glob('validation_failures_*.json'))
-
-        if not failures_files:
+        query = ListQuery.from_args(request.args, PROVIDER_LIST_FIELDS, 'DBA Name Billing Name')
+    except ValueError as e:
+        return jsonify({'error': str(e), 'providers': []}), 400
+    
+    try:
+        if latest_failures_file(config.VALIDATION_LOGS_PATH) is None:
             return jsonify({'error': 'No validation failure files found', 'providers': []}), 404
 
-        # Get the latest validation failures file
-        latest_file = sorted(failures_files, key=os.path.getmtime, reverse=True)[0]
-        logger.info(f"Using validation failures file: {latest_file}")
+        # Parsed once per version of the latest file
+        all_failures = load_latest_failures(config.VALIDATION_LOGS_PATH)
 
-        # Load JSON content
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            all_failures = json.load(f)
+        # First failure per provider
+        failures_by_key = {}
+        for failure in all_failures:
+            primary_key = (failure.get("provider_info") or {}).get("PrimaryKey")
+            if primary_key and primary_key not in failures_by_key:
+                failures_by_key[primary_key] = failure
 
         # Get database connection
         db = get_db_connection()
         cursor = db.cursor()
 
-        missing_providers = []
-        processed_primary_keys = set()  # Track processed providers to avoid duplicates
-
-        for failure in all_failures:
-            provider = failure.get("provider_info", {})
-            primary_key = provider.get("PrimaryKey")
-
-            if not primary_key or primary_key in processed_primary_keys:
-                continue
-
-            processed_primary_keys.add(primary_key)
-
-            # Query the database for current provider data
+        # Fetch the current provider rows in batches instead of one query per provider
+        db_providers = {}
+        primary_keys = list(failures_by_key)
+        for start in range(0, len(primary_keys), 500):
+            chunk = primary_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
             try:
-                cursor.execute("""
-                    SELECT 
-                        "Billing Address 1",
-                        "Billing Address City",
-                        "Billing Address Postal Code",
-                        "Billing Address State",
-                        "Billing Name",
-                        "Provider Network",
-                        "Provider Status",
-                        "Provider Type",
-                        "TIN"
-                    FROM providers 
-                    WHERE PrimaryKey = ?
-                """, (primary_key,))
-                
-                db_provider = cursor.fetchone()
-                
-                # Check which fields are still missing
-                missing_fields = []
-                if db_provider:
-                    for field in ["Billing Address 1", "Billing Address City", "Billing Address Postal Code",
-                                "Billing Address State", "Billing Name", "Provider Network", "Provider Status",
-                                "Provider Type", "TIN"]:
-                        if not db_provider.get(field):
-                            missing_fields.append(field)
-                else:
-                    # If provider not in DB, use all fields from failure
-                    missing_fields = ["Billing Address 1", "Billing Address City", "Billing Address Postal Code",
-                                    "Billing Address State", "Billing Name", "Provider Network", "Provider Status",
-                                    "Provider Type", "TIN"]
-
-                if missing_fields:  # Only include provider if they still have missing fields
-                    provider["missing_fields"] = missing_fields
-                    provider["file_name"] = failure.get("file_name", "Unknown")
-                    provider["date_of_service"] = failure.get("date_of_service", "Unknown")
-                    missing_providers.append(provider)
-
+                cursor.execute(f"""
+                    SELECT PrimaryKey, {', '.join(f'"{field}"' for field in PROVIDER_REQUIRED_FIELDS)}
+                    FROM providers
+                    WHERE PrimaryKey IN ({placeholders})
+                """, chunk)
+                db_providers.update((row['PrimaryKey'], row) for row in cursor.fetchall())
             except Exception as e:
-                logger.error(f"Error processing provider {primary_key}: {str(e)}")
-                continue
+                logger.error(f"Error loading providers from database: {str(e)}")
 
         cursor.close()
         db.close()
 
+        missing_providers = []
+        for primary_key, failure in failures_by_key.items():
+            db_provider = db_providers.get(primary_key)
+
+            # Check which fields are still missing
+            if db_provider:
+                missing_fields = [field for field in PROVIDER_REQUIRED_FIELDS if not db_provider.get(field)]
+            else:
+                # If provider not in DB, use all fields from failure
+                missing_fields = list(PROVIDER_REQUIRED_FIELDS)
+
+            if missing_fields:  # Only include provider if they still have missing fields
+                # Copy so the cached failures aren't modified
+                provider = dict(failure.get("provider_info", {}))
+                provider["missing_fields"] = missing_fields
+                provider["file_name"] = failure.get("file_name", "Unknown")
+                provider["date_of_service"] = failure.get("date_of_service", "Unknown")
+                missing_providers.append(provider)
+
         logger.info(f"Found {len(missing_providers)} providers with missing fields")
+        result = apply_list_query(missing_providers, query, 'PrimaryKey',
+                                  search_fields=('DBA Name Billing Name', 'Billing Name', 'TIN', 'file_name'))
         return jsonify({
-            "providers": missing_providers,
-            "total": len(missing_providers)
+            "providers": result['items'],
+            "total": result['total'],
+            "next_cursor": result['next_cursor']
         })
 
     except Exception as e:
@@ -119,13 +118,7 @@ def list_missing_providers_from_failures():
 def get_pdf(filename):
     """Serve a PDF file for viewing."""
     try:
-        pdf_filename = Path(filename).stem + '.pdf'
-        pdf_path = config.FOLDERS['PDF_FOLDER'] / pdf_filename
-
-        if not pdf_path.exists():
-            return jsonify({'error': 'PDF not found'}), 404
-
-        return send_file(pdf_path, mimetype='application/pdf')
+        return pdf_response(filename)
 
     except Exception as e:
         logger.error(f"Error serving PDF {filename}: {e}")
@@ -5,7 +5,6 @@ This module handles routes for identifying and correcting rate-related
 issues in medical billing records.
 """
 
-import json
 import logging
 from pathlib import Path
 from typing import Dict, List, Any
@@ -16,6 +15,10 @@ import pandas as pd
 
 from config import BASE_PATH, DB_PATH
 from services.ppo_updater import PPOUpdater
+from services.validation_failures import load_latest_failures
+from services.rate_revalidation import rate_revalidator
+from services.pricing import cached_records
+from list_query import ListQuery, apply_list_query
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,6 +26,24 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 rate_corrections_bp = Blueprint('rate_corrections', __name__)
 
+# Fields the provider lists can be sorted and filtered on
+PROVIDER_LIST_FIELDS = ('tin', 'name', 'network', 'total_line_items', 'missing_rate_line_items',
+                        'missing_category_line_items', 'cpt_codes')
+
+# Level -> (rows key, key field, fields the rows can be sorted and filtered on)
+PRICING_LEVELS = {
+    'provider': ('providers', 'tin', ('tin', 'provider_name', 'network', 'bills', 'line_count',
+                                      'priced_lines', 'billed', 'expected', 'variance', 'fully_priced')),
+    'bill': ('bills', 'bill', ('bill', 'order_id', 'patient_name', 'date_of_service', 'tin',
+                               'provider_name', 'network', 'line_count', 'priced_lines', 'billed',
+                               'expected', 'variance', 'fully_priced')),
+    'line': ('lines', 'line_id', ('line_id', 'bill', 'order_id', 'date_of_service', 'tin',
+                                  'provider_name', 'network', 'cpt', 'modifier', 'category', 'units',
+                                  'charge', 'rate', 'rate_source', 'expected', 'variance')),
+}
+PRICING_NUMERIC_FIELDS = ('bills', 'line_count', 'priced_lines', 'billed', 'expected', 'variance',
+                          'units', 'charge', 'rate')
+
 @rate_corrections_bp.route('/')
 def index():
     """Render the rate corrections dashboard."""
@@ -35,108 +56,60 @@ def get_validation_failures() -> List[Dict[str, Any]]:
     Returns:
         List of validation failure records
     """
-    validation_logs_path = BASE_PATH / "validation logs"
-    
-    # Check if directory exists
-    if not validation_logs_path.exists():
-        logger.error(f"Validation logs directory not found at {validation_logs_path}")
-        return []
-    
-    # Find the most recent validation failures file
-    failures_files = list(validation_logs_path.glob('validation_failures_*.json'))
-    
-    if not failures_files:
-        logger.warning("No validation failure files found")
-        return []
+    # Parsed once per version of the latest file
+    failures = load_latest_failures(BASE_PATH / "validation logs")
     
-    # Get the most recent file
-    latest_file = max(failures_files, key=lambda f: f.stat().st_mtime)
-    
-    try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            failures = json.load(f)
-            # Validate the structure of each failure
-            validated_failures = []
-            for failure in failures:
-                if not isinstance(failure, dict):
-                    continue
-                if 'validation_type' not in failure:
-                    continue
-                if 'provider_info' not in failure or not isinstance(failure['provider_info'], dict):
-                    continue
-                validated_failures.append(failure)
-            return validated_failures
-    except Exception as e:
-        logger.error(f"Error reading validation failures file: {e}")
-        return []
+    # Validate the structure of each failure
+    validated_failures = []
+    for failure in failures:
+        if not isinstance(failure, dict):
+            continue
+        if 'validation_type' not in failure:
+            continue
+        if 'provider_info' not in failure or not isinstance(failure['provider_info'], dict):
+            continue
+        validated_failures.append(failure)
+    return validated_failures
 
 @rate_corrections_bp.route('/api/providers/missing-rates', methods=['GET'])
 def get_providers_missing_rates():
     """
     Retrieve providers with missing rate information.
     Excludes out-of-network providers which are handled separately.
+    Line items count as missing a rate until they pass validation, including
+    re-validation after a rate is saved here (see services.rate_revalidation).
+    
+    Supports sort/order, q (name, TIN or CPT), filters on PROVIDER_LIST_FIELDS
+    and limit/cursor pagination (see list_query.ListQuery).
     
     Returns:
-        JSON response with provider rate failure details
+        JSON with the page of providers, total, next_cursor and totals
+        (missing rates, missing categories and CPT codes over every provider)
     """
     try:
-        # Get all validation failures
-        all_failures = get_validation_failures()
-        
-        # Filter for rate-related failures
-        rate_failures = [
-            f for f in all_failures 
-            if f.get('validation_type') == 'rate'
-        ]
-        
-        # Group failures by provider
-        providers = {}
-        for failure in rate_failures:
-            # Extract provider information
-            provider_info = failure.get('provider_info', {})
-            tin = provider_info.get('TIN', '')
-            network = provider_info.get('Provider Network', '').lower() if provider_info.get('Provider Network') else ''
-            
-            # Skip out-of-network providers
-            if any(term in network for term in ['out of network', 'out-of-network', 'ota']):
-                continue
-            
-            # Clean TIN
-            tin = ''.join(c for c in str(tin) if c.isdigit())
-            if len(tin) != 9:
-                continue
-            
-            if tin not in providers:
-                providers[tin] = {
-                    'tin': tin,
-                    'name': provider_info.get('DBA Name Billing Name', 'Unknown Provider'),
-                    'network': provider_info.get('Provider Network', 'Unknown'),
-                    'total_line_items': 0,
-                    'missing_rate_line_items': 0,
-                    'missing_category_line_items': 0,
-                    'cpt_codes': set()
-                }
-            
-            # Count line items and CPT codes
-            if failure.get('rates'):
-                providers[tin]['total_line_items'] += len(failure['rates'])
-                providers[tin]['missing_rate_line_items'] += sum(
-                    1 for rate in failure['rates'] if not rate.get('rate')
-                )
-                providers[tin]['missing_category_line_items'] += sum(
-                    1 for rate in failure['rates'] if not rate.get('category') or rate.get('category') == 'Uncategorized'
-                )
-                
-                # Track unique CPT codes
-                providers[tin]['cpt_codes'].update(
-                    rate.get('cpt') for rate in failure['rates'] if rate.get('cpt')
-                )
-        
-        # Convert set to list for JSON serialization
-        for provider in providers.values():
-            provider['cpt_codes'] = list(provider['cpt_codes'])
+        query = ListQuery.from_args(request.args, PROVIDER_LIST_FIELDS, 'name')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Per-provider summaries kept current by the revalidator as rates are edited
+        providers = rate_revalidator.provider_summaries('ppo')
         
-        return jsonify(list(providers.values()))
+        result = apply_list_query(providers, query, 'tin',
+                                  search_fields=('name', 'tin', 'cpt_codes'))
+        # Dashboard metrics, which a single page can't provide
+        totals = {
+            'providers': len(providers),
+            'missing_rate_line_items': sum(p['missing_rate_line_items'] for p in providers),
+            'missing_category_line_items': sum(p['missing_category_line_items'] for p in providers),
+            'cpt_codes': sum(len(p['cpt_codes']) for p in providers)
+        }
+        return jsonify({
+            'providers': result['items'],
+            'total': result['total'],
+            'next_cursor': result['next_cursor'],
+            'totals': totals
+        })
     
     except Exception as e:
         logger.error(f"Error retrieving providers with missing rates: {e}")
@@ -247,8 +220,8 @@ def save_line_item_corrections():
         if not tin or not line_items:
             return jsonify({'error': 'TIN and line items are required'}), 400
         
-        # Initialize PPO updater
-        ppo_updater = PPOUpdater(DB_PATH)
+        # Initialize PPO updater; saved rates re-validate the affected failures
+        ppo_updater = PPOUpdater(DB_PATH, on_change=rate_revalidator.ppo_rates_changed)
         
         # Track updates
         successful_updates = []
@@ -325,8 +298,8 @@ def save_category_corrections():
         if not tin or not category_rates:
             return jsonify({'error': 'TIN and category rates are required'}), 400
         
-        # Initialize PPO updater
-        ppo_updater = PPOUpdater(DB_PATH)
+        # Initialize PPO updater; saved rates re-validate the affected failures
+        ppo_updater = PPOUpdater(DB_PATH, on_change=rate_revalidator.ppo_rates_changed)
         
         # Update rates by category
         success, message = ppo_updater.update_rate_by_category(
@@ -357,4 +330,108 @@ def save_category_corrections():
     
     except Exception as e:
         logger.error(f"Error saving category corrections: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@rate_corrections_bp.route('/api/corrections/category/preview', methods=['POST'])
+def preview_category_corrections():
+    """
+    Preview category-based rate corrections for a provider without saving:
+    which ppo rows would be inserted or overwritten (with rate deltas), and
+    how many failing line items and dollars the new rates would resolve.
+    """
+    try:
+        data = request.json or {}
+        tin = data.get('tin')
+        category_rates = data.get('category_rates', {})
+        
+        if not tin or not category_rates:
+            return jsonify({'error': 'TIN and category rates are required'}), 400
+        
+        # Validate rates
+        try:
+            category_rates = {category: float(rate) for category, rate in category_rates.items()}
+            if any(rate <= 0 for rate in category_rates.values()):
+                raise ValueError("Rate must be positive")
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid rate value'}), 400
+        
+        ppo_updater = PPOUpdater(DB_PATH)
+        try:
+            rows = ppo_updater.preview_rate_by_category(tin, category_rates)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        categories = {}
+        totals = {'insert': 0, 'overwrite': 0, 'unchanged': 0}
+        for row in rows:
+            category = categories.setdefault(row['category'], {
+                'rate': category_rates[row['category']],
+                'insert': 0, 'overwrite': 0, 'unchanged': 0
+            })
+            category[row['action']] += 1
+            totals[row['action']] += 1
+        
+        resolves = rate_revalidator.preview_ppo_rates(
+            tin, {row['cpt_code']: row['new_rate'] for row in rows}
+        )
+        
+        return jsonify({
+            'tin': ''.join(c for c in str(tin) if c.isdigit()),
+            'rows': rows,
+            'categories': categories,
+            'totals': dict(totals, total=len(rows)),
+            'resolves': resolves
+        })
+    
+    except Exception as e:
+        logger.error(f"Error previewing category corrections: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@rate_corrections_bp.route('/api/pricing', methods=['GET'])
+def get_pricing():
+    """
+    Expected reimbursement vs billed charges over the validation failures
+    history (see services.pricing), per provider, bill or line.
+    
+    Query parameters:
+        level: provider (default), bill or line
+        since, until: Date of service range, YYYY-MM-DD (since defaults to
+            PRICING['HISTORY_DAYS'] ago)
+    
+    Supports sort/order, q, filters on the level's fields (e.g.
+    ?rate_source=category) and limit/cursor pagination. The pricing is
+    cached until the failures files or rate tables change, so every page
+    of a listing comes from the same pricing.
+    
+    Returns:
+        JSON with the level's rows (providers, bills or lines), total,
+        next_cursor and totals (billed and expected over every row)
+    """
+    level = request.args.get('level', 'provider')
+    if level not in PRICING_LEVELS:
+        return jsonify({'error': f"Invalid level: {level}"}), 400
+    rows_key, key_field, fields = PRICING_LEVELS[level]
+    
+    try:
+        query = ListQuery.from_args(request.args, fields, key_field)
+        since, until = (pd.Timestamp(request.args[name]) if request.args.get(name) else None
+                        for name in ('since', 'until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Priced once per set of inputs, so cursor pages are consistent and cheap
+        rows, totals = cached_records(level, since, until)
+        result = apply_list_query(rows, query, key_field,
+                                  search_fields=('tin', 'provider_name', 'bill', 'patient_name', 'cpt'),
+                                  numeric_fields=PRICING_NUMERIC_FIELDS)
+        return jsonify({
+            rows_key: result['items'],
+            'total': result['total'],
+            'next_cursor': result['next_cursor'],
+            'totals': totals
+        })
+    
+    except Exception as e:
+        logger.error(f"Error pricing validation failures history: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,7 @@
 """
 Routes for the Unmapped Records Review functionality.
 """
-from flask import Blueprint, jsonify, request, render_template, send_file
+from flask import Blueprint, jsonify, request, render_template
 import json
 import config
 from pathlib import Path
@@ -9,7 +9,15 @@ import shutil
 import datetime
 
 # Import utilities
-from pdf_utils import get_pdf_path, extract_pdf_region
+from pdf_utils import extract_pdf_region, PDFNotFoundError
+from http_utils import (pdf_response, region_image_response, regions_response, render_options,
+                        requested_page, tile_response, page_layout_response, thumbnail_response,
+                        text_search_response, file_list_response, work_item_response,
+                        claim_next_response, renew_lease_response, release_lease_response,
+                        current_reviewer, bulk_action_response, next_bundle_response)
+from queue_index import queue_indexes
+from work_items import work_items, WorkItemConflict, UNMAPPED, MAPPED, NOT_FOUND, ESCALATIONS
+from services.file_mover import file_mover
 from text_utils import validate_filename, split_patient_name
 from db_utils import search_by_name_and_dos, validate_cpt
 
@@ -24,37 +32,99 @@ def index():
 @unmapped_bp.route('/api/files', methods=['GET'])
 def list_files():
     """List all unmapped JSON files."""
-    files = [f.name for f in config.FOLDERS['UNMAPPED_FOLDER'].glob('*.json')]
-    return jsonify({'files': files})
+    return file_list_response('unmapped', 'unmapped.get_thumbnail')
+
+def load_file(filename):
+    """Read a queued unmapped JSON file."""
+    with open(config.FOLDERS['UNMAPPED_FOLDER'] / filename, 'r') as f:
+        return json.load(f)
 
 @unmapped_bp.route('/api/file/<filename>', methods=['GET'])
 def get_file(filename):
     """Get the content of a specific JSON file."""
     try:
         safe_filename = validate_filename(filename)
-        file_path = config.FOLDERS['UNMAPPED_FOLDER'] / safe_filename
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            return jsonify({'data': data})
+        
+        # Opening a claimed file counts as activity on its lease
+        work_items.touch(safe_filename, current_reviewer(), config.WORK_ITEMS['LEASE_TTL'])
+        return jsonify({'data': load_file(safe_filename)})
     except Exception as e:
         print(f"Error loading file {filename}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@unmapped_bp.route('/api/history/<filename>', methods=['GET'])
+def get_history(filename):
+    """Get a file's work-item state and transition history."""
+    return work_item_response(validate_filename(filename))
+
+@unmapped_bp.route('/api/next-bundle', methods=['GET'])
+def next_bundle():
+    """Get the JSON, patient info, region URLs and match candidates of the next files to prefetch."""
+    return next_bundle_response('unmapped', load_file, 'unmapped.get_pdf_region_image')
+
+@unmapped_bp.route('/api/claim-next', methods=['POST'])
+def claim_next():
+    """Lease the next unclaimed file to the requesting reviewer."""
+    return claim_next_response('unmapped')
+
+@unmapped_bp.route('/api/lease/renew', methods=['POST'])
+def renew_lease():
+    """Extend the requesting reviewer's lease on a file."""
+    return renew_lease_response()
+
+@unmapped_bp.route('/api/lease/release', methods=['POST'])
+def release_lease():
+    """Release the requesting reviewer's lease on a file."""
+    return release_lease_response()
+
 @unmapped_bp.route('/api/pdf/<filename>', methods=['GET'])
 def get_pdf(filename):
     """Serve a PDF file for viewing."""
-    pdf_path = get_pdf_path(filename)
-    return send_file(pdf_path, mimetype='application/pdf') if pdf_path.exists() else (jsonify({'error': 'PDF not found'}), 404)
+    return pdf_response(filename)
 
 @unmapped_bp.route('/api/pdf_region/<filename>/<region>', methods=['GET'])
 def get_pdf_region(filename, region):
     """Get a specific region of a PDF as an image."""
     try:
-        image_data = extract_pdf_region(filename, region)
+        image_data = extract_pdf_region(filename, region, render_options(), requested_page())
         return jsonify({'image': image_data})
+    except PDFNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@unmapped_bp.route('/api/pdf_region_image/<filename>/<region>', methods=['GET'])
+def get_pdf_region_image(filename, region):
+    """Get a specific region of a PDF as a binary PNG with HTTP caching validators."""
+    return region_image_response(filename, region)
+
+@unmapped_bp.route('/api/pdf_regions/<filename>', methods=['GET'])
+def get_pdf_regions(filename):
+    """Render all configured regions of a PDF at once and return their image URLs."""
+    return regions_response(filename, 'unmapped.get_pdf_region_image')
+
+@unmapped_bp.route('/api/pdf_pages/<filename>', methods=['GET'])
+def get_pdf_pages(filename):
+    """Get the page sizes and tile grid of a PDF for lazy tiled viewing."""
+    return page_layout_response(filename, 'unmapped.get_pdf_tile')
+
+@unmapped_bp.route('/api/pdf_tile/<filename>/<int:page>/<int:zoom>/<int:x>/<int:y>', methods=['GET'])
+def get_pdf_tile(filename, page, zoom, x, y):
+    """Get one fixed-size tile of a PDF page at a zoom level as a binary image."""
+    return tile_response(filename, page, zoom, x, y)
+
+@unmapped_bp.route('/api/thumbnail/<filename>/<kind>', methods=['GET'])
+def get_thumbnail(filename, kind):
+    """Get a small JPEG of a PDF's first page ('page') or its header ('header') for the file list."""
+    return thumbnail_response(filename, kind)
+
+@unmapped_bp.route('/api/text_search', methods=['GET'])
+def text_search():
+    """Search the text layer of the archived PDFs (name, CPT, TIN) with highlight boxes."""
+    return text_search_response()
+
 @unmapped_bp.route('/api/search', methods=['POST'])
 def search():
     """Search the database for matching records."""
@@ -81,20 +151,14 @@ def extract_patient_info(filename):
     """Extract patient name and DOS from a file to pre-populate search."""
     try:
         safe_filename = validate_filename(filename)
-        file_path = config.FOLDERS['UNMAPPED_FOLDER'] / safe_filename
         
-        with open(file_path, 'r') as f:
-            json_data = json.load(f)
-            
-        # Extract patient name
-        patient_name = json_data.get("patient_info", {}).get("patient_name", "")
-        first_name, last_name = split_patient_name(patient_name)
+        # The queue index already holds the patient name and first DOS
+        entry = queue_indexes['unmapped'].get(safe_filename)
+        if entry is None:
+            raise FileNotFoundError(f"File not found: {safe_filename}")
         
-        # Extract DOS from first service line
-        first_dos = ""
-        service_lines = json_data.get("service_lines", [])
-        if service_lines and len(service_lines) > 0:
-            first_dos = service_lines[0].get("date_of_service", "")
+        first_name, last_name = split_patient_name(entry['patient_name'])
+        first_dos = entry['first_dos']
             
         return jsonify({
             'first_name': first_name or "",
@@ -130,56 +194,120 @@ def save_file():
             for change in changes_made:
                 print(f"- {change}")
         
-        # Save to the mapped folder
-        with open(config.FOLDERS['MAPPED_FOLDER'] / filename, 'w') as f:
-            json.dump(content, f, indent=2)
-            
-        # Remove from unmapped folder
-        (config.FOLDERS['UNMAPPED_FOLDER'] / filename).unlink(missing_ok=True)
+        # Mark it mapped; the move to the mapped folder is applied in the background
+        work_items.transition(filename, UNMAPPED, MAPPED,
+                              config.FOLDERS['UNMAPPED_FOLDER'] / filename,
+                              config.FOLDERS['MAPPED_FOLDER'] / filename,
+                              content, actor=current_reviewer())
+        file_mover.wake()
+        queue_indexes['unmapped'].invalidate()
         
         return jsonify({'message': 'File saved successfully'})
+    except WorkItemConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@unmapped_bp.route('/api/not_found', methods=['POST'])
-def not_found():
+def mark_not_found(data, actor):
     """
-    Handle the NOT FOUND IN FILEMAKER action.
-    Moves the file to the review2 folder without requiring any additional information.
+    Mark one file as not found in FileMaker and queue it for archiving
+    (moves into review2 go to the compressed archive store, see FileMover._archive).
+    
+    Args:
+        data (dict): Request payload with 'filename'
+        actor (str): Reviewer making the change
+        
+    Returns:
+        tuple: (response body dict, HTTP status)
     """
+    filename = validate_filename(data.get('filename', ''))
+    
+    if not filename:
+        return {'error': 'Filename is required'}, 400
+        
+    # Source file path
+    source_path = config.FOLDERS['UNMAPPED_FOLDER'] / filename
+    
+    # Target file path
+    target_path = config.REVIEW2_FOLDER / filename
+    
+    if not source_path.exists():
+        return {'error': f'Source file not found: {filename}'}, 404
+        
+    # Mark it not found; the file mover archives it into the compressed
+    # store in the background
     try:
-        data = request.json
-        filename = validate_filename(data.get('filename', ''))
+        work_items.transition(filename, UNMAPPED, NOT_FOUND, source_path, target_path, actor=actor)
+    except WorkItemConflict as e:
+        return {'error': str(e)}, 409
+    
+    return {'message': 'File marked as not found; queued for archiving'}, 200
+
+def escalate_file(data, actor):
+    """
+    Add escalation notes to one file and queue its move to the escalations folder.
+    
+    Args:
+        data (dict): Request payload with 'filename', 'notes' and optionally the
+            edited 'content' (read from the file when not given)
+        actor (str): Reviewer making the change
         
-        if not filename:
-            return jsonify({'error': 'Filename is required'}), 400
-            
-        # Source file path
-        source_path = config.FOLDERS['UNMAPPED_FOLDER'] / filename
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    filename = validate_filename(data.get('filename', ''))
+    content = data.get('content')
+    notes = data.get('notes', '')
+    
+    if not filename:
+        return {'error': 'Filename is required'}, 400
         
-        # Ensure the review2 folder exists
-        review2_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\review2"
-        review2_folder.mkdir(parents=True, exist_ok=True)
+    if not notes:
+        return {'error': 'Escalation notes are required'}, 400
         
-        # Target file path
-        target_path = review2_folder / filename
+    # Source file path
+    source_path = config.FOLDERS['UNMAPPED_FOLDER'] / filename
+    
+    # Target file path
+    target_path = config.ESCALATIONS_FOLDER / filename
+    
+    if not source_path.exists():
+        return {'error': f'Source file not found: {filename}'}, 404
         
-        # Move the file to the review2 folder
-        if source_path.exists():
-            # Read the original file content
-            with open(source_path, 'r') as f:
-                content = json.load(f)
-                
-            # Write to the target location
-            with open(target_path, 'w') as f:
-                json.dump(content, f, indent=2)
-                
-            # Remove from unmapped folder
-            source_path.unlink()
-            
-            return jsonify({'message': 'File marked as not found and moved to review2 folder'})
-        else:
-            return jsonify({'error': f'Source file not found: {filename}'}), 404
+    if content is None:
+        with open(source_path, 'r') as f:
+            content = json.load(f)
+    
+    # Add escalation metadata if not already present
+    if not content.get('escalation'):
+        content['escalation'] = {}
+        
+    # Add notes and timestamp
+    content['escalation']['notes'] = notes
+    content['escalation']['timestamp'] = datetime.datetime.now().isoformat()
+    content['escalation']['user'] = actor
+    
+    # Mark it escalated; the move with the escalation data is applied in the background
+    try:
+        work_items.transition(filename, UNMAPPED, ESCALATIONS, source_path, target_path, content,
+                              actor=actor, notes=notes)
+    except WorkItemConflict as e:
+        return {'error': str(e)}, 409
+    
+    return {'message': 'File escalated successfully'}, 200
+
+@unmapped_bp.route('/api/not_found', methods=['POST'])
+def not_found():
+    """
+    Handle the NOT FOUND IN FILEMAKER action.
+    Queues the file for archiving without requiring any additional information.
+    """
+    try:
+        body, status = mark_not_found(request.json, current_reviewer())
+        if status == 200:
+            file_mover.wake()
+            queue_indexes['unmapped'].invalidate()
+        return jsonify(body), status
             
     except Exception as e:
         import traceback
@@ -187,6 +315,11 @@ def not_found():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@unmapped_bp.route('/api/not_found/bulk', methods=['POST'])
+def not_found_bulk():
+    """Mark many files as not found in one request (see http_utils.bulk_action_response)."""
+    return bulk_action_response(mark_not_found, ('unmapped',))
+
 @unmapped_bp.route('/api/escalate', methods=['POST'])
 def escalate():
     """
@@ -194,51 +327,20 @@ def escalate():
     Adds a note to the file and moves it to the escalations folder.
     """
     try:
-        data = request.json
-        filename = validate_filename(data.get('filename', ''))
-        content = data.get('content', {})
-        notes = data.get('notes', '')
-        
-        if not filename:
-            return jsonify({'error': 'Filename is required'}), 400
-            
-        if not notes:
-            return jsonify({'error': 'Escalation notes are required'}), 400
-            
-        # Source file path
-        source_path = config.FOLDERS['UNMAPPED_FOLDER'] / filename
-        
-        # Ensure the escalations folder exists
-        escalations_folder = config.BASE_PATH / r"scripts\VAILIDATION\data\extracts\escalations"
-        escalations_folder.mkdir(parents=True, exist_ok=True)
-        
-        # Target file path
-        target_path = escalations_folder / filename
-        
-        # Move the file to the escalations folder
-        if source_path.exists():
-            # Add escalation metadata if not already present
-            if not content.get('escalation'):
-                content['escalation'] = {}
-                
-            # Add notes and timestamp
-            content['escalation']['notes'] = notes
-            content['escalation']['timestamp'] = datetime.datetime.now().isoformat()
-            content['escalation']['user'] = request.environ.get('REMOTE_USER', 'unknown')
-            
-            # Write to the target location with escalation data
-            with open(target_path, 'w') as f:
-                json.dump(content, f, indent=2)
-                
-            # Remove from unmapped folder
-            source_path.unlink()
-            
-            return jsonify({'message': 'File escalated successfully'})
-        else:
-            return jsonify({'error': f'Source file not found: {filename}'}), 404
+        body, status = escalate_file(request.json, current_reviewer())
+        if status == 200:
+            file_mover.wake()
+            queue_indexes['unmapped'].invalidate()
+            queue_indexes['escalations'].invalidate()
+        return jsonify(body), status
             
     except Exception as e:
         import traceback
         print(f"Error in escalate: {str(e)}")
         print(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@unmapped_bp.route('/api/escalate/bulk', methods=['POST'])
+def escalate_bulk():
+    """Escalate many files in one request (see http_utils.bulk_action_response)."""
+    return bulk_action_response(escalate_file, ('unmapped', 'escalations'))
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Batch validation of every file in the OCR corrections queue.
+
+Instead of checking one document when a reviewer opens it, all queued
+documents are flattened into columnar pandas frames (one row per file and
+one per service line) and every check runs as a vectorized operation over
+the whole queue. The result ranks the files by how much attention they
+need, with the fields at fault as JSON Pointer paths.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from db_utils import cpt_code_set
+from text_utils import DATE_FORMATS
+from work_items import work_items
+
+logger = logging.getLogger(__name__)
+
+# Check -> (weight in the ranking score, message)
+CHECKS = {
+    'unreadable': (10, 'File is not valid JSON'),
+    'no_service_lines': (5, 'No service lines'),
+    'missing_cpt': (3, 'CPT code is missing'),
+    'invalid_cpt': (3, 'CPT code is not a known CPT/HCPCS code'),
+    'total_mismatch': (3, 'Line charges do not add up to the total charge'),
+    'missing_charge': (2, 'Charge is missing or not a number'),
+    'missing_total': (2, 'Total charge is missing or not a number'),
+    'invalid_dos': (2, 'Date of service is missing or unreadable'),
+    'future_dos': (2, 'Date of service is in the future'),
+    'old_dos': (1, 'Date of service is unusually old'),
+    'invalid_units': (1, 'Units are not a positive whole number'),
+    'excess_units': (1, 'Units are unusually high'),
+}
+
+# Shape of a CPT (5 digits, or 4 digits and F/T/U) or HCPCS Level II code
+CPT_PATTERN = r'[0-9]{4}[0-9FTU]|[A-Z][0-9]{4}'
+
+LINE_COLUMNS = ['name', 'line', 'cpt_code', 'units', 'charge_amount', 'date_of_service']
+FILE_COLUMNS = ['name', 'patient_name', 'total_charge', 'line_count', 'unreadable']
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {'key': None, 'ranked': []}
+
+def parse_charges(values: pd.Series) -> pd.Series:
+    """
+    Vectorized text_utils.parse_charge: strips '$', ',' and spaces and
+    converts to float, but gives NaN (rather than 0.0) for missing or
+    unreadable amounts so they can be flagged.
+    """
+    text = values.astype('string').str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(text.replace('', pd.NA), errors='coerce').astype('float64')
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Vectorized text_utils.parse_date: the first of DATE_FORMATS that parses, else NaT."""
+    text = values.astype('string').str.strip()
+    result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = result.isna()
+        if not missing.any():
+            break
+        result[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+    return result
+
+def load_frames(folder: Path, skip=()) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Flatten the JSON files of a folder into a files frame and a service-lines frame.
+
+    Args:
+        folder: Folder to load
+        skip: Filenames to leave out (e.g. already saved, move pending)
+
+    Returns:
+        (files, lines) DataFrames with FILE_COLUMNS and LINE_COLUMNS
+    """
+    files, lines = [], []
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.name.endswith('.json') or entry.name in skip:
+            continue
+        try:
+            with open(entry.path, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("not a JSON object")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load {entry.name} for validation: {e}")
+            files.append((entry.name, '', None, 0, True))
+            continue
+
+        service_lines = [line for line in (data.get('service_lines') or []) if isinstance(line, dict)]
+        files.append((entry.name, (data.get('patient_info') or {}).get('patient_name') or '',
+                      (data.get('billing_info') or {}).get('total_charge'), len(service_lines), False))
+        lines.extend((entry.name, number, line.get('cpt_code'), line.get('units'),
+                      line.get('charge_amount'), line.get('date_of_service'))
+                     for number, line in enumerate(service_lines))
+
+    return (pd.DataFrame(files, columns=FILE_COLUMNS, dtype=object),
+            pd.DataFrame(lines, columns=LINE_COLUMNS, dtype=object))
+
+def _line_issues(lines: pd.DataFrame, mask: pd.Series, check: str, field: str) -> pd.DataFrame:
+    hits = lines[mask]
+    return pd.DataFrame({
+        'name': hits['name'],
+        'field': 'service_lines/' + hits['line'].astype(str) + '/' + field,
+        'check': check,
+        'value': hits[field],
+    })
+
+def _file_issues(files: pd.DataFrame, mask, check: str, field: str, value_column: str = None) -> pd.DataFrame:
+    hits = files[mask]
+    return pd.DataFrame({
+        'name': hits['name'],
+        'field': field,
+        'check': check,
+        'value': hits[value_column] if value_column else None,
+    })
+
+def find_issues(files: pd.DataFrame, lines: pd.DataFrame, cpt_codes=frozenset(),
+                today=None) -> pd.DataFrame:
+    """
+    Run every check over the whole queue at once.
+
+    Args:
+        files: Files frame from load_frames
+        lines: Service-lines frame from load_frames
+        cpt_codes: Known CPT codes (CPT validity is only checked by shape when empty)
+        today: Reference date for the date checks (defaults to today)
+
+    Returns:
+        DataFrame with name, field (JSON Pointer without the leading '/'),
+            check and value columns, one row per problem found
+    """
+    settings = config.BULK_VALIDATION
+    today = pd.Timestamp(today or datetime.now().date())
+    issues = []
+
+    # CPT: present, shaped like a code and (when the dictionary is available) known
+    cpt = lines['cpt_code'].astype('string').str.replace(r'[^0-9A-Za-z]', '', regex=True).str.upper()
+    missing_cpt = cpt.isna() | (cpt == '')
+    invalid_cpt = ~missing_cpt & ~cpt.str.fullmatch(CPT_PATTERN).fillna(False).astype(bool)
+    if cpt_codes:
+        invalid_cpt |= ~missing_cpt & ~cpt.isin(cpt_codes)
+    issues.append(_line_issues(lines, missing_cpt, 'missing_cpt', 'cpt_code'))
+    issues.append(_line_issues(lines, invalid_cpt, 'invalid_cpt', 'cpt_code'))
+
+    # Charges, and whether they add up to the total
+    charges = parse_charges(lines['charge_amount'])
+    issues.append(_line_issues(lines, charges.isna().to_numpy(), 'missing_charge', 'charge_amount'))
+
+    totals = parse_charges(files['total_charge'])
+    readable = ~files['unreadable'].astype(bool)
+    has_lines = files['line_count'].astype(int) > 0
+    line_sums = charges.groupby(lines['name']).sum(min_count=1)
+    line_sums = files['name'].map(line_sums).astype('float64')
+    mismatch = (totals.notna() & line_sums.notna()
+                & ((totals - line_sums).abs() > settings['CHARGE_TOLERANCE']))
+    issues.append(_file_issues(files, (readable & has_lines & totals.isna()).to_numpy(),
+                               'missing_total', 'billing_info/total_charge', 'total_charge'))
+    issues.append(_file_issues(files, mismatch.to_numpy(), 'total_mismatch',
+                               'billing_info/total_charge', 'total_charge'))
+
+    # Dates of service: readable, not in the future, not implausibly old
+    dos = parse_dates(lines['date_of_service'])
+    oldest = today - timedelta(days=settings['MAX_DOS_AGE_DAYS'])
+    issues.append(_line_issues(lines, dos.isna().to_numpy(), 'invalid_dos', 'date_of_service'))
+    issues.append(_line_issues(lines, (dos > today).to_numpy(), 'future_dos', 'date_of_service'))
+    issues.append(_line_issues(lines, (dos < oldest).to_numpy(), 'old_dos', 'date_of_service'))
+
+    # Units: positive whole numbers within reason (blank units default to 1)
+    units_text = lines['units'].astype('string').str.strip()
+    units = pd.to_numeric(units_text.replace('', pd.NA), errors='coerce').astype('float64')
+    given = units_text.notna() & (units_text != '')
+    invalid_units = given & (units.isna() | (units <= 0) | (np.mod(units, 1) != 0))
+    issues.append(_line_issues(lines, invalid_units.fillna(False).to_numpy(), 'invalid_units', 'units'))
+    issues.append(_line_issues(lines, (units > settings['MAX_UNITS']).to_numpy(), 'excess_units', 'units'))
+
+    # Whole-file problems
+    issues.append(_file_issues(files, (readable & ~has_lines).to_numpy(), 'no_service_lines', 'service_lines'))
+    issues.append(_file_issues(files, (~readable).to_numpy(), 'unreadable', ''))
+
+    issues = [frame for frame in issues if not frame.empty]
+    if not issues:
+        return pd.DataFrame(columns=['name', 'field', 'check', 'value'])
+    return pd.concat(issues, ignore_index=True)
+
+def rank_files(files: pd.DataFrame, issues: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Score each file by the weights of its problems and rank them, worst first.
+
+    Args:
+        files: Files frame from load_frames
+        issues: Problems from find_issues
+
+    Returns:
+        List of dicts with rank, name, patient_name, line_count, score,
+            issue_count, checks and issues (field, check, value, message);
+            files without problems are left out
+    """
+    if issues.empty:
+        return []
+    issues = issues.assign(weight=issues['check'].map(lambda check: CHECKS[check][0]))
+    summary = (issues.groupby('name')
+               .agg(score=('weight', 'sum'), issue_count=('check', 'size'))
+               .reset_index()
+               .merge(files[['name', 'patient_name', 'line_count']], on='name', how='left')
+               .sort_values(['score', 'issue_count', 'name'], ascending=[False, False, True],
+                            ignore_index=True))
+
+    details = {}
+    for row in issues.sort_values(['name', 'weight', 'field'], ascending=[True, False, True]).itertuples(index=False):
+        value = None if row.value is None or (isinstance(row.value, float) and np.isnan(row.value)) else str(row.value)
+        details.setdefault(row.name, []).append({
+            'field': '/' + row.field if row.field else '',
+            'check': row.check,
+            'value': value,
+            'message': CHECKS[row.check][1],
+        })
+
+    return [{
+        'rank': rank,
+        'name': row.name,
+        'patient_name': row.patient_name,
+        'line_count': int(row.line_count),
+        'score': int(row.score),
+        'issue_count': int(row.issue_count),
+        'checks': sorted({issue['check'] for issue in details[row.name]}),
+        'issues': details[row.name],
+    } for rank, row in enumerate(summary.itertuples(index=False), start=1)]
+
+def _folder_key(folder: Path, skip) -> tuple:
+    """Cheap fingerprint of a folder's JSON files (name, size, mtime)."""
+    return tuple(sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                        for entry in os.scandir(folder)
+                        if entry.name.endswith('.json') and entry.name not in skip))
+
+def validate_queue(folder: Path = None) -> List[Dict[str, Any]]:
+    """
+    Validate every file in the corrections queue and rank them.
+
+    The ranking is cached and only recomputed when a file in the folder is
+    added, removed or changed, or the CPT dictionary is reloaded. Callers
+    must not mutate the result.
+
+    Args:
+        folder: Folder to validate (defaults to FAILS_FOLDER)
+
+    Returns:
+        Ranked files, as from rank_files
+    """
+    folder = Path(folder or config.FOLDERS['FAILS_FOLDER'])
+    if not folder.exists():
+        return []
+
+    # Files already saved but not yet moved out of the folder
+    skip = {Path(source).name for source in work_items.pending_sources()
+            if Path(source).parent == folder}
+    cpt_codes = cpt_code_set()
+    key = (str(folder), _folder_key(folder, skip), id(cpt_codes))
+
+    with _lock:
+        if _cache['key'] == key:
+            return _cache['ranked']
+
+        files, lines = load_frames(folder, skip)
+        ranked = rank_files(files, find_issues(files, lines, cpt_codes))
+        logger.info(f"Validated {len(files)} files ({len(lines)} service lines): "
+                    f"{len(ranked)} need attention")
+        _cache.update(key=key, ranked=ranked)
+        return ranked
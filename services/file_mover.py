@@ -0,0 +1,190 @@
+"""
+Background application of the file moves queued by work-item transitions.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Set
+
+import config
+from archive_store import archive_kind, archive_store
+from file_utils import fsync_directory, move_file, remove_stale_temp_files
+from queue_index import queue_indexes
+from work_items import WorkItemStore, work_items
+
+logger = logging.getLogger(__name__)
+
+class FileMover:
+    """
+    Applies queued file moves to the review folders in batches.
+
+    Transitions only update the work-item table, so the request returns as
+    soon as the row is written; the mover then moves each file with
+    file_utils.move_file (a rename when the content is unchanged, an fsynced
+    temp write and replace when it changed) and drops the applied moves in
+    one transaction per batch.
+
+    The file_moves table is the journal: a move is recorded before any file
+    is touched and deleted only once it is complete, and move_file finishes
+    a half-done move when repeated. On start the mover removes temp files
+    left by interrupted writes and replays the journal. Moves that fail
+    (e.g. a file held open by OneDrive) stay queued and are retried. When the
+    mover thread isn't running (scripts, tests) wake() applies the queue inline.
+
+    Moves into the originals, review2 and rejected folders go to the
+    compressed archive store instead (see archive_store), unless
+    config.ARCHIVE_STORE['ARCHIVE_FOLDERS'] is off.
+    """
+
+    def __init__(self, store: WorkItemStore, batch_size: int = 50, retry_interval: float = 1.0):
+        """
+        Initialize the mover.
+
+        Args:
+            store: Work-item store holding the queued moves
+            batch_size: Most moves applied per batch
+            retry_interval: Seconds to wait before retrying failed moves
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+
+        # Target folders known to exist, so they aren't re-created for every move
+        self._folders: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls) -> 'FileMover':
+        """
+        Build a mover for the shared work-item store.
+
+        Returns:
+            FileMover configured from config.WORK_ITEMS
+        """
+        return cls(
+            store=work_items,
+            batch_size=config.WORK_ITEMS['MOVE_BATCH_SIZE'],
+            retry_interval=config.WORK_ITEMS['MOVE_INTERVAL'],
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def recover(self):
+        """Clean up after an interrupted run: remove stale temp files from the
+        folders moves write to, then apply the moves left in the journal."""
+        folders = {Path(move['target']).parent for move in self.store.pending_moves(None)}
+        folders.update(config.FOLDERS.values())
+        folders.update((config.ESCALATIONS_FOLDER, config.REVIEW2_FOLDER, config.REJECTED_FOLDER))
+        removed = sum(remove_stale_temp_files(folder) for folder in folders)
+        if removed:
+            logger.info(f"Removed {removed} temp files left by interrupted moves")
+        return self.apply_pending()
+
+    def start(self):
+        """Recover any interrupted moves and start the background mover thread."""
+        if self.running:
+            return
+        self.recover()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='file-mover', daemon=True)
+        self._thread.start()
+        logger.info("File mover started")
+
+    def stop(self):
+        """Stop the mover thread once the current batch is applied."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wake(self):
+        """Apply newly queued moves: signal the thread, or apply them now if it isn't running."""
+        if self.running:
+            self._wake.set()
+        else:
+            self.apply_pending()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                failed = self.apply_pending()
+            except Exception as e:
+                logger.error(f"File mover failed: {e}", exc_info=True)
+                failed = True
+            # Sleep until new work arrives, or until failed moves should be retried
+            self._wake.wait(self.retry_interval if failed else None)
+
+    def _archive(self, kind, move):
+        """Archive a move's content, then remove its source. Repeating an
+        archive that was interrupted finishes it."""
+        name = Path(move['target']).name
+        source = Path(move['source']) if move['source'] else None
+        data = move['payload']
+        if data is None:
+            if source is None or not source.exists():
+                if archive_store.find(kind, name) is not None:
+                    return 'done'
+                raise FileNotFoundError(f"Neither {source} nor an archived {name} exists")
+            data = source.read_bytes()
+        archive_store.archive(kind, name, data)
+        if source is not None and source.exists():
+            source.unlink()
+            fsync_directory(source.parent)
+        return 'archived'
+
+    def _apply(self, move):
+        target = Path(move['target'])
+        kind = archive_kind(target.parent)
+        if kind is not None:
+            return self._archive(kind, move)
+        if target.parent not in self._folders:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._folders.add(target.parent)
+
+        return move_file(move['source'], target, move['payload'])
+
+    def apply_pending(self) -> int:
+        """
+        Apply every queued move, in batches.
+
+        Returns:
+            Number of moves that failed and remain queued
+        """
+        with self._lock:
+            failed = set()
+            applied = 0
+            while True:
+                moves = [move for move in self.store.pending_moves(self.batch_size + len(failed))
+                         if move['id'] not in failed]
+                if not moves:
+                    break
+                done = []
+                for move in moves:
+                    try:
+                        self._apply(move)
+                        done.append(move['id'])
+                    except FileNotFoundError as e:
+                        # Nothing left to move; retrying can't help
+                        logger.error(f"Dropping move of {move['name']}: {e}")
+                        done.append(move['id'])
+                    except Exception as e:
+                        failed.add(move['id'])
+                        self.store.fail_move(move['id'], str(e))
+                        logger.warning(f"Could not move {move['name']} to {move['target']}: {e}")
+                self.store.complete_moves(done)
+                applied += len(done)
+
+            if applied:
+                logger.info(f"Applied {applied} file moves")
+                for index in queue_indexes.values():
+                    index.invalidate()
+            return len(failed)
+
+# Shared mover for the work-item store
+file_mover = FileMover.from_config()
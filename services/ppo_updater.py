@@ -6,7 +6,7 @@ Handles updating and managing provider rates in the database.
 
 import sqlite3
 import logging
-from typing import Dict, List, Tuple, Union, Any
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union, Any
 from pathlib import Path
 
 class PPOUpdater:
@@ -55,14 +55,18 @@ class PPOUpdater:
         ]
     }
 
-    def __init__(self, db_path: Union[str, Path]):
+    def __init__(self, db_path: Union[str, Path],
+                 on_change: Optional[Callable[[str, Iterable[str]], Any]] = None):
         """
         Initialize the PPO updater with a database path.
         
         Args:
             db_path: Path to the SQLite database
+            on_change: Called with (TIN, procedure codes) after rates are written,
+                e.g. RateRevalidator.ppo_rates_changed
         """
         self.db_path = Path(db_path)
+        self.on_change = on_change
         self.logger = logging.getLogger(__name__)
         
         # Ensure logging is configured
@@ -223,8 +227,9 @@ class PPOUpdater:
                     """, (state, tin, provider_name, proc_cd, modifier, category, rate))
                 
                 conn.commit()
-                
-                return True, f"Successfully updated rate for {proc_cd}"
+            
+            self._notify(tin, [proc_cd])
+            return True, f"Successfully updated rate for {proc_cd}"
         
         except sqlite3.Error as e:
             self.logger.error(f"Database error: {e}")
@@ -279,8 +284,10 @@ class PPOUpdater:
                         total_updates += 1
                 
                 conn.commit()
-                
-                return True, f"Updated {total_updates} procedure rates across {len(category_rates)} categories"
+            
+            self._notify(tin, [proc_cd for category in category_rates
+                               for proc_cd in self.PROCEDURE_CATEGORIES.get(category, [])])
+            return True, f"Updated {total_updates} procedure rates across {len(category_rates)} categories"
         
         except sqlite3.Error as e:
             self.logger.error(f"Database error: {e}")
@@ -289,6 +296,71 @@ class PPOUpdater:
             self.logger.error(f"Unexpected error: {e}")
             return False, f"Unexpected error: {e}"
 
+    def preview_rate_by_category(
+        self, 
+        tin: str, 
+        category_rates: Dict[str, float]
+    ) -> List[Dict[str, Any]]:
+        """
+        Work out what update_rate_by_category would write, without writing.
+        
+        The TIN's existing no-modifier rows for every code in the categories
+        are read in one query; each code is then a new row, an overwritten
+        row (a different rate) or unchanged.
+        
+        Args:
+            tin: Tax ID number
+            category_rates: Dictionary of category to rate
+        
+        Returns:
+            List of dicts with cpt_code, category, old_rate, new_rate, delta
+            and action ('insert', 'overwrite' or 'unchanged')
+        
+        Raises:
+            ValueError: If the TIN is invalid or a category is unknown
+        """
+        tin = ''.join(c for c in str(tin) if c.isdigit())
+        if len(tin) != 9:
+            raise ValueError("Invalid TIN format")
+        unknown = [category for category in category_rates if category not in self.PROCEDURE_CATEGORIES]
+        if unknown:
+            raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+        
+        planned = {
+            proc_cd: (category, float(rate))
+            for category, rate in category_rates.items()
+            for proc_cd in self.PROCEDURE_CATEGORIES[category]
+        }
+        if not planned:
+            return []
+        
+        # Rows INSERT OR REPLACE would conflict with on UNIQUE(TIN, proc_cd, modifier)
+        with self._connect() as conn:
+            placeholders = ','.join('?' * len(planned))
+            rows = conn.execute(f"""
+                SELECT proc_cd, rate 
+                FROM ppo 
+                WHERE TIN = ? AND modifier = '' AND proc_cd IN ({placeholders})
+            """, (tin, *planned)).fetchall()
+        existing = {row['proc_cd']: row['rate'] for row in rows}
+        
+        preview = []
+        for proc_cd, (category, new_rate) in planned.items():
+            if proc_cd not in existing:
+                old_rate, action = None, 'insert'
+            else:
+                old_rate = float(existing[proc_cd]) if existing[proc_cd] is not None else None
+                action = 'unchanged' if old_rate == new_rate else 'overwrite'
+            preview.append({
+                'cpt_code': proc_cd,
+                'category': category,
+                'old_rate': old_rate,
+                'new_rate': new_rate,
+                'delta': round(new_rate - old_rate, 2) if old_rate is not None else None,
+                'action': action
+            })
+        return preview
+
     def get_provider_rates(self, tin: str) -> List[Dict[str, Any]]:
         """
         Retrieve current rates for a specific provider.
@@ -337,6 +409,15 @@ class PPOUpdater:
             self.logger.error(f"Unexpected error retrieving rates: {e}", exc_info=True)
             raise
 
+    def _notify(self, tin: str, proc_codes: List[str]):
+        """Tell the on_change listener which rates were written; its errors don't fail the update."""
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(tin, proc_codes)
+        except Exception as e:
+            self.logger.error(f"Error handling rate change for TIN {tin}: {e}", exc_info=True)
+
     def _get_category_for_code(self, proc_cd: str) -> str:
         """
         Determine the category for a given procedure code.
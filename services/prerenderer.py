@@ -0,0 +1,209 @@
+"""
+Background pre-rendering of PDF region images and thumbnails for queued files.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import config
+from pdf_index import pdf_index
+from pdf_utils import prerender_pdf, seconds_since_interactive
+
+logger = logging.getLogger(__name__)
+
+def _lower_worker_priority():
+    """Run render workers at reduced CPU priority where the platform allows it."""
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+class Prerenderer:
+    """
+    Watches the review queue folders and renders the images for every queued
+    JSON's PDF into the render cache, in each region's default render
+    profile, before a reviewer opens it.
+
+    Rendering happens in a process pool because PyMuPDF is CPU-bound and holds
+    the GIL. Submission pauses while reviewers are requesting images so the
+    background work never competes with an interactive render.
+    """
+
+    def __init__(
+        self,
+        folders: Iterable[Path],
+        workers: int = 2,
+        poll_interval: float = 30,
+        max_per_scan: int = 200,
+        idle_after: float = 2.0
+    ):
+        """
+        Initialize the prerenderer.
+
+        Args:
+            folders: Queue folders containing JSON files to watch
+            workers: Number of render processes
+            poll_interval: Seconds between folder scans
+            max_per_scan: Maximum PDFs submitted per scan
+            idle_after: Seconds without interactive renders required before submitting work
+        """
+        self.folders = [Path(folder) for folder in folders]
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_per_scan = max_per_scan
+        self.idle_after = idle_after
+
+        # (pdf path, mtime_ns) already handled, so unchanged PDFs aren't resubmitted
+        self._done: Dict[Tuple[str, int], bool] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    @classmethod
+    def from_config(cls) -> 'Prerenderer':
+        """
+        Build a prerenderer for the unmapped, corrections and escalations queues.
+
+        Returns:
+            Prerenderer configured from config.PRERENDER
+        """
+        settings = config.PRERENDER
+        return cls(
+            folders=[
+                config.FOLDERS['UNMAPPED_FOLDER'],
+                config.FOLDERS['FAILS_FOLDER'],
+                config.ESCALATIONS_FOLDER,
+            ],
+            workers=settings['WORKERS'],
+            poll_interval=settings['POLL_INTERVAL'],
+            max_per_scan=settings['MAX_PER_SCAN'],
+            idle_after=settings['IDLE_AFTER'],
+        )
+
+    def start(self):
+        """Start the worker pool and the background scan thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_worker_priority)
+        self._thread = threading.Thread(target=self._run, name='prerenderer', daemon=True)
+        self._thread.start()
+        logger.info(f"Prerenderer started with {self.workers} workers")
+
+    def stop(self):
+        """Stop scanning and shut down the worker pool."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                submitted = self.scan_once()
+                if submitted:
+                    logger.info(f"Prerenderer submitted {submitted} PDFs")
+            except Exception as e:
+                logger.error(f"Prerender scan failed: {e}", exc_info=True)
+            self._stop.wait(self.poll_interval)
+
+    @staticmethod
+    def _resolve_pdf(json_name: str) -> Path:
+        """
+        Find the PDF for a queued JSON the same way get_pdf_path does, without
+        its per-call logging (this runs for every queued file on every scan).
+
+        Returns:
+            Path to the PDF, or None if there is no match
+        """
+        stem = Path(json_name).stem
+        pdf_path = config.FOLDERS['PDF_FOLDER'] / f"{stem}.pdf"
+        if pdf_path.exists():
+            return pdf_path
+        return pdf_index.resolve(stem)
+
+    def pending_pdfs(self) -> List[Tuple[str, int]]:
+        """
+        List queued PDFs that haven't been pre-rendered in their current version.
+        Forgets handled PDFs that are no longer queued (or have changed since).
+
+        Returns:
+            List of (pdf path, mtime_ns) tuples
+        """
+        pending = []
+        seen = set()
+        for folder in self.folders:
+            if not folder.exists():
+                continue
+            for entry in os.scandir(folder):
+                if not entry.name.lower().endswith('.json'):
+                    continue
+                pdf_path = self._resolve_pdf(entry.name)
+                if pdf_path is None:
+                    continue
+                try:
+                    mtime_ns = pdf_path.stat().st_mtime_ns
+                except OSError:
+                    continue
+                key = (str(pdf_path), mtime_ns)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key not in self._done:
+                    pending.append(key)
+
+        # scan_once waits for its renders before the next scan, so nothing else touches _done here
+        self._done = {key: True for key in self._done if key in seen}
+        return pending
+
+    def _wait_for_idle(self):
+        """Block while reviewers are actively requesting renders."""
+        while not self._stop.is_set() and seconds_since_interactive() < self.idle_after:
+            self._stop.wait(self.idle_after)
+
+    def scan_once(self) -> int:
+        """
+        Scan the queue folders once and render images for new or changed PDFs.
+        Keeps at most one job per worker in flight so interactive requests are
+        never stuck behind a long backlog.
+
+        Returns:
+            Number of PDFs submitted
+        """
+        if self._executor is None:
+            raise RuntimeError("Prerenderer has not been started")
+
+        submitted = 0
+        in_flight = set()
+        for key in self.pending_pdfs()[:self.max_per_scan]:
+            # Bound the in-flight work so we can pause quickly when a reviewer is active
+            if len(in_flight) >= self.workers:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            self._wait_for_idle()
+            if self._stop.is_set():
+                break
+
+            future = self._executor.submit(prerender_pdf, key[0])
+            future.add_done_callback(lambda f, key=key: self._on_done(key, f))
+            in_flight.add(future)
+            submitted += 1
+
+        wait(in_flight)
+        return submitted
+
+    def _on_done(self, key, future):
+        try:
+            rendered = future.result()
+            self._done[key] = True
+            if rendered:
+                logger.debug(f"Pre-rendered {rendered} images for {key[0]}")
+        except Exception as e:
+            # Mark as done anyway so a broken PDF isn't retried every scan
+            self._done[key] = True
+            logger.warning(f"Failed to pre-render {key[0]}: {e}")
@@ -0,0 +1,431 @@
+"""
+Expected-reimbursement pricing of billed line items.
+
+The validation pipeline often leaves total_expected_rate at 0, so nothing
+said what a bill should actually be paid. The pricing engine flattens the
+line items of every bill in the validation failures history into one
+DataFrame, joins it against the ppo and current_otas tables in a handful
+of merges and prices every line at once:
+
+    in-network:     exact (TIN, CPT, modifier) rate -> no-modifier rate
+                    -> the provider's rate for the CPT's category
+    out-of-network: the order's current_otas rate for the CPT
+
+Expected payment is the rate times the units. Lines, bills and providers
+are returned as DataFrames with billed and expected totals.
+
+    python -m services.pricing --since 2024-01-01 --level provider
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from services.bulk_validation import parse_charges, parse_dates
+from services.ppo_updater import PPOUpdater
+from services.rate_revalidation import CHUNK_SIZE, clean_tin, is_out_of_network, rate_revalidator
+
+logger = logging.getLogger(__name__)
+
+# CPT -> procedure category, as used by category rate updates
+CODE_CATEGORIES = {code: category
+                   for category, codes in PPOUpdater.PROCEDURE_CATEGORIES.items()
+                   for code in codes}
+
+LEVELS = ('provider', 'bill', 'line')
+
+SOURCE_COLUMNS = ['bill', 'line', 'order_id', 'file_name', 'patient_name', 'date_of_service',
+                  'tin', 'provider_name', 'network', 'cpt', 'modifier', 'units', 'charge']
+
+_lock = threading.Lock()
+# failures file path -> (version, line items frame)
+_file_cache: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+
+# Last priced history and its JSON rows per level, for the pricing endpoint
+_result_lock = threading.Lock()
+_result_cache: Dict[str, Any] = {'key': None, 'result': None, 'records': {}}
+
+def _text(value) -> str:
+    return str(value if value is not None else '').strip()
+
+def _bill_key(failure: Dict[str, Any]) -> str:
+    """A bill is identified by its order, or by its source file when it has none."""
+    if failure.get('order_id'):
+        return str(failure['order_id'])
+    return Path(str(failure.get('file_name') or '').replace('\\', '/')).name
+
+def _line_items(failure: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Line items of a failure: its rate items, else the HCFA line items."""
+    items = failure.get('rates')
+    if not isinstance(items, list) or not items:
+        items = (failure.get('hcfa') or {}).get('line_items') if isinstance(failure.get('hcfa'), dict) else None
+    return [item for item in items or [] if isinstance(item, dict)]
+
+def load_failure_lines(path: Path) -> pd.DataFrame:
+    """
+    Flatten one validation failures file into a frame of line items.
+
+    A bill usually has several failure records (one per validation type);
+    its line items are taken from the first record that has any. Frames are
+    cached per file version.
+
+    Args:
+        path: validation_failures_*.json file
+
+    Returns:
+        DataFrame with SOURCE_COLUMNS (all as text)
+    """
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _file_cache.get(str(path))
+        if cached and cached[0] == version:
+            return cached[1]
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            failures = json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading validation failures file {path}: {e}")
+        failures = []
+    if not isinstance(failures, list):
+        logger.error(f"Unexpected validation failures format in {path}")
+        failures = []
+
+    rows, seen = [], set()
+    for failure in failures:
+        if not isinstance(failure, dict) or not isinstance(failure.get('provider_info'), dict):
+            continue
+        bill = _bill_key(failure)
+        items = _line_items(failure)
+        if not bill or bill in seen or not items:
+            continue
+        seen.add(bill)
+        provider_info = failure['provider_info']
+        common = (failure.get('order_id') or '', failure.get('file_name') or '',
+                  failure.get('patient_name') or '', failure.get('date_of_service') or '',
+                  clean_tin(provider_info.get('TIN')),
+                  provider_info.get('DBA Name Billing Name') or 'Unknown Provider',
+                  'ota' if is_out_of_network(provider_info) else 'ppo')
+        rows.extend((bill, number) + common + (_text(item.get('cpt')), _text(item.get('modifier')).upper(),
+                                               item.get('units'), item.get('charge'))
+                    for number, item in enumerate(items))
+
+    frame = pd.DataFrame(rows, columns=SOURCE_COLUMNS, dtype=object)
+    with _lock:
+        _file_cache[str(path)] = (version, frame)
+    return frame
+
+def load_history(folder: Path = None, since=None, until=None) -> pd.DataFrame:
+    """
+    Line items of every bill in the validation failures history.
+
+    A bill that appears in several runs is taken from the newest file.
+    Files written before `since` can't hold a date of service in the
+    window and are not read.
+
+    Args:
+        folder: Folder of the validation failures files (defaults to config.VALIDATION_LOGS_PATH)
+        since: First date of service to include (date or 'YYYY-MM-DD')
+        until: Last date of service to include
+
+    Returns:
+        DataFrame with SOURCE_COLUMNS, units and charge as numbers and
+            date_of_service as datetime (NaT when unreadable)
+    """
+    folder = Path(folder or config.VALIDATION_LOGS_PATH)
+    since = pd.Timestamp(since) if since else None
+    until = pd.Timestamp(until) if until else None
+    if not folder.exists():
+        logger.error(f"Validation logs directory not found at {folder}")
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+
+    files = sorted((entry for entry in os.scandir(folder)
+                    if entry.name.startswith('validation_failures_') and entry.name.endswith('.json')),
+                   key=lambda entry: (entry.stat().st_mtime, entry.name))
+    if since is not None:
+        files = [entry for entry in files
+                 if pd.Timestamp(datetime.fromtimestamp(entry.stat().st_mtime)) >= since]
+
+    frames = [load_failure_lines(Path(entry.path)).assign(run=number) for number, entry in enumerate(files)]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+
+    lines = pd.concat(frames, ignore_index=True)
+    lines = lines[lines['run'] == lines.groupby('bill')['run'].transform('max')].drop(columns='run').copy()
+
+    lines['date_of_service'] = parse_dates(lines['date_of_service'])
+    if since is not None:
+        lines = lines[lines['date_of_service'] >= since]
+    if until is not None:
+        lines = lines[lines['date_of_service'] <= until]
+
+    units = pd.to_numeric(lines['units'], errors='coerce')
+    lines['units'] = units.where(units > 0, 1).astype('float64')   # Blank or bad units count as 1
+    lines['charge'] = parse_charges(lines['charge']).fillna(0.0)
+    return lines.reset_index(drop=True)
+
+def _read_chunked(conn, sql: str, values: List[str], columns: List[str]) -> pd.DataFrame:
+    """Run an IN (...) query over values in chunks of CHUNK_SIZE."""
+    frames = []
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE]
+        frames.append(pd.read_sql_query(sql.format(placeholders=','.join('?' * len(chunk))), conn, params=chunk))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def load_rates(db_path, tins, order_ids) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read the ppo rates of some providers and the current_otas rates of some orders.
+
+    Returns:
+        (ppo, ota) DataFrames: ppo with tin, cpt, modifier and rate, ota with
+            order_id, cpt and rate (empty if the tables can't be read)
+    """
+    ppo_columns, ota_columns = ['tin', 'cpt', 'modifier', 'rate'], ['order_id', 'cpt', 'rate']
+    ppo = pd.DataFrame(columns=ppo_columns)
+    ota = pd.DataFrame(columns=ota_columns)
+    try:
+        conn = sqlite3.connect(db_path, timeout=30)
+    except sqlite3.Error as e:
+        logger.error(f"Rate database not available for pricing: {e}")
+        return ppo, ota
+    try:
+        try:
+            ppo = _read_chunked(conn, """
+                SELECT TRIM(TIN) AS tin, TRIM(proc_cd) AS cpt, modifier, rate FROM ppo
+                WHERE TRIM(TIN) IN ({placeholders}) AND rate IS NOT NULL
+            """, sorted(set(tins)), ppo_columns)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            logger.error(f"Could not read PPO rates: {e}")
+        try:
+            ota = _read_chunked(conn, """
+                SELECT ID_Order_PrimaryKey AS order_id, TRIM(CPT) AS cpt, rate FROM current_otas
+                WHERE ID_Order_PrimaryKey IN ({placeholders}) AND rate IS NOT NULL
+            """, sorted(set(order_ids)), ota_columns)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            logger.error(f"Could not read OTA rates: {e}")
+    finally:
+        conn.close()
+
+    ppo['modifier'] = ppo['modifier'].fillna('').astype(str).str.strip().str.upper()
+    ppo['rate'] = ppo['rate'].astype('float64')
+    ota['rate'] = ota['rate'].astype('float64')
+    return (ppo.drop_duplicates(['tin', 'cpt', 'modifier'], keep='last'),
+            ota.drop_duplicates(['order_id', 'cpt'], keep='last'))
+
+def price_lines(lines: pd.DataFrame, ppo: pd.DataFrame, ota: pd.DataFrame) -> pd.DataFrame:
+    """
+    Price every line item at once.
+
+    In-network lines take the exact (TIN, CPT, modifier) rate, then the
+    no-modifier rate, then the provider's category rate (the median of its
+    no-modifier rates for codes in the CPT's category). Out-of-network
+    lines take the order's current_otas rate.
+
+    Args:
+        lines: Line items from load_history
+        ppo: PPO rates from load_rates
+        ota: OTA rates from load_rates
+
+    Returns:
+        The lines with category, rate, rate_source (exact, no_modifier,
+            category, ota or '' when unpriced), expected (rate x units, 0
+            when unpriced), variance (charge - expected) and line_id
+            ('<bill>/<line>') columns
+    """
+    lines = lines.assign(category=lines['cpt'].map(CODE_CATEGORIES))
+    base = ppo[ppo['modifier'] == '']
+    category_rates = (base.assign(category=base['cpt'].map(CODE_CATEGORIES))
+                      .dropna(subset=['category'])
+                      .groupby(['tin', 'category'], as_index=False)['rate'].median())
+
+    priced = (lines
+              .merge(ppo.rename(columns={'rate': 'exact'}), on=['tin', 'cpt', 'modifier'], how='left')
+              .merge(base[['tin', 'cpt', 'rate']].rename(columns={'rate': 'no_modifier'}),
+                     on=['tin', 'cpt'], how='left')
+              .merge(category_rates.rename(columns={'rate': 'category_rate'}),
+                     on=['tin', 'category'], how='left')
+              .merge(ota.rename(columns={'rate': 'ota'}), on=['order_id', 'cpt'], how='left'))
+
+    in_network = (priced['network'] == 'ppo').to_numpy()
+    choices = [
+        ('exact', in_network & priced['exact'].notna().to_numpy()),
+        ('no_modifier', in_network & priced['no_modifier'].notna().to_numpy()),
+        ('category', in_network & priced['category_rate'].notna().to_numpy()),
+        ('ota', ~in_network & priced['ota'].notna().to_numpy()),
+    ]
+    columns = {'exact': 'exact', 'no_modifier': 'no_modifier', 'category': 'category_rate', 'ota': 'ota'}
+    conditions = [mask for _, mask in choices]
+    priced['rate'] = np.select(conditions, [priced[columns[source]].to_numpy(dtype='float64')
+                                            for source, _ in choices], default=np.nan)
+    priced['rate_source'] = np.select(conditions, [source for source, _ in choices], default='')
+    priced['expected'] = (priced['rate'] * priced['units']).fillna(0.0)
+    priced['variance'] = priced['charge'] - priced['expected']
+    priced['line_id'] = priced['bill'] + '/' + priced['line'].astype(str)
+    return priced.drop(columns=['exact', 'no_modifier', 'category_rate', 'ota'])
+
+def summarize(priced: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Roll priced lines up to bills and providers.
+
+    Returns:
+        dict with 'bills' (one row per bill) and 'providers' (one row per
+            TIN), each with line_count, priced_lines, billed, expected and
+            variance
+    """
+    priced = priced.assign(is_priced=priced['rate_source'] != '')
+    amounts = dict(line_count=('line', 'size'), priced_lines=('is_priced', 'sum'),
+                   billed=('charge', 'sum'), expected=('expected', 'sum'))
+
+    bills = (priced.groupby('bill', as_index=False)
+             .agg(order_id=('order_id', 'first'), file_name=('file_name', 'first'),
+                  patient_name=('patient_name', 'first'), date_of_service=('date_of_service', 'first'),
+                  tin=('tin', 'first'), provider_name=('provider_name', 'first'),
+                  network=('network', 'first'), **amounts))
+    providers = (priced.groupby('tin', as_index=False)
+                 .agg(provider_name=('provider_name', 'first'), network=('network', 'first'),
+                      bills=('bill', 'nunique'), **amounts))
+    for frame in (bills, providers):
+        frame['variance'] = frame['billed'] - frame['expected']
+        frame['fully_priced'] = frame['priced_lines'] == frame['line_count']
+    return {'bills': bills, 'providers': providers}
+
+def price_history(since=None, until=None, folder: Path = None, db_path=None) -> Dict[str, pd.DataFrame]:
+    """
+    Price the bills of the validation failures history.
+
+    Args:
+        since: First date of service (defaults to PRICING['HISTORY_DAYS'] ago)
+        until: Last date of service
+        folder: Folder of the validation failures files (defaults to config.VALIDATION_LOGS_PATH)
+        db_path: Database holding the ppo and current_otas tables (defaults to config.DB_PATH)
+
+    Returns:
+        dict with 'lines', 'bills' and 'providers' DataFrames
+    """
+    if since is None:
+        since = _default_since()
+    lines = load_history(folder, since, until)
+    ppo, ota = load_rates(db_path or config.DB_PATH,
+                          lines.loc[lines['network'] == 'ppo', 'tin'].tolist(),
+                          lines.loc[(lines['network'] == 'ota') & (lines['order_id'] != ''), 'order_id'].tolist())
+    priced = price_lines(lines, ppo, ota)
+    result = summarize(priced)
+    result['lines'] = priced
+    logger.info(f"Priced {len(priced)} line items of {len(result['bills'])} bills "
+                f"from {len(result['providers'])} providers")
+    return result
+
+def _default_since():
+    return datetime.now().date() - timedelta(days=config.PRICING['HISTORY_DAYS'])
+
+def _inputs_key(since, until, folder, db_path) -> tuple:
+    """
+    Fingerprint of everything a priced history depends on: the date range,
+    the failures files (name, mtime, size), the rate database files and the
+    revalidator's count of rate writes made through the app.
+    """
+    folder = Path(folder or config.VALIDATION_LOGS_PATH)
+    files = ()
+    if folder.exists():
+        files = tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                             for entry in os.scandir(folder)
+                             if entry.name.startswith('validation_failures_') and entry.name.endswith('.json')))
+    db_path = Path(db_path or config.DB_PATH)
+    databases = tuple((path.stat().st_mtime_ns, path.stat().st_size) if path.exists() else None
+                      for path in (db_path, Path(f"{db_path}-wal")))
+    return (str(since), str(until), str(folder), files, str(db_path), databases,
+            rate_revalidator.rates_version)
+
+def cached_price_history(since=None, until=None, folder: Path = None, db_path=None) -> Dict[str, pd.DataFrame]:
+    """
+    price_history, reused until one of its inputs changes (see _inputs_key),
+    so paging through the results is cheap and every page comes from the
+    same pricing. Callers must not mutate the result.
+    """
+    since = since if since is not None else _default_since()
+    key = _inputs_key(since, until, folder, db_path)
+    with _result_lock:
+        if _result_cache['key'] != key:
+            _result_cache.update(key=key, result=price_history(since, until, folder, db_path), records={})
+        return _result_cache['result']
+
+def cached_records(level: str, since=None, until=None, folder: Path = None,
+                   db_path=None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    JSON rows of one level of the cached priced history, with the overall totals.
+
+    Args:
+        level: 'provider', 'bill' or 'line'
+        since, until, folder, db_path: As for price_history
+
+    Returns:
+        (rows as from to_records, totals as from totals); callers must not mutate them
+    """
+    result = cached_price_history(since, until, folder, db_path)
+    with _result_lock:
+        records = _result_cache['records']
+        if _result_cache['result'] is not result:
+            records = {}       # Replaced by a newer pricing meanwhile; don't memoize
+        if level not in records:
+            records[level] = to_records(result[level + 's'])
+        if 'totals' not in records:
+            records['totals'] = totals(result['providers'])
+        return records[level], records['totals']
+
+def totals(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Overall billed and expected totals of a bills or providers frame."""
+    return {
+        'line_count': int(frame['line_count'].sum()),
+        'priced_lines': int(frame['priced_lines'].sum()),
+        'billed': round(float(frame['billed'].sum()), 2),
+        'expected': round(float(frame['expected'].sum()), 2),
+        'variance': round(float(frame['variance'].sum()), 2),
+    }
+
+def to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-ready rows: dates as 'YYYY-MM-DD', amounts rounded, NaN as None."""
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+        elif pd.api.types.is_float_dtype(frame[column]):
+            frame[column] = frame[column].round(2)
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Price the bills of the validation failures history.")
+    parser.add_argument('--since', help="First date of service, YYYY-MM-DD "
+                                        f"(default: {config.PRICING['HISTORY_DAYS']} days ago)")
+    parser.add_argument('--until', help="Last date of service, YYYY-MM-DD")
+    parser.add_argument('--level', choices=LEVELS, default='provider', help="Rows to output (default: provider)")
+    parser.add_argument('--folder', type=Path, help="Folder of the validation failures files")
+    parser.add_argument('--db', type=Path, help="Database holding the ppo and current_otas tables")
+    parser.add_argument('--output', type=Path, help="Write the rows to this CSV file instead of stdout")
+    args = parser.parse_args()
+    try:
+        since, until = (pd.Timestamp(value) if value else None for value in (args.since, args.until))
+    except ValueError as e:
+        parser.error(str(e))
+
+    result = price_history(since, until, args.folder, args.db)
+    rows = result[args.level + 's']
+    if args.output:
+        rows.to_csv(args.output, index=False, float_format='%.2f')
+    else:
+        print(rows.to_csv(index=False, float_format='%.2f'), end='')
+    summary = totals(result['providers'])
+    print(f"{summary['line_count']} lines ({summary['priced_lines']} priced): "
+          f"billed {summary['billed']:.2f}, expected {summary['expected']:.2f}", file=sys.stderr)
@@ -0,0 +1,379 @@
+"""
+Incremental re-validation of rate failures after rate edits.
+
+The validation failures file lists rate line items as FAIL until the
+upstream pipeline runs again, so a reviewer's PPO or OTA fix didn't show
+on the dashboards. The revalidator keeps an inverted index from
+(TIN, CPT) and (order_id, CPT) to the rate items in the loaded failures.
+After a write through PPOUpdater or to current_otas it re-checks only the
+affected items against the rate tables, updating their validated_rate (the
+per-unit rate) and status, and their failure's status and
+total_expected_rate (the sum of rate x units of its passing items) in place,
+and rebuilds the provider summaries of only the affected TINs.
+"""
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import config
+from services.validation_failures import load_latest_failures
+from text_utils import parse_charge, parse_units
+
+logger = logging.getLogger(__name__)
+
+# Provider Network values that route a provider to the OTA (out-of-network) queue
+OTA_NETWORK_TERMS = ('out of network', 'out-of-network', 'ota')
+
+# Most values per IN (...) query
+CHUNK_SIZE = 500
+
+def clean_tin(tin) -> str:
+    """Keep only the digits of a TIN."""
+    return ''.join(c for c in str(tin or '') if c.isdigit())
+
+def is_out_of_network(provider_info: Dict[str, Any]) -> bool:
+    """True if a provider is handled by the OTA queue rather than the PPO queue."""
+    network = (provider_info.get('Provider Network') or '').lower()
+    return any(term in network for term in OTA_NETWORK_TERMS)
+
+def _modifier(value) -> str:
+    return str(value or '').strip().upper()
+
+def _chunks(values: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class RateRevalidator:
+    """
+    Inverted index over the rate items of the latest validation failures.
+
+    Items of in-network providers are indexed by (TIN, CPT) and re-checked
+    against the ppo table (exact modifier first, then no modifier); items of
+    out-of-network providers are indexed by (order_id, CPT) and re-checked
+    against current_otas. An item with a rate passes with that rate; an item
+    whose rate is removed goes back to what the pipeline reported.
+
+    When a newer failures file is loaded the index is rebuilt and every item
+    re-checked once in batched queries; after that only edited keys are.
+    """
+
+    def __init__(self, db_path, failures_folder=None):
+        """
+        Initialize the revalidator. The index is built on first use.
+
+        Args:
+            db_path (Path): SQLite database holding the ppo and current_otas tables
+            failures_folder (Path): Folder of the validation failures files
+                (defaults to config.VALIDATION_LOGS_PATH)
+        """
+        self.db_path = db_path
+        self.failures_folder = failures_folder
+        self._lock = threading.RLock()
+        self._failures: List[Dict[str, Any]] = None
+        # (kind, key) -> [(failure index, rate index)]
+        self._index: Dict[Tuple[str, Tuple[str, str]], List[Tuple[int, int]]] = {}
+        # failure index -> (kind, TIN) of each indexed rate failure
+        self._providers: Dict[int, Tuple[str, str]] = {}
+        # What the pipeline reported, to restore when a rate is removed
+        self._item_originals: Dict[Tuple[int, int], Tuple[Any, Any]] = {}
+        self._failure_originals: Dict[int, Tuple[Any, Any]] = {}
+        # kind -> TIN -> provider summary
+        self._summaries: Dict[str, Dict[str, Dict[str, Any]]] = {'ppo': {}, 'ota': {}}
+        # Bumped on every PPO or OTA rate write reported here, so caches of
+        # anything priced from the rate tables (services.pricing) know to rebuild
+        self.rates_version = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_current(self):
+        """Rebuild the index if a newer failures file has been loaded."""
+        failures = load_latest_failures(self.failures_folder or config.VALIDATION_LOGS_PATH)
+        if failures is not self._failures:
+            self._rebuild(failures)
+
+    def _rebuild(self, failures: List[Dict[str, Any]]):
+        self._failures = failures
+        self._index = {}
+        self._providers = {}
+        self._item_originals = {}
+        self._failure_originals = {}
+
+        for failure_index, failure in enumerate(failures):
+            if not isinstance(failure, dict) or failure.get('validation_type') != 'rate':
+                continue
+            provider_info = failure.get('provider_info')
+            if not isinstance(provider_info, dict):
+                continue
+            tin = clean_tin(provider_info.get('TIN'))
+            if len(tin) != 9:
+                continue
+            kind = 'ota' if is_out_of_network(provider_info) else 'ppo'
+            self._providers[failure_index] = (kind, tin)
+            self._failure_originals[failure_index] = (failure.get('status'), failure.get('total_expected_rate'))
+
+            for rate_index, item in enumerate(failure.get('rates') or []):
+                cpt = str(item.get('cpt') or '').strip()
+                if not cpt:
+                    continue
+                if kind == 'ota':
+                    if not failure.get('order_id'):
+                        continue
+                    key = ('ota', (failure['order_id'], cpt))
+                else:
+                    key = ('ppo', (tin, cpt))
+                self._index.setdefault(key, []).append((failure_index, rate_index))
+                self._item_originals[(failure_index, rate_index)] = (item.get('validated_rate'), item.get('status'))
+
+        # Fixes made since the file was written count straight away
+        self._revalidate(set(self._index))
+        self._summaries = {'ppo': {}, 'ota': {}}
+        self._summarize({tin for _, tin in self._providers.values()})
+        logger.info(f"Indexed {len(self._item_originals)} rate items of {len(self._providers)} rate failures")
+
+    def _lookup_rates(self, keys: Set[Tuple[str, Tuple[str, str]]]) -> Tuple[Dict, Dict]:
+        """Fetch the current PPO and OTA rates of a set of index keys in batched queries."""
+        ppo_rates, ota_rates = {}, {}
+        tins = sorted({key[0] for kind, key in keys if kind == 'ppo'})
+        order_ids = sorted({key[0] for kind, key in keys if kind == 'ota'})
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.error(f"Rate database not available for re-validation: {e}")
+            return ppo_rates, ota_rates
+        try:
+            for chunk in _chunks(tins):
+                placeholders = ','.join('?' * len(chunk))
+                try:
+                    rows = conn.execute(f"""
+                        SELECT TRIM(TIN) AS tin, TRIM(proc_cd) AS cpt, modifier, rate FROM ppo
+                        WHERE TRIM(TIN) IN ({placeholders})
+                    """, chunk).fetchall()
+                except sqlite3.Error as e:
+                    logger.error(f"Could not read PPO rates: {e}")
+                    break
+                for row in rows:
+                    if row['rate'] is not None:
+                        ppo_rates[(row['tin'], row['cpt'], _modifier(row['modifier']))] = float(row['rate'])
+            for chunk in _chunks(order_ids):
+                placeholders = ','.join('?' * len(chunk))
+                try:
+                    rows = conn.execute(f"""
+                        SELECT ID_Order_PrimaryKey AS order_id, CPT AS cpt, rate FROM current_otas
+                        WHERE ID_Order_PrimaryKey IN ({placeholders})
+                    """, chunk).fetchall()
+                except sqlite3.Error as e:
+                    logger.error(f"Could not read OTA rates: {e}")
+                    break
+                for row in rows:
+                    if row['rate'] is not None:
+                        ota_rates[(row['order_id'], str(row['cpt']).strip())] = float(row['rate'])
+        finally:
+            conn.close()
+        return ppo_rates, ota_rates
+
+    def _revalidate(self, keys: Set[Tuple[str, Tuple[str, str]]]) -> int:
+        """
+        Re-check the items under some index keys and update them in place.
+
+        Returns:
+            Number of items whose validated_rate or status changed
+        """
+        keys = {key for key in keys if key in self._index}
+        if not keys:
+            return 0
+        ppo_rates, ota_rates = self._lookup_rates(keys)
+
+        changed = 0
+        touched_failures = set()
+        for kind, key in keys:
+            for failure_index, rate_index in self._index[(kind, key)]:
+                item = self._failures[failure_index]['rates'][rate_index]
+                if kind == 'ppo':
+                    tin, cpt = key
+                    rate = ppo_rates.get((tin, cpt, _modifier(item.get('modifier'))))
+                    if rate is None:
+                        rate = ppo_rates.get((tin, cpt, ''))
+                else:
+                    rate = ota_rates.get(key)
+
+                if rate is not None:
+                    validated_rate, status = rate, 'PASS'
+                else:
+                    validated_rate, status = self._item_originals[(failure_index, rate_index)]
+                if item.get('validated_rate') != validated_rate or item.get('status') != status:
+                    item['validated_rate'] = validated_rate
+                    item['status'] = status
+                    changed += 1
+                    touched_failures.add(failure_index)
+
+        for failure_index in touched_failures:
+            self._refresh_failure(failure_index)
+        return changed
+
+    def _refresh_failure(self, failure_index: int):
+        """Recompute a failure's status and total expected rate from its items."""
+        failure = self._failures[failure_index]
+        status, total = self._failure_originals[failure_index]
+        items = failure.get('rates') or []
+        overridden = any(
+            (item.get('validated_rate'), item.get('status')) != self._item_originals.get((failure_index, number))
+            for number, item in enumerate(items) if (failure_index, number) in self._item_originals
+        )
+        if overridden:
+            if items and all(item.get('status') == 'PASS' for item in items):
+                status = 'PASS'
+            # validated_rate is the per-unit rate from the rate tables; expected
+            # payment is rate x units, as in services.pricing
+            total = sum((item.get('validated_rate') or 0) * parse_units(item.get('units'))
+                        for item in items if item.get('status') == 'PASS')
+        failure['status'] = status
+        failure['total_expected_rate'] = total
+
+    def _summarize(self, tins: Iterable[str]):
+        """Rebuild the provider summaries of some TINs."""
+        tins = set(tins)
+        for summaries in self._summaries.values():
+            for tin in tins:
+                summaries.pop(tin, None)
+
+        for failure_index, (kind, tin) in self._providers.items():
+            if tin not in tins:
+                continue
+            failure = self._failures[failure_index]
+            provider_info = failure['provider_info']
+            summary = self._summaries[kind].setdefault(tin, {
+                'tin': tin,
+                'name': provider_info.get('DBA Name Billing Name', 'Unknown Provider'),
+                'network': provider_info.get('Provider Network', 'Unknown'),
+                'total_line_items': 0,
+                'missing_rate_line_items': 0,
+                'missing_category_line_items': 0,
+                'cpt_codes': set(),
+            })
+            order_id = failure.get('order_id')
+            for item in failure.get('rates') or []:
+                cpt = item.get('cpt')
+                # OTA rates are keyed by (order, CPT): items without a CPT aren't counted,
+                # and items without an order can't be missing a rate
+                if kind == 'ota' and not cpt:
+                    continue
+                summary['total_line_items'] += 1
+                missing = item.get('status') != 'PASS' and (kind == 'ppo' or bool(order_id))
+                if missing:
+                    summary['missing_rate_line_items'] += 1
+                if not item.get('category') or item.get('category') == 'Uncategorized':
+                    summary['missing_category_line_items'] += 1
+                # The PPO list shows every CPT billed, the OTA list the ones still missing a rate
+                if cpt and (kind == 'ppo' or missing):
+                    summary['cpt_codes'].add(cpt)
+
+    def ppo_rates_changed(self, tin: str, proc_codes: Iterable[str]) -> int:
+        """
+        Re-validate the rate items affected by PPO rate edits.
+
+        Args:
+            tin: Provider TIN
+            proc_codes: CPT codes whose rates were written
+
+        Returns:
+            Number of rate items whose status or validated rate changed
+        """
+        tin = clean_tin(tin)
+        keys = {('ppo', (tin, str(code).strip())) for code in proc_codes if code}
+        return self._apply(keys, {tin})
+
+    def ota_rates_changed(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Re-validate the rate items affected by current_otas upserts.
+
+        Args:
+            pairs: (order_id, CPT) of every rate written
+
+        Returns:
+            Number of rate items whose status or validated rate changed
+        """
+        keys = {('ota', (order_id, str(cpt).strip())) for order_id, cpt in pairs if order_id and cpt}
+        return self._apply(keys)
+
+    def _apply(self, keys, tins=None) -> int:
+        with self._lock:
+            self.rates_version += 1
+            self._ensure_current()
+            if tins is None:
+                tins = {self._providers[failure_index][1]
+                        for key in keys for failure_index, _ in self._index.get(key, ())}
+            changed = self._revalidate(keys)
+            if changed:
+                self._summarize(tins)
+                logger.info(f"Re-validated rate items after a rate edit: {changed} changed")
+            return changed
+
+    def preview_ppo_rates(self, tin: str, rates: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Work out which failing rate items a set of no-modifier PPO rates would
+        resolve, without writing them. Every failing item under (TIN, CPT)
+        would pass, since a no-modifier rate is the fallback for any modifier.
+
+        Args:
+            tin: Provider TIN
+            rates: CPT -> rate that would be written
+
+        Returns:
+            dict: line_items (items that would pass), charges (their billed
+                charges), expected (their rate x units at the new rates),
+                failures (failures whose every item would then pass) and by_cpt
+                (CPT -> items that would pass)
+        """
+        tin = clean_tin(tin)
+        with self._lock:
+            self._ensure_current()
+            resolved = set()
+            charges = expected = 0.0
+            by_cpt = {}
+            for cpt, rate in rates.items():
+                for ref in self._index.get(('ppo', (tin, str(cpt).strip())), ()):
+                    item = self._failures[ref[0]]['rates'][ref[1]]
+                    if item.get('status') == 'PASS':
+                        continue
+                    resolved.add(ref)
+                    charges += parse_charge(item.get('charge'))
+                    expected += float(rate) * parse_units(item.get('units'))
+                    by_cpt[cpt] = by_cpt.get(cpt, 0) + 1
+
+            failures = 0
+            for failure_index in {ref[0] for ref in resolved}:
+                items = self._failures[failure_index].get('rates') or []
+                if all(item.get('status') == 'PASS' or (failure_index, number) in resolved
+                       for number, item in enumerate(items)):
+                    failures += 1
+
+        return {
+            'line_items': len(resolved),
+            'charges': round(charges, 2),
+            'expected': round(expected, 2),
+            'failures': failures,
+            'by_cpt': by_cpt,
+        }
+
+    def provider_summaries(self, kind: str) -> List[Dict[str, Any]]:
+        """
+        Get the per-provider rate summaries shown by the rate dashboards.
+
+        Args:
+            kind: 'ppo' (in-network) or 'ota' (out-of-network)
+
+        Returns:
+            List of dicts with tin, name, network, total_line_items,
+                missing_rate_line_items, missing_category_line_items and cpt_codes
+        """
+        with self._lock:
+            self._ensure_current()
+            return [dict(summary, cpt_codes=sorted(summary['cpt_codes']))
+                    for summary in self._summaries[kind].values()]
+
+# Shared revalidator over the rate tables and the latest failures file
+rate_revalidator = RateRevalidator(config.DB_PATH)
@@ -0,0 +1,182 @@
+"""
+Background extraction of the PDF archive's text layer into the full-text index.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import config
+from pdf_utils import extract_text_layer, seconds_since_interactive
+from services.prerenderer import _lower_worker_priority
+from text_index import PDFTextIndex, text_index
+
+logger = logging.getLogger(__name__)
+
+class TextIndexer:
+    """
+    Keeps the full-text index in step with the PDF archive.
+
+    Each scan lists the archive with os.scandir, extracts the text of PDFs
+    that are new or changed since they were indexed (in a process pool, at
+    reduced priority) and removes PDFs that no longer exist. Index writes all
+    happen on the scan thread. Like the prerenderer, submission pauses while
+    reviewers are requesting renders.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        index: PDFTextIndex,
+        workers: int = 1,
+        poll_interval: float = 300,
+        max_per_scan: int = 500,
+        idle_after: float = 2.0
+    ):
+        """
+        Initialize the indexer.
+
+        Args:
+            folder: Folder containing the PDFs
+            index: Index the extracted text is written to
+            workers: Number of extraction processes
+            poll_interval: Seconds between archive scans
+            max_per_scan: Maximum PDFs extracted per scan
+            idle_after: Seconds without interactive renders required before submitting work
+        """
+        self.folder = Path(folder)
+        self.index = index
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_per_scan = max_per_scan
+        self.idle_after = idle_after
+
+        # PDF versions that failed to extract, so they aren't retried every scan
+        self._failed: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    @classmethod
+    def from_config(cls) -> 'TextIndexer':
+        """
+        Build an indexer for the configured PDF archive.
+
+        Returns:
+            TextIndexer configured from config.TEXT_INDEX
+        """
+        settings = config.TEXT_INDEX
+        return cls(
+            folder=config.FOLDERS['PDF_FOLDER'],
+            index=text_index,
+            workers=settings['WORKERS'],
+            poll_interval=settings['POLL_INTERVAL'],
+            max_per_scan=settings['MAX_PER_SCAN'],
+            idle_after=config.PRERENDER['IDLE_AFTER'],
+        )
+
+    def start(self):
+        """Start the worker pool and the background scan thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_worker_priority)
+        self._thread = threading.Thread(target=self._run, name='text-indexer', daemon=True)
+        self._thread.start()
+        logger.info(f"Text indexer started with {self.workers} workers")
+
+    def stop(self):
+        """Stop scanning and shut down the worker pool."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                indexed = self.scan_once()
+                if indexed:
+                    logger.info(f"Text indexer indexed {indexed} PDFs")
+            except Exception as e:
+                logger.error(f"Text index scan failed: {e}", exc_info=True)
+            self._stop.wait(self.poll_interval)
+
+    def pending_pdfs(self) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+        """
+        Compare the archive with the index.
+
+        Returns:
+            Tuple of (PDFs to index as (name, mtime_ns, size), indexed names no longer in the archive)
+        """
+        indexed = self.index.indexed_versions()
+        pending = []
+        current = set()
+        for entry in os.scandir(self.folder):
+            if not entry.name.lower().endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            current.add(entry.name)
+            version = (stat.st_mtime_ns, stat.st_size)
+            if indexed.get(entry.name) == version or self._failed.get(entry.name) == version:
+                continue
+            pending.append((entry.name, *version))
+        removed = [name for name in indexed if name not in current]
+        return pending, removed
+
+    def _wait_for_idle(self):
+        """Block while reviewers are actively requesting renders."""
+        while not self._stop.is_set() and seconds_since_interactive() < self.idle_after:
+            self._stop.wait(self.idle_after)
+
+    def scan_once(self) -> int:
+        """
+        Index new or changed PDFs and drop deleted ones.
+
+        Returns:
+            Number of PDFs indexed
+        """
+        if self._executor is None:
+            raise RuntimeError("Text indexer has not been started")
+        if not self.folder.exists():
+            return 0
+
+        pending, removed = self.pending_pdfs()
+        if removed:
+            self.index.remove(removed)
+            logger.info(f"Removed {len(removed)} deleted PDFs from the text index")
+
+        indexed = 0
+        in_flight = {}
+
+        def collect(done):
+            nonlocal indexed
+            for future in done:
+                name, mtime_ns, size = in_flight.pop(future)
+                try:
+                    self.index.store(name, mtime_ns, size, future.result())
+                    indexed += 1
+                except Exception as e:
+                    self._failed[name] = (mtime_ns, size)
+                    logger.warning(f"Failed to index text of {name}: {e}")
+
+        for name, mtime_ns, size in pending[:self.max_per_scan]:
+            if len(in_flight) >= self.workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            self._wait_for_idle()
+            if self._stop.is_set():
+                break
+            future = self._executor.submit(extract_text_layer, str(self.folder / name))
+            in_flight[future] = (name, mtime_ns, size)
+
+        done, _ = wait(in_flight)
+        collect(done)
+        return indexed
@@ -0,0 +1,84 @@
+"""
+Cached loading of the latest validation failures file shared by the
+rate, OTA and provider correction routes.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {'version': None, 'failures': []}
+
+def latest_failures_file(folder: Optional[Path] = None) -> Optional[Path]:
+    """
+    Find the most recent validation_failures_*.json file.
+
+    Args:
+        folder: Folder holding the validation logs (defaults to config.VALIDATION_LOGS_PATH)
+
+    Returns:
+        Path of the newest file, or None if there is none
+    """
+    folder = Path(folder or config.VALIDATION_LOGS_PATH)
+    if not folder.exists():
+        logger.error(f"Validation logs directory not found at {folder}")
+        return None
+
+    latest = None
+    latest_mtime = None
+    for entry in os.scandir(folder):
+        if not (entry.name.startswith('validation_failures_') and entry.name.endswith('.json')):
+            continue
+        mtime = entry.stat().st_mtime
+        if latest_mtime is None or mtime > latest_mtime:
+            latest, latest_mtime = Path(entry.path), mtime
+    return latest
+
+def load_latest_failures(folder: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Load the most recent validation failures file.
+
+    The parsed list is cached and only re-read when a newer file appears or
+    the file's mtime or size changes, so list endpoints don't re-parse a
+    multi-MB file on every request. Callers must not mutate the result; only
+    services.rate_revalidation updates rate items in place after rate edits.
+
+    Args:
+        folder: Folder holding the validation logs (defaults to config.VALIDATION_LOGS_PATH)
+
+    Returns:
+        List of failure records (empty if there is no file or it can't be read)
+    """
+    latest_file = latest_failures_file(folder)
+    if latest_file is None:
+        logger.warning("No validation failure files found")
+        return []
+
+    stat = latest_file.stat()
+    version = (str(latest_file), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _cache['version'] == version:
+            return _cache['failures']
+
+        try:
+            with open(latest_file, 'r', encoding='utf-8') as f:
+                failures = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading validation failures file: {e}")
+            return []
+
+        if not isinstance(failures, list):
+            logger.error(f"Unexpected validation failures format in {latest_file}")
+            failures = []
+
+        logger.info(f"Loaded {len(failures)} validation failures from {latest_file}")
+        _cache['version'] = version
+        _cache['failures'] = failures
+        return failures
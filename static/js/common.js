@@ -130,6 +130,80 @@ function createElement(tag, options = {}) {
     return element;
 }
 
+/**
+ * Add a lazily loaded header thumbnail to a file list item
+ * @param {HTMLElement} listItem - The list item showing the filename
+ * @param {Object} [thumbnails] - Thumbnail URLs for the file ({page, header}) from /api/files
+ */
+function addFileThumbnail(listItem, thumbnails) {
+    if (!thumbnails || !thumbnails.header) {
+        return;
+    }
+    
+    const img = createElement('img', {
+        classes: 'file-thumbnail',
+        attributes: {
+            src: thumbnails.header,
+            alt: '',
+            loading: 'lazy'
+        }
+    });
+    // Files without a PDF just show the filename
+    img.onerror = () => img.remove();
+    if (thumbnails.page) {
+        listItem.title = 'Hover to preview';
+        img.onmouseenter = () => { img.src = thumbnails.page; };
+        img.onmouseleave = () => { img.src = thumbnails.header; };
+    }
+    listItem.prepend(img);
+}
+
+/**
+ * Fetch one page of a paginated list endpoint
+ * @param {string} url - List endpoint (e.g. '/unmapped/api/files')
+ * @param {Object} [params] - sort, order, q, limit and field filters; empty values are left out
+ * @param {string} [cursor] - next_cursor of the previous page (omit for the first page)
+ * @returns {Promise<Object>} The endpoint's JSON (the page plus total and next_cursor)
+ */
+async function fetchListPage(url, params = {}, cursor = null) {
+    const query = new URLSearchParams();
+    for (const [key, value] of Object.entries(params)) {
+        if (value !== undefined && value !== null && value !== '') {
+            query.set(key, value);
+        }
+    }
+    if (cursor) {
+        query.set('cursor', cursor);
+    }
+
+    const queryString = query.toString();
+    const response = await fetch(queryString ? `${url}?${queryString}` : url);
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || `Server returned ${response.status}: ${response.statusText}`);
+    }
+    return data;
+}
+
+/**
+ * Add a "Load more" row to the end of a paginated list
+ * @param {HTMLElement} container - The list; its children are the items shown so far
+ * @param {number} total - Number of items across all pages
+ * @param {Function} loadMore - Fetches and appends the next page
+ */
+function addLoadMoreButton(container, total, loadMore) {
+    const button = createElement('button', {
+        classes: ['list-group-item', 'list-group-item-action', 'text-center', 'text-primary'],
+        attributes: { type: 'button' },
+        content: `Load more (${container.children.length} of ${total} shown)`
+    });
+    button.onclick = () => {
+        button.remove();
+        loadMore();
+    };
+    container.appendChild(button);
+}
+
 /**
  * Show an alert message that automatically disappears
  * @param {string} message - The message to display
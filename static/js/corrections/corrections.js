@@ -5,8 +5,11 @@
 // Global variables
 let currentFileIndex = 0;
 let files = [];
+let totalFiles = 0;
+let filesCursor = null;
 let currentData = null;
 let originalData = null;
+let baseHash = null;
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -15,15 +18,16 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 /**
- * Load the list of files that need OCR correction
+ * Load the first page of files that need OCR correction
  */
 async function loadFiles() {
     try {
-        const response = await fetch('/corrections/api/files');
-        const data = await response.json();
+        const data = await fetchListPage('/corrections/api/files');
         
-        // Store the files list
+        // Store the files list; later pages are fetched as the reviewer reaches them
         files = data.files || [];
+        totalFiles = data.total || 0;
+        filesCursor = data.next_cursor;
         
         // Update the file info display
         updateFileInfo();
@@ -42,6 +46,23 @@ async function loadFiles() {
     }
 }
 
+/**
+ * Append the next page of files to the list
+ */
+async function loadMoreFiles() {
+    if (!filesCursor) return;
+    
+    try {
+        const data = await fetchListPage('/corrections/api/files', {}, filesCursor);
+        files.push(...(data.files || []));
+        totalFiles = data.total || 0;
+        filesCursor = data.next_cursor;
+    } catch (error) {
+        console.error('Error loading more files:', error);
+        showAlert(`Error loading more files: ${error.message}`, 'error');
+    }
+}
+
 /**
  * Load a specific file for editing
  * @param {string} filename - Filename to load
@@ -61,6 +82,7 @@ async function loadFile(filename) {
         console.log('Loaded file data:', result);
         currentData = result.data;
         originalData = JSON.parse(JSON.stringify(result.data)); // Deep copy of original data
+        baseHash = result.base_hash; // Sent back with the patch so a stale save is refused
         
         // Update file info with remaining files count
         updateFileInfo();
@@ -70,7 +92,7 @@ async function loadFile(filename) {
         
         // Update button states
         document.getElementById('prevBtn').disabled = currentFileIndex === 0;
-        document.getElementById('nextBtn').disabled = currentFileIndex === files.length - 1;
+        document.getElementById('nextBtn').disabled = currentFileIndex === files.length - 1 && !filesCursor;
     } catch (error) {
         console.error('Error loading file:', error);
         const fileInfo = document.getElementById('fileInfo');
@@ -239,61 +261,27 @@ function displayData() {
  * Load a PDF region and display it as an image
  * @param {string} region - Region name ('header', 'service_lines', etc.)
  */
-async function loadPDFRegion(region) {
+function loadPDFRegion(region) {
     if (!files[currentFileIndex]) return;
     
-    try {
-        const filename = files[currentFileIndex];
-        console.log(`Loading PDF region: ${region} for file: ${filename}`);
-        
-        // Show loading indicator in the image
-        const imgElement = document.getElementById(`${region}-image`);
-        if (!imgElement) {
-            console.error(`Image element not found for ${region}`);
-            return;
-        }
-        
-        // Set a loading state
-        imgElement.src = '/static/img/error.png'; // Use as a loading placeholder
-        
-        // Use a consistent approach to fetch the region
-        console.log(`Fetching region from: /corrections/api/pdf_region/${filename}/${region}`);
-        const response = await fetch(`/corrections/api/pdf_region/${filename}/${region}`);
-        console.log(`Response status: ${response.status}`);
-        
-        if (response.ok) {
-            const data = await response.json();
-            console.log(`Response data received for ${region}`);
-            
-            if (data.image) {
-                // Directly set the image source - don't test it first
-                imgElement.src = data.image;
-                console.log(`Image for ${region} set`);
-                
-                // Add error handler in case image fails to load
-                imgElement.onerror = function() {
-                    console.error(`Error displaying image for ${region}`);
-                    showPDFLink(region, filename);
-                };
-            } else {
-                console.error(`No image data returned for ${region}`);
-                if (data.error) {
-                    console.error(`Error from server: ${data.error}`);
-                }
-                showPDFLink(region, filename);
-            }
-        } else {
-            console.error(`Failed to load region: ${response.status}`);
-            showPDFLink(region, filename);
-        }
-    } catch (error) {
-        console.error(`Error loading ${region} PDF region:`, error);
-        
-        // Fall back to showing a link to the full PDF
-        if (files[currentFileIndex]) {
-            showPDFLink(region, files[currentFileIndex]);
-        }
+    const filename = files[currentFileIndex];
+    console.log(`Loading PDF region: ${region} for file: ${filename}`);
+    
+    const imgElement = document.getElementById(`${region}-image`);
+    if (!imgElement) {
+        console.error(`Image element not found for ${region}`);
+        return;
     }
+    
+    // Fall back to showing a link to the full PDF if the region can't be rendered
+    imgElement.onerror = function() {
+        console.error(`Error displaying image for ${region}`);
+        imgElement.onerror = null;
+        showPDFLink(region, filename);
+    };
+    
+    // Served as a cacheable PNG, so the browser can reuse it on repeat views
+    imgElement.src = `/corrections/api/pdf_region_image/${encodeURIComponent(filename)}/${region}`;
 }
 
 /**
@@ -415,13 +403,13 @@ function updateFileInfo() {
         return;
     }
     
-    const remainingFiles = files.length;
+    const remainingFiles = totalFiles;
     
     // Create a more prominent display with the remaining files count
     info.innerHTML = `
         <div class="d-flex justify-content-between align-items-center">
             <div>
-                <strong>File ${currentFileIndex + 1} of ${files.length}:</strong> ${files[currentFileIndex]}
+                <strong>File ${currentFileIndex + 1} of ${totalFiles}:</strong> ${files[currentFileIndex]}
             </div>
             <div class="ms-3">
                 <span class="badge bg-primary rounded-pill fs-6">${remainingFiles} remaining</span>
@@ -431,7 +419,7 @@ function updateFileInfo() {
     
     // Update button states
     document.getElementById('prevBtn').disabled = currentFileIndex === 0;
-    document.getElementById('nextBtn').disabled = currentFileIndex === files.length - 1;
+    document.getElementById('nextBtn').disabled = currentFileIndex === files.length - 1 && !filesCursor;
 }
 
 /**
@@ -445,9 +433,12 @@ function openPDF() {
 }
 
 /**
- * Load the next file in the list
+ * Load the next file in the list, fetching the next page when needed
  */
-function loadNext() {
+async function loadNext() {
+    if (currentFileIndex === files.length - 1) {
+        await loadMoreFiles();
+    }
     if (currentFileIndex < files.length - 1) {
         currentFileIndex++;
         loadFile(files[currentFileIndex]);
@@ -465,7 +456,37 @@ function loadPrevious() {
 }
 
 /**
- * Save changes to the current file
+ * Build a JSON Patch (RFC 6902) turning one document into another.
+ * Objects are compared key by key and equal-length arrays item by item;
+ * anything else that differs is replaced whole.
+ */
+function jsonPatch(before, after, path = '', ops = []) {
+    const bothObjects = before && after && typeof before === 'object' && typeof after === 'object'
+        && Array.isArray(before) === Array.isArray(after);
+    if (!bothObjects || (Array.isArray(before) && before.length !== after.length)) {
+        if (JSON.stringify(before) !== JSON.stringify(after)) {
+            ops.push({ op: 'replace', path, value: after });
+        }
+        return ops;
+    }
+    const escape = key => String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+    for (const key of Object.keys(before)) {
+        if (!(key in after)) {
+            ops.push({ op: 'remove', path: `${path}/${escape(key)}` });
+        } else {
+            jsonPatch(before[key], after[key], `${path}/${escape(key)}`, ops);
+        }
+    }
+    for (const key of Object.keys(after)) {
+        if (!(key in before)) {
+            ops.push({ op: 'add', path: `${path}/${escape(key)}`, value: after[key] });
+        }
+    }
+    return ops;
+}
+
+/**
+ * Save changes to the current file (only the edits are sent, as a JSON Patch)
  */
 async function saveChanges() {
     if (!files[currentFileIndex] || !currentData) {
@@ -481,8 +502,8 @@ async function saveChanges() {
             },
             body: JSON.stringify({
                 filename: files[currentFileIndex],
-                content: currentData,
-                original_content: originalData
+                patch: jsonPatch(originalData, currentData),
+                base_hash: baseHash
             }),
         });
         
@@ -496,6 +517,12 @@ async function saveChanges() {
         
         // Update the files list
         files.splice(currentFileIndex, 1);
+        totalFiles = Math.max(0, totalFiles - 1);
+        
+        // The saved file was the last one loaded; fetch the next page
+        if (currentFileIndex >= files.length) {
+            await loadMoreFiles();
+        }
         
         if (files.length === 0) {
             // No more files
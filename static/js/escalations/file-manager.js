@@ -4,33 +4,24 @@
  */
 
 /**
- * Load the list of escalated files
+ * Load the list of escalated files, a page at a time
+ * @param {string} [cursor] - next_cursor of the page already shown (omit to reload from the top)
  */
-async function loadFiles() {
+async function loadFiles(cursor = null) {
     try {
         console.log('Attempting to fetch escalated files...');
-        const response = await fetch('/escalations/api/files');
-        console.log('Response status:', response.status);
-        
-        if (!response.ok) {
-            throw new Error(`Server returned ${response.status}: ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        const data = await fetchListPage('/escalations/api/files', {}, cursor);
         console.log('Received data:', data);
-        
-        // Check for error message from server
-        if (data.error) {
-            console.error('Server reported error:', data.error);
-        }
-        
+
         const fileList = document.getElementById('fileList');
-        fileList.innerHTML = '';
-        
+        if (!cursor) {
+            fileList.innerHTML = '';
+        }
+
         // Update file count badge
         const fileCount = document.getElementById('fileCount');
         if (fileCount) {
-            fileCount.textContent = data.files ? data.files.length : '0';
+            fileCount.textContent = data.total || '0';
         }
 
         if (data.files && data.files.length > 0) {
@@ -39,6 +30,7 @@ async function loadFiles() {
                 const listItem = document.createElement('a');
                 listItem.className = 'list-group-item list-group-item-action list-group-item-escalated';
                 listItem.textContent = file;
+                addFileThumbnail(listItem, data.thumbnails && data.thumbnails[file]);
                 listItem.href = '#';
                 listItem.onclick = (e) => {
                     e.preventDefault();
@@ -46,7 +38,10 @@ async function loadFiles() {
                 };
                 fileList.appendChild(listItem);
             });
-        } else {
+            if (data.next_cursor) {
+                addLoadMoreButton(fileList, data.total, () => loadFiles(data.next_cursor));
+            }
+        } else if (!cursor) {
             console.log('No escalated files found');
             fileList.innerHTML = '<div class="list-group-item">No escalated files found</div>';
             
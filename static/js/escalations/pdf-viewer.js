@@ -15,51 +15,54 @@ function loadPDF(filename) {
         const pdfFrame = document.getElementById('pdfFrame');
         pdfFrame.src = `/escalations/api/pdf/${filename}`;
         
-        // Load the header region
-        loadPDFRegion(filename, 'header', 'headerImage');
-        
-        // Load the service lines region
-        loadPDFRegion(filename, 'service_lines', 'serviceImage');
+        // Load the header and service lines regions from a single page render
+        loadPDFRegions(filename, {header: 'headerImage', service_lines: 'serviceImage'});
     } catch (error) {
         console.error('Error loading PDF:', error);
     }
 }
 
 /**
- * Load a specific region of a PDF
+ * Load several regions of a PDF, rendered together on the server
  * @param {string} filename - Name of the file to load
- * @param {string} region - Region name (header, service_lines, footer)
- * @param {string} imgId - ID of the image element to update
+ * @param {Object} imgIds - Map of region name to the ID of its image element
  */
-async function loadPDFRegion(filename, region, imgId) {
+async function loadPDFRegions(filename, imgIds) {
     try {
-        console.log(`Loading PDF region ${region} for file: ${filename}`);
-        const response = await fetch(`/escalations/api/pdf_region/${filename}/${region}`);
-        
-        if (!response.ok) {
-            console.error(`Failed to load PDF region: ${response.status} ${response.statusText}`);
-            return;
-        }
-        
+        const response = await fetch(`/escalations/api/pdf_regions/${encodeURIComponent(filename)}`);
         const data = await response.json();
         
-        if (data.error) {
-            console.error(`Error in PDF region response: ${data.error}`);
-            return;
+        if (!response.ok || !data.regions) {
+            throw new Error(data.error || `HTTP ${response.status}`);
         }
         
-        if (data.image) {
+        Object.entries(imgIds).forEach(([region, imgId]) => {
             const imgElement = document.getElementById(imgId);
-            if (imgElement) {
-                imgElement.src = data.image;
-                console.log(`Set image for ${region}`);
-            } else {
-                console.error(`Image element not found: ${imgId}`);
+            if (imgElement && data.regions[region]) {
+                imgElement.src = data.regions[region].url;
             }
-        } else {
-            console.error(`No image data returned for ${region}`);
-        }
+        });
     } catch (error) {
-        console.error(`Error loading ${region} PDF region:`, error);
+        console.error('Error loading PDF regions, loading them individually:', error);
+        Object.entries(imgIds).forEach(([region, imgId]) => loadPDFRegion(filename, region, imgId));
+    }
+}
+
+/**
+ * Load a specific region of a PDF
+ * @param {string} filename - Name of the file to load
+ * @param {string} region - Region name (header, service_lines, footer)
+ * @param {string} imgId - ID of the image element to update
+ */
+function loadPDFRegion(filename, region, imgId) {
+    console.log(`Loading PDF region ${region} for file: ${filename}`);
+    const imgElement = document.getElementById(imgId);
+    if (!imgElement) {
+        console.error(`Image element not found: ${imgId}`);
+        return;
     }
+    
+    // Served as a cacheable PNG, so the browser can reuse it on repeat views
+    imgElement.onerror = () => console.error(`Error loading ${region} PDF region for ${filename}`);
+    imgElement.src = `/escalations/api/pdf_region_image/${encodeURIComponent(filename)}/${region}`;
 }
\ No newline at end of file
@@ -6,6 +6,8 @@ class OTACorrections {
         this.state = {
             selectedProvider: null,
             providers: [],
+            providersCursor: null,
+            totalProviders: 0,
             correctionWorkflow: null
         };
         
@@ -25,17 +27,15 @@ class OTACorrections {
     }
 
     /**
-     * Load providers with missing rates
+     * Load providers with missing rates, a page at a time
+     * @param {string} [cursor] - next_cursor of the page already loaded (omit to reload from the top)
      */
-    async loadProviders() {
+    async loadProviders(cursor = null) {
         try {
-            const response = await fetch('/ota_corrections/api/providers/missing-rates');
-            if (!response.ok) {
-                throw new Error('Failed to load providers');
-            }
-
-            const data = await response.json();
-            this.state.providers = data.providers;
+            const data = await fetchListPage('/ota_corrections/api/providers/missing-rates', {}, cursor);
+            this.state.providers = cursor ? this.state.providers.concat(data.providers) : data.providers;
+            this.state.providersCursor = data.next_cursor;
+            this.state.totalProviders = data.total;
             
             // Update provider count
             const providerCount = document.getElementById('providerCount');
@@ -96,6 +96,11 @@ class OTACorrections {
             providerList.appendChild(listItem);
         });
 
+        if (this.state.providersCursor) {
+            addLoadMoreButton(providerList, this.state.totalProviders,
+                () => this.loadProviders(this.state.providersCursor));
+        }
+
         // Set up event listeners for provider selection
         this.setupProviderSelectionListeners();
     }
@@ -13,22 +13,23 @@ document.addEventListener("DOMContentLoaded", function () {
     loadProviders();
 });
 
-async function loadProviders() {
+/**
+ * Search the providers by name, TIN or file (matched on the server)
+ */
+function searchProviders() {
+    loadProviders();
+}
+
+/**
+ * Load the providers with missing fields, a page at a time
+ * @param {string} [cursor] - next_cursor of the page already shown (omit to reload from the top)
+ */
+async function loadProviders(cursor = null) {
     try {
         console.log('Loading providers with missing fields from validation failures...');
-        const response = await fetch('/provider_corrections/api/providers/missing_from_failures');
-
-        if (!response.ok) {
-            throw new Error(`Server returned ${response.status}: ${response.statusText}`);
-        }
-
-        const data = await response.json();
-
-        if (data.error) {
-            console.error('Server reported error:', data.error);
-            showAlert(data.error, 'error');
-            return;
-        }
+        const searchInput = document.getElementById('searchInput');
+        const q = searchInput ? searchInput.value.trim() : '';
+        const data = await fetchListPage('/provider_corrections/api/providers/missing_from_failures', { q }, cursor);
 
         const providerList = document.getElementById('providerList');
         if (!providerList) {
@@ -36,12 +37,14 @@ async function loadProviders() {
             return;
         }
 
-        // Clear existing content
-        providerList.innerHTML = '';
+        // Clear existing content unless appending a page
+        if (!cursor) {
+            providerList.innerHTML = '';
+        }
 
         // Update provider count badge
         const providerCount = document.getElementById('providerCount');
-        const totalProviders = data.providers ? data.providers.length : 0;
+        const totalProviders = data.total || 0;
         if (providerCount) {
             providerCount.textContent = totalProviders.toString();
             
@@ -100,8 +103,16 @@ async function loadProviders() {
 
             // Set up event listeners *AFTER* all providers are added
             setupProviderListEventListeners();
+
+            if (data.next_cursor) {
+                addLoadMoreButton(providerList, totalProviders, () => loadProviders(data.next_cursor));
+            }
             
-        } else {
+        } else if (q) {
+            const noMatch = createElement('div', { classes: 'list-group-item' });
+            noMatch.textContent = `No providers match "${q}"`;
+            providerList.appendChild(noMatch);
+        } else if (!cursor) {
             // Show completion message when no providers need corrections
             providerList.innerHTML = `
                 <div class="alert alert-success mb-0">
@@ -146,6 +157,9 @@ function setupProviderListEventListeners() {
     }
 
     providerItems.forEach(item => {
+        // Items from earlier pages already have their listener
+        if (item.dataset.listening) return;
+        item.dataset.listening = 'true';
         item.addEventListener('click', function () {
             document.querySelectorAll('.provider-item').forEach(el => el.classList.remove('active'));
             this.classList.add('active');
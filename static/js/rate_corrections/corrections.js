@@ -501,6 +501,36 @@ class RateCorrectionWorkflow {
         }
     }
 
+    /**
+     * Preview category rates on the server and ask the reviewer to confirm them
+     * @param {Object} categoryRates - Category rates about to be saved
+     * @returns {Promise<boolean>} True if the reviewer confirmed
+     */
+    async confirmCategoryRates(categoryRates) {
+        const response = await fetch('/rate_corrections/api/corrections/category/preview', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                tin: this.state.provider.tin,
+                category_rates: categoryRates
+            })
+        });
+
+        const preview = await response.json();
+        if (!response.ok) {
+            throw new Error(preview.error || 'Failed to preview category rates');
+        }
+
+        const { totals, resolves } = preview;
+        return window.confirm(
+            `This will add ${totals.insert} and overwrite ${totals.overwrite} rates ` +
+            `(${totals.unchanged} unchanged), resolving ${resolves.line_items} failing line items ` +
+            `($${resolves.charges.toFixed(2)} billed). Save?`
+        );
+    }
+
     /**
      * Save a category rate to the server
      * @param {string} category - Category to save
@@ -509,6 +539,10 @@ class RateCorrectionWorkflow {
      */
     async saveCategoryRateToServer(category, rate) {
         try {
+            if (!await this.confirmCategoryRates({ [category]: rate })) {
+                return { success: false, cancelled: true };
+            }
+
             const response = await fetch('/rate_corrections/api/corrections/category', {
                 method: 'POST',
                 headers: {
@@ -549,6 +583,10 @@ class RateCorrectionWorkflow {
      */
     async saveCategoryRatesToServer(categoryRates) {
         try {
+            if (!await this.confirmCategoryRates(categoryRates)) {
+                return { success: false, cancelled: true };
+            }
+
             const response = await fetch('/rate_corrections/api/corrections/category', {
                 method: 'POST',
                 headers: {
@@ -3,6 +3,8 @@
  */
 window.RateCorrections = window.RateCorrections || {
     providers: [],
+    providersCursor: null,
+    totalProviders: 0,
     selectedProvider: null,
     metrics: {
         totalProviders: 0,
@@ -103,37 +105,25 @@ export class RateCorrectionsApp {
     }
 
     /**
-     * Fetch and display initial dashboard metrics
+     * Fetch and display the dashboard metrics and the first page of providers
+     * @param {string} [cursor] - next_cursor of the providers already loaded, to append the next page
      */
-    // Fix the loadDashboardMetrics function
-    async loadDashboardMetrics() {
+    async loadDashboardMetrics(cursor = null) {
         try {
-            const response = await fetch('/rate_corrections/api/providers/missing-rates');
-            
-            if (!response.ok) {
-                throw new Error(`Failed to fetch providers: ${response.status} ${response.statusText}`);
-            }
-
-            const providers = await response.json();
+            const data = await fetchListPage('/rate_corrections/api/providers/missing-rates', {}, cursor);
             
             // Update state
-            this.state.providers = providers;
-            this.state.metrics.totalProviders = providers.length;
+            this.state.providers = cursor ? this.state.providers.concat(data.providers) : data.providers;
+            this.state.providersCursor = data.next_cursor;
+            this.state.totalProviders = data.total;
             
-            // Calculate metrics
-            let missingRateLineItems = 0;
-            let missingCategoryCodes = 0;
-            let totalCPTCodes = 0;
-
-            providers.forEach(provider => {
-                missingRateLineItems += provider.missing_rate_line_items || 0;
-                missingCategoryCodes += provider.missing_category_line_items || 0;
-                totalCPTCodes += (provider.cpt_codes || []).length;
-            });
-
-            this.state.metrics.missingRateLineItems = missingRateLineItems;
-            this.state.metrics.missingCategoryCodes = missingCategoryCodes;
-            this.state.metrics.totalCPTCodes = totalCPTCodes;
+            // Metrics cover every provider, not just the pages loaded
+            this.state.metrics = {
+                totalProviders: data.totals.providers,
+                missingRateLineItems: data.totals.missing_rate_line_items,
+                missingCategoryCodes: data.totals.missing_category_line_items,
+                totalCPTCodes: data.totals.cpt_codes
+            };
 
             // Update UI
             this.updateDashboardMetrics();
@@ -148,22 +138,7 @@ export class RateCorrectionsApp {
      * Update dashboard metrics in the UI
      */
     updateDashboardMetrics() {
-        const metrics = {
-            totalProviders: this.state.providers.length,
-            missingRateLineItems: 0,
-            missingCategoryCodes: 0,
-            totalCPTCodes: 0
-        };
-
-        // Calculate metrics from current providers
-        this.state.providers.forEach(provider => {
-            metrics.missingRateLineItems += provider.missing_rate_line_items || 0;
-            metrics.missingCategoryCodes += provider.missing_category_line_items || 0;
-            metrics.totalCPTCodes += (provider.cpt_codes || []).length;
-        });
-
-        // Update state
-        this.state.metrics = metrics;
+        const metrics = this.state.metrics;
 
         // Update UI
         document.getElementById('totalProvidersMetric').textContent = 
@@ -229,6 +204,11 @@ export class RateCorrectionsApp {
             container.appendChild(providerItem);
         });
 
+        if (this.state.providersCursor) {
+            addLoadMoreButton(container, this.state.totalProviders,
+                () => this.loadDashboardMetrics(this.state.providersCursor));
+        }
+
         // Update metrics
         this.updateDashboardMetrics();
     }
@@ -57,20 +57,23 @@ function setupEventListeners() {
 }
 
 /**
- * Load the list of unmapped files
+ * Load the list of unmapped files, a page at a time
+ * @param {string} [cursor] - next_cursor of the page already shown (omit to reload from the top)
  */
-async function loadFiles() {
+async function loadFiles(cursor = null) {
     try {
-        const response = await fetch('/unmapped/api/files');
-        const data = await response.json();
+        const data = await fetchListPage('/unmapped/api/files', {}, cursor);
         const fileList = document.getElementById('fileList');
-        fileList.innerHTML = '';
+        if (!cursor) {
+            fileList.innerHTML = '';
+        }
 
         if (data.files && data.files.length > 0) {
             data.files.forEach(file => {
                 const listItem = document.createElement('a');
                 listItem.className = 'list-group-item list-group-item-action';
                 listItem.textContent = file;
+                addFileThumbnail(listItem, data.thumbnails && data.thumbnails[file]);
                 listItem.href = '#';
                 listItem.onclick = (e) => {
                     e.preventDefault();
@@ -78,9 +81,13 @@ async function loadFiles() {
                 };
                 fileList.appendChild(listItem);
             });
-        } else {
+        } else if (!cursor) {
             fileList.innerHTML = '<div class="list-group-item">No unmapped files found</div>';
         }
+
+        if (data.next_cursor) {
+            addLoadMoreButton(fileList, data.total, () => loadFiles(data.next_cursor));
+        }
     } catch (error) {
         console.error('Error loading files:', error);
         const fileList = document.getElementById('fileList');
@@ -231,33 +238,51 @@ function loadPDF(filename) {
     const pdfFrame = document.getElementById('pdfFrame');
     pdfFrame.src = `/unmapped/api/pdf/${filename}`;
     
-    // Load the header region
-    loadPDFRegion(filename, 'header', 'headerImage');
-    
-    // Load the service lines region
-    loadPDFRegion(filename, 'service_lines', 'serviceImage');
+    // Load the header and service lines regions from a single page render
+    loadPDFRegions(filename, {header: 'headerImage', service_lines: 'serviceImage'});
 }
 
 /**
- * Load a specific region of a PDF
+ * Load several regions of a PDF, rendered together on the server
  * @param {string} filename - Name of the file to load
- * @param {string} region - Region name (header, service_lines, footer)
- * @param {string} imgId - ID of the image element to update
+ * @param {Object} imgIds - Map of region name to the ID of its image element
  */
-async function loadPDFRegion(filename, region, imgId) {
+async function loadPDFRegions(filename, imgIds) {
     try {
-        const response = await fetch(`/unmapped/api/pdf_region/${filename}/${region}`);
+        const response = await fetch(`/unmapped/api/pdf_regions/${encodeURIComponent(filename)}`);
         const data = await response.json();
         
-        if (data.image) {
+        if (!response.ok || !data.regions) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        
+        Object.entries(imgIds).forEach(([region, imgId]) => {
             const imgElement = document.getElementById(imgId);
-            if (imgElement) {
-                imgElement.src = data.image;
+            if (imgElement && data.regions[region]) {
+                imgElement.src = data.regions[region].url;
             }
-        }
+        });
     } catch (error) {
-        console.error(`Error loading ${region} PDF region:`, error);
+        console.error('Error loading PDF regions, loading them individually:', error);
+        Object.entries(imgIds).forEach(([region, imgId]) => loadPDFRegion(filename, region, imgId));
+    }
+}
+
+/**
+ * Load a specific region of a PDF
+ * @param {string} filename - Name of the file to load
+ * @param {string} region - Region name (header, service_lines, footer)
+ * @param {string} imgId - ID of the image element to update
+ */
+function loadPDFRegion(filename, region, imgId) {
+    const imgElement = document.getElementById(imgId);
+    if (!imgElement) {
+        return;
     }
+    
+    // Served as a cacheable PNG, so the browser can reuse it on repeat views
+    imgElement.onerror = () => console.error(`Error loading ${region} PDF region`);
+    imgElement.src = `/unmapped/api/pdf_region_image/${encodeURIComponent(filename)}/${region}`;
 }
 
 /**
@@ -617,7 +642,7 @@ async function markAsNotFound() {
 
         const result = await response.json();
         if (response.ok) {
-            alert('File marked as not found and moved to review2 folder');
+            alert('File marked as not found; queued for archiving');
             loadFiles();  // Refresh the file list
             clearCurrentFile();  // Clear the current file display
         } else {
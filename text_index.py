@@ -0,0 +1,238 @@
+"""
+Full-text index over the text layer of the archived PDFs, with word
+coordinates so search hits can be highlighted without rasterizing pages.
+"""
+import json
+import logging
+import re
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS text_documents (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    page_count INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS text_pages (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL,
+    words BLOB,
+    UNIQUE (name, page)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS text_fts USING fts5(text, tokenize = 'unicode61');
+"""
+
+# Matches the tokens FTS5's unicode61 tokenizer produces
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """
+    Split text into lower-case search tokens.
+
+    Args:
+        text (str): Text to split
+
+    Returns:
+        list: Tokens
+    """
+    return [token.lower() for token in _TOKEN_RE.findall(text or '')]
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression. Every whitespace-separated
+    term must appear; terms that tokenize into several tokens (e.g. a TIN like
+    12-3456789) must appear as a phrase.
+
+    Args:
+        query (str): User search text
+
+    Returns:
+        str: MATCH expression, or '' if the query has no searchable tokens
+    """
+    terms = []
+    for term in (query or '').split():
+        tokens = tokenize(term)
+        if tokens:
+            terms.append('"' + ' '.join(tokens) + '"')
+    return ' AND '.join(terms)
+
+class PDFTextIndex:
+    """
+    SQLite FTS5 index of per-page PDF text.
+
+    Each page is one row in text_pages (with its size and the zlib-compressed
+    JSON list of word boxes) and one row in text_fts sharing the same rowid, so
+    replacing a document's pages is a cheap rowid delete. text_documents records
+    the mtime and size each PDF was indexed at, so unchanged files are skipped.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the index. The database is created on first use.
+
+        Args:
+            db_path (Path): SQLite file holding the index
+        """
+        self.db_path = Path(db_path)
+        self._ready = False
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(TEXT_INDEX_SCHEMA)
+            self._ready = True
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Open a connection holding the write lock for the whole block, so
+        concurrent writers can't interleave their delete and insert steps."""
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def indexed_versions(self):
+        """
+        Get the version of every indexed PDF.
+
+        Returns:
+            dict: PDF name -> (mtime_ns, size)
+        """
+        conn = self._connect()
+        try:
+            return {row['name']: (row['mtime_ns'], row['size'])
+                    for row in conn.execute("SELECT name, mtime_ns, size FROM text_documents")}
+        finally:
+            conn.close()
+
+    def store(self, name, mtime_ns, size, pages):
+        """
+        Replace the indexed text of one PDF.
+
+        Args:
+            name (str): PDF filename
+            mtime_ns (int): PDF modification time the text was extracted from
+            size (int): PDF size the text was extracted from
+            pages (list): Page dicts from pdf_utils.extract_text_layer
+        """
+        with self._write() as conn:
+            self._delete(conn, name)
+            for page in pages:
+                words = zlib.compress(json.dumps(page['words']).encode('utf-8'))
+                cursor = conn.execute(
+                    "INSERT INTO text_pages (name, page, width, height, words) VALUES (?, ?, ?, ?, ?)",
+                    (name, page['page'], page['width'], page['height'], words)
+                )
+                conn.execute("INSERT INTO text_fts (rowid, text) VALUES (?, ?)",
+                             (cursor.lastrowid, page['text']))
+            conn.execute(
+                "INSERT INTO text_documents (name, mtime_ns, size, page_count, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (name, mtime_ns, size, len(pages), datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def remove(self, names):
+        """
+        Drop PDFs from the index.
+
+        Args:
+            names (Iterable[str]): PDF filenames to remove
+        """
+        with self._write() as conn:
+            for name in names:
+                self._delete(conn, name)
+
+    @staticmethod
+    def _delete(conn, name):
+        ids = [row[0] for row in conn.execute("SELECT id FROM text_pages WHERE name = ?", (name,))]
+        conn.executemany("DELETE FROM text_fts WHERE rowid = ?", [(page_id,) for page_id in ids])
+        conn.execute("DELETE FROM text_pages WHERE name = ?", (name,))
+        conn.execute("DELETE FROM text_documents WHERE name = ?", (name,))
+
+    def search(self, query, name=None, limit=20):
+        """
+        Search the indexed pages and locate the matching words on each hit page.
+
+        Args:
+            query (str): Free text (patient name, CPT code, TIN, ...)
+            name (str): Restrict the search to one PDF filename (optional)
+            limit (int): Maximum number of pages returned
+
+        Returns:
+            list: Hits ordered by relevance, each with the PDF name, zero-based page,
+                a text snippet and the highlight boxes of the matched words as
+                ratios of the page size ({'x0', 'y0', 'x1', 'y1', 'text'})
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        sql = """
+            SELECT p.name, p.page, p.width, p.height, p.words,
+                   snippet(text_fts, 0, '[', ']', '...', 12) AS snippet
+            FROM text_fts
+            JOIN text_pages p ON p.id = text_fts.rowid
+            WHERE text_fts MATCH ?
+        """
+        params = [match]
+        if name:
+            sql += " AND p.name = ?"
+            params.append(name)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        query_tokens = set(tokenize(query))
+        hits = []
+        for row in rows:
+            words = json.loads(zlib.decompress(row['words']).decode('utf-8')) if row['words'] else []
+            boxes = []
+            for x0, y0, x1, y1, word in words:
+                if query_tokens.intersection(tokenize(word)):
+                    boxes.append({
+                        'x0': round(x0 / row['width'], 4),
+                        'y0': round(y0 / row['height'], 4),
+                        'x1': round(x1 / row['width'], 4),
+                        'y1': round(y1 / row['height'], 4),
+                        'text': word
+                    })
+            hits.append({
+                'name': row['name'],
+                'page': row['page'],
+                'snippet': row['snippet'],
+                'boxes': boxes
+            })
+        return hits
+
+# Shared index over the configured PDF archive
+text_index = PDFTextIndex(config.TEXT_INDEX['PATH'])
@@ -76,6 +76,9 @@ def split_patient_name(name):
         # If more than 2 parts, assume first name and then last name is the final part
         return parts[0], parts[-1]
 
+# Date formats accepted in the JSON documents, tried in order
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y%m%d", "%m-%d-%Y")
+
 def parse_date(date_str):
     """
     Parse a date string in various formats.
@@ -89,8 +92,7 @@ def parse_date(date_str):
     if not date_str:
         return None
         
-    date_formats = ["%Y-%m-%d", "%m/%d/%Y", "%Y%m%d", "%m-%d-%Y"]
-    for fmt in date_formats:
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
         except ValueError:
@@ -157,4 +159,20 @@ def parse_charge(charge):
     try:
         return float(charge_str)
     except ValueError:
-        return 0.0
\ No newline at end of file
+        return 0.0
+
+def parse_units(units):
+    """
+    Parse the units of a line item for expected-payment math (rate x units).
+    
+    Args:
+        units (str, int or float): The units to parse
+        
+    Returns:
+        float: The units, or 1.0 when blank, unreadable or not positive
+    """
+    try:
+        value = float(str(units).strip())
+    except (TypeError, ValueError):
+        return 1.0
+    return value if value > 0 else 1.0
\ No newline at end of file
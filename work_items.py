@@ -0,0 +1,619 @@
+"""
+Work-item state of every file that passes through the review queues.
+
+Each file is one row recording its state, assignee, content hash and
+timestamps. Reviewers claim queued files with a time-limited lease so
+several of them can drain a queue without working the same file. A
+workflow action (save, not_found, escalate, resolve, reject) is a single
+row update plus a queued file move, which services.file_mover applies to
+the synced folders in the background.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import config
+
+logger = logging.getLogger(__name__)
+
+# Queue states (a file waiting in one of the review folders)
+UNMAPPED = 'unmapped'
+CORRECTIONS = 'corrections'
+ESCALATIONS = 'escalations'
+
+# Folder holding the files of each queue state
+QUEUE_FOLDERS = {
+    UNMAPPED: config.FOLDERS['UNMAPPED_FOLDER'],
+    CORRECTIONS: config.FOLDERS['FAILS_FOLDER'],
+    ESCALATIONS: config.ESCALATIONS_FOLDER,
+}
+
+# Final states
+MAPPED = 'mapped'
+NOT_FOUND = 'not_found'
+CORRECTED = 'corrected'
+REJECTED = 'rejected'
+REMOVED = 'removed'     # Disappeared from its queue folder outside the app
+
+WORK_ITEM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    assignee TEXT,
+    lease_expires REAL,
+    content_hash TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_work_items_state ON work_items (state, name);
+
+CREATE TABLE IF NOT EXISTS work_item_history (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    from_state TEXT,
+    to_state TEXT NOT NULL,
+    actor TEXT,
+    notes TEXT,
+    at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_work_item_history_name ON work_item_history (name);
+
+CREATE TABLE IF NOT EXISTS work_item_counts (
+    state TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS file_moves (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT,
+    target TEXT NOT NULL,
+    payload BLOB,
+    queued_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_moves_source ON file_moves (source);
+
+CREATE TABLE IF NOT EXISTS correction_patches (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    original_hash TEXT NOT NULL,
+    result_hash TEXT,
+    patch TEXT NOT NULL,
+    actor TEXT,
+    at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_correction_patches_name ON correction_patches (name);
+
+CREATE TRIGGER IF NOT EXISTS work_items_count_insert AFTER INSERT ON work_items BEGIN
+    INSERT OR IGNORE INTO work_item_counts (state, count) VALUES (NEW.state, 0);
+    UPDATE work_item_counts SET count = count + 1 WHERE state = NEW.state;
+END;
+
+CREATE TRIGGER IF NOT EXISTS work_items_count_update AFTER UPDATE OF state ON work_items
+WHEN OLD.state != NEW.state BEGIN
+    UPDATE work_item_counts SET count = count - 1 WHERE state = OLD.state;
+    INSERT OR IGNORE INTO work_item_counts (state, count) VALUES (NEW.state, 0);
+    UPDATE work_item_counts SET count = count + 1 WHERE state = NEW.state;
+END;
+
+CREATE TRIGGER IF NOT EXISTS work_items_count_delete AFTER DELETE ON work_items BEGIN
+    UPDATE work_item_counts SET count = count - 1 WHERE state = OLD.state;
+END;
+"""
+
+class WorkItemConflict(ValueError):
+    """Raised when a file is no longer in the expected state or is leased to another reviewer."""
+
+def serialize_content(content):
+    """
+    Serialize a JSON document the way the review folders store it.
+
+    Args:
+        content (dict): Document
+
+    Returns:
+        bytes: Pretty-printed JSON
+    """
+    return json.dumps(content, indent=2).encode('utf-8')
+
+def content_hash(data):
+    """
+    Hash the bytes of a stored document.
+
+    Args:
+        data (bytes): File content
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+class WorkItemStore:
+    """
+    SQLite table of work items, their transition history and the file moves
+    still to be applied.
+
+    Per-state counts are kept in work_item_counts by triggers, so counting a
+    queue is a primary-key lookup however many files have passed through it.
+
+    A queued item is leased while its assignee is set and lease_expires (a
+    Unix time) is in the future; expired leases are simply ignored, so a
+    reviewer who walks away frees the file without any cleanup job.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the store. The database is created on first use.
+
+        Args:
+            db_path (Path): SQLite file holding the work items
+        """
+        self.db_path = Path(db_path)
+        self._ready = False
+        # (name, state, other state) collisions already reported by sync
+        self._collisions = set()
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(work_items)")}
+            if columns and 'lease_expires' not in columns:
+                # Databases created before leasing
+                conn.execute("ALTER TABLE work_items ADD COLUMN lease_expires REAL")
+            conn.executescript(WORK_ITEM_SCHEMA)
+            self._ready = True
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Open a connection holding the write lock for the whole block, so a
+        state check and the update that depends on it can't interleave."""
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _record(conn, name, from_state, to_state, actor=None, notes=None, at=None):
+        conn.execute(
+            "INSERT INTO work_item_history (name, from_state, to_state, actor, notes, at) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, from_state, to_state, actor, notes, at or _now())
+        )
+
+    def sync(self, state, hashes, pending=()):
+        """
+        Reconcile the items in a queue state with the files in its folder.
+
+        New files are added in the state, files that came back to the queue
+        (e.g. reprocessed upstream) return to it, changed files get their new
+        hash, and items whose file has gone are marked removed.
+
+        Items are keyed by filename, so a file whose item is in another queue
+        state while that queue's folder still holds a file of the same name is
+        a collision: it is logged once and left alone rather than moved back
+        and forth between the two queues on every sync.
+
+        Args:
+            state (str): Queue state of the folder
+            hashes (dict): Filename -> content hash of every file in the folder
+            pending (Iterable[str]): Filenames with moves still queued, left alone
+
+        Returns:
+            int: Number of items changed
+        """
+        pending = set(pending)
+        changed = 0
+        now = _now()
+        with self._write() as conn:
+            current = {row['name']: row['content_hash'] for row in
+                       conn.execute("SELECT name, content_hash FROM work_items WHERE state = ?", (state,))}
+
+            for name, digest in hashes.items():
+                if name in pending:
+                    continue
+                if name in current:
+                    if current[name] != digest:
+                        conn.execute("UPDATE work_items SET content_hash = ?, updated_at = ? WHERE name = ?",
+                                     (digest, now, name))
+                        changed += 1
+                    continue
+                row = conn.execute("SELECT state FROM work_items WHERE name = ?", (name,)).fetchone()
+                other_folder = QUEUE_FOLDERS.get(row['state']) if row else None
+                if other_folder and (other_folder / name).exists():
+                    if (name, state, row['state']) not in self._collisions:
+                        self._collisions.add((name, state, row['state']))
+                        logger.warning(f"{name} is queued in both {row['state']} and {state}; "
+                                       f"left in {row['state']} until one of the files is removed")
+                    continue
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO work_items (name, state, content_hash, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (name, state, digest, now, now)
+                    )
+                    self._record(conn, name, None, state, at=now)
+                else:
+                    conn.execute(
+                        "UPDATE work_items SET state = ?, assignee = NULL, lease_expires = NULL, content_hash = ?, "
+                        "updated_at = ? WHERE name = ?",
+                        (state, digest, now, name)
+                    )
+                    self._record(conn, name, row['state'], state, notes='Returned to queue', at=now)
+                changed += 1
+
+            for name in current:
+                if name not in hashes and name not in pending:
+                    conn.execute("UPDATE work_items SET state = ?, assignee = NULL, lease_expires = NULL, updated_at = ? "
+                                 "WHERE name = ?", (REMOVED, now, name))
+                    self._record(conn, name, state, REMOVED, notes='File no longer in queue folder', at=now)
+                    changed += 1
+        return changed
+
+    def transition(self, name, from_state, to_state, source, target, content=None,
+                   actor=None, notes=None, extra_writes=(), patch=None):
+        """
+        Move a file to a new state and queue the matching folder move.
+
+        Args:
+            name (str): Filename
+            from_state (str): State the file must currently be in
+            to_state (str): New state
+            source (Path): File to remove once the move is applied
+            target (Path): Where the file goes
+            content (dict): Document to write at target (None moves the file as is,
+                which is a plain rename)
+            actor (str): Reviewer making the change (ends their lease on the file)
+            notes (str): Free-text reason recorded in the history
+            extra_writes (Iterable[tuple]): Additional (path, document) pairs to write,
+                e.g. the archived original of a corrected file (bytes are written as is)
+            patch (tuple): (original_hash, operations) when the content was produced
+                by a JSON Patch; recorded as the audit trail of the change
+
+        Returns:
+            dict: The updated work item
+
+        Raises:
+            WorkItemConflict: If the file is no longer in from_state or another
+                reviewer holds an active lease on it
+        """
+        payload = serialize_content(content) if content is not None else None
+        now = _now()
+        with self._write() as conn:
+            row = conn.execute("SELECT state, assignee, lease_expires, content_hash FROM work_items WHERE name = ?",
+                               (name,)).fetchone()
+            if row is None:
+                # Not seen by a queue scan yet
+                conn.execute(
+                    "INSERT INTO work_items (name, state, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (name, from_state, now, now)
+                )
+                self._record(conn, name, None, from_state, at=now)
+                digest = None
+            elif row['state'] != from_state:
+                raise WorkItemConflict(f"{name} is already {row['state']}")
+            elif self._leased_to_other(row, actor):
+                raise WorkItemConflict(f"{name} is claimed by {row['assignee']}")
+            else:
+                digest = row['content_hash']
+
+            if payload is not None:
+                digest = content_hash(payload)
+            conn.execute(
+                "UPDATE work_items SET state = ?, assignee = ?, lease_expires = NULL, content_hash = ?, updated_at = ? "
+                "WHERE name = ?",
+                (to_state, actor, digest, now, name)
+            )
+            self._record(conn, name, from_state, to_state, actor, notes, at=now)
+            if patch is not None:
+                original_hash, operations = patch
+                conn.execute(
+                    "INSERT INTO correction_patches (name, original_hash, result_hash, patch, actor, at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, original_hash, digest, json.dumps(operations), actor, now)
+                )
+
+            for path, document in extra_writes:
+                conn.execute(
+                    "INSERT INTO file_moves (name, source, target, payload, queued_at) VALUES (?, NULL, ?, ?, ?)",
+                    (name, str(path), document if isinstance(document, bytes) else serialize_content(document), now)
+                )
+            conn.execute(
+                "INSERT INTO file_moves (name, source, target, payload, queued_at) VALUES (?, ?, ?, ?, ?)",
+                (name, str(source), str(target), payload, now)
+            )
+        return self.get(name)
+
+    @staticmethod
+    def _leased_to_other(row, reviewer):
+        return (row['assignee'] is not None and row['assignee'] != reviewer
+                and (row['lease_expires'] or 0) > time.time())
+
+    def claim_next(self, state, reviewer, ttl, after=None):
+        """
+        Lease the next unclaimed file in a queue to a reviewer.
+
+        A reviewer who already holds a lease in the queue gets that file back
+        (with the lease renewed) rather than a second one. Otherwise the first
+        file in filename order that is unleased or whose lease has expired is
+        assigned, in one write transaction so two reviewers never get the same file.
+
+        Args:
+            state (str): Queue state
+            reviewer (str): Reviewer claiming the file
+            ttl (float): Lease length in seconds
+            after (str): Only consider files after this filename (to skip ahead)
+
+        Returns:
+            dict: The claimed work item, or None if every file is claimed
+        """
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT name FROM work_items WHERE state = ? AND assignee = ? AND lease_expires > ? "
+                "ORDER BY name LIMIT 1",
+                (state, reviewer, now)
+            ).fetchone()
+            if row is None:
+                sql = ("SELECT name FROM work_items WHERE state = ? "
+                       "AND (assignee IS NULL OR lease_expires IS NULL OR lease_expires <= ?)")
+                params = [state, now]
+                if after:
+                    sql += " AND name > ?"
+                    params.append(after)
+                row = conn.execute(sql + " ORDER BY name LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE work_items SET assignee = ?, lease_expires = ? WHERE name = ?",
+                         (reviewer, now + ttl, row['name']))
+        return self.get(row['name'])
+
+    def renew(self, name, reviewer, ttl):
+        """
+        Extend a reviewer's lease on a file. A lapsed lease is taken back as
+        long as nobody else has claimed the file in the meantime.
+
+        Args:
+            name (str): Filename
+            reviewer (str): Reviewer holding the lease
+            ttl (float): New lease length in seconds from now
+
+        Returns:
+            dict: The renewed work item
+
+        Raises:
+            WorkItemConflict: If the file isn't leased to the reviewer
+        """
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT state, assignee, lease_expires FROM work_items WHERE name = ?",
+                               (name,)).fetchone()
+            if row is None or row['assignee'] != reviewer or row['lease_expires'] is None:
+                raise WorkItemConflict(f"{name} is not claimed by {reviewer}")
+            conn.execute("UPDATE work_items SET lease_expires = ? WHERE name = ?", (now + ttl, name))
+        return self.get(name)
+
+    def touch(self, name, reviewer, ttl):
+        """
+        Renew a reviewer's lease if they hold one on the file; otherwise do nothing.
+
+        Args:
+            name (str): Filename
+            reviewer (str): Reviewer working on the file
+            ttl (float): New lease length in seconds from now
+
+        Returns:
+            bool: True if a lease was renewed
+        """
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ? WHERE name = ? AND assignee = ? AND lease_expires > ?",
+                (time.time() + ttl, name, reviewer, time.time())
+            )
+            return cursor.rowcount > 0
+
+    def release(self, name, reviewer):
+        """
+        Give up a reviewer's lease on a file so others can claim it.
+
+        Args:
+            name (str): Filename
+            reviewer (str): Reviewer holding the lease
+
+        Raises:
+            WorkItemConflict: If another reviewer holds an active lease on the file
+        """
+        with self._write() as conn:
+            row = conn.execute("SELECT assignee, lease_expires FROM work_items WHERE name = ?", (name,)).fetchone()
+            if row is None or row['lease_expires'] is None:
+                return
+            if self._leased_to_other(row, reviewer):
+                raise WorkItemConflict(f"{name} is claimed by {row['assignee']}")
+            conn.execute("UPDATE work_items SET assignee = NULL, lease_expires = NULL WHERE name = ?", (name,))
+
+    def leased_by_others(self, state, reviewer):
+        """
+        Get the files in a queue that other reviewers hold active leases on.
+
+        Args:
+            state (str): Queue state
+            reviewer (str): Reviewer asking (their own leases are not included)
+
+        Returns:
+            set: Filenames
+        """
+        conn = self._connect()
+        try:
+            return {row['name'] for row in conn.execute(
+                "SELECT name FROM work_items WHERE state = ? AND assignee IS NOT NULL AND assignee != ? "
+                "AND lease_expires > ?",
+                (state, reviewer, time.time())
+            )}
+        finally:
+            conn.close()
+
+    def get(self, name):
+        """
+        Get one work item.
+
+        Args:
+            name (str): Filename
+
+        Returns:
+            dict: Item (name, state, assignee, lease_expires, content_hash, created_at,
+                updated_at), or None
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM work_items WHERE name = ?", (name,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def history(self, name):
+        """
+        Get the transitions of one file, oldest first.
+
+        Args:
+            name (str): Filename
+
+        Returns:
+            list: Dicts with from_state, to_state, actor, notes and at
+        """
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(
+                "SELECT from_state, to_state, actor, notes, at FROM work_item_history WHERE name = ? ORDER BY id",
+                (name,)
+            )]
+        finally:
+            conn.close()
+
+    def patches(self, name):
+        """
+        Get the JSON Patches saved for one file, oldest first.
+
+        Args:
+            name (str): Filename
+
+        Returns:
+            list: Dicts with original_hash (archive digest of the file before the
+                patch), result_hash, patch (list of operations), actor and at
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT original_hash, result_hash, patch, actor, at FROM correction_patches "
+                "WHERE name = ? ORDER BY id",
+                (name,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row, patch=json.loads(row['patch'])) for row in rows]
+
+    def counts(self):
+        """
+        Count the work items in every state.
+
+        Returns:
+            dict: State -> number of items
+        """
+        conn = self._connect()
+        try:
+            return {row['state']: row['count'] for row in conn.execute("SELECT state, count FROM work_item_counts")}
+        finally:
+            conn.close()
+
+    def count(self, state):
+        """
+        Count the work items in one state.
+
+        Args:
+            state (str): State
+
+        Returns:
+            int: Number of items
+        """
+        return self.counts().get(state, 0)
+
+    def pending_sources(self):
+        """
+        Get the files that have been transitioned but not yet moved.
+
+        Returns:
+            set: Source paths (as strings) of the queued moves
+        """
+        conn = self._connect()
+        try:
+            return {row[0] for row in conn.execute("SELECT source FROM file_moves WHERE source IS NOT NULL")}
+        finally:
+            conn.close()
+
+    def pending_moves(self, limit):
+        """
+        Get the oldest queued file moves.
+
+        Args:
+            limit (int): Most moves returned (None for all)
+
+        Returns:
+            list: Dicts with id, name, source, target and payload
+        """
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(
+                "SELECT id, name, source, target, payload FROM file_moves ORDER BY id LIMIT ?",
+                (-1 if limit is None else limit,)
+            )]
+        finally:
+            conn.close()
+
+    def complete_moves(self, move_ids):
+        """
+        Drop applied moves from the queue.
+
+        Args:
+            move_ids (Iterable[int]): Ids of the moves that were applied
+        """
+        move_ids = list(move_ids)
+        if not move_ids:
+            return
+        with self._write() as conn:
+            conn.executemany("DELETE FROM file_moves WHERE id = ?", [(move_id,) for move_id in move_ids])
+
+    def fail_move(self, move_id, error):
+        """
+        Record a failed move attempt; the move stays queued and is retried.
+
+        Args:
+            move_id (int): Id of the move
+            error (str): Error message
+        """
+        with self._write() as conn:
+            conn.execute("UPDATE file_moves SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                         (error, move_id))
+
+# Shared store of the review queues' work items
+work_items = WorkItemStore(config.WORK_ITEMS['PATH'])